@@ -0,0 +1,240 @@
+# SPDX-FileCopyrightText: 2017 Fermi Research Alliance, LLC
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+In-process read cache for decoded data products.
+
+Products are keyed by ``(sequence_id, generation_id, key)`` and evicted in
+least-recently-used order once the configured byte budget is exceeded.
+Cached products are shared between every reader in the process, so they
+are handed out as read-only handles (see :func:`read_only`): writing to a
+cached DataFrame in place (``df.loc[i, c] = x``, ``df[c] += 1``...) raises
+``ValueError: assignment destination is read-only``.  The cache is
+therefore disabled by default, enable it (``dataspace.product_cache_bytes``)
+once the modules of the channels copy the products they modify.
+"""
+
+import copy
+import sys
+import threading
+
+from collections import OrderedDict
+
+import numpy
+import pandas as pd
+import structlog
+
+from decisionengine.framework.modules.logging_configDict import DELOGGER_CHANNEL_NAME, LOGGERNAME
+from decisionengine.framework.util.metrics import Counter, Gauge
+
+__all__ = [
+    "DEFAULT_CACHE_BYTES",
+    "ProductCache",
+    "read_only",
+]
+
+#: Default byte budget of the product cache, disabled as cached products are read-only
+DEFAULT_CACHE_BYTES = 0
+
+CACHE_HITS = Counter("de_datablock_cache_hits", "Number of data product reads served from the product cache")
+CACHE_MISSES = Counter("de_datablock_cache_misses", "Number of data product reads that missed the product cache")
+CACHE_EVICTIONS = Counter("de_datablock_cache_evictions", "Number of data products evicted from the product cache")
+CACHE_BYTES = Gauge("de_datablock_cache_bytes", "Estimated size of the data products held in the product cache")
+
+logger = structlog.getLogger(LOGGERNAME)
+logger = logger.bind(module=__name__.split(".")[-1], channel=DELOGGER_CHANNEL_NAME)
+
+_MISSING = object()
+
+
+def _freeze_arrays(obj):
+    """
+    Mark the numpy arrays backing a pandas object as read-only
+    """
+    for array in getattr(obj._mgr, "arrays", ()):
+        if isinstance(array, numpy.ndarray):
+            array.flags.writeable = False
+
+
+def read_only(value):
+    """
+    Return a handle on ``value`` that cannot modify the cached object.
+
+    * pandas objects are returned as shallow copies whose numpy buffers are
+      flagged read-only, so columns may be added to the handle but the
+      cached data cannot be written through it.
+    * numpy arrays are returned as read-only views.
+    * builtin mutable containers are deep copied.
+    * anything else is returned unchanged.
+
+    :type value: :obj:`object`
+    :rtype: :obj:`object`
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        _freeze_arrays(value)
+        return value.copy(deep=False)
+    if isinstance(value, numpy.ndarray):
+        view = value.view()
+        view.flags.writeable = False
+        return view
+    if isinstance(value, (dict, list, set)):
+        return copy.deepcopy(value)
+    return value
+
+
+def sizeof(value, encoded_size=0):
+    """
+    Estimate the in-memory footprint of a decoded product
+
+    :type value: :obj:`object`
+    :arg value: decoded product
+    :type encoded_size: :obj:`int`
+    :arg encoded_size: size of the product as stored in the datasource
+    :rtype: :obj:`int`
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        estimate = int(value.memory_usage(index=True, deep=False).sum())
+    elif isinstance(value, numpy.ndarray):
+        estimate = value.nbytes
+    else:
+        estimate = sys.getsizeof(value)
+    return max(estimate, encoded_size)
+
+
+class ProductCache:
+    """
+    Byte-budgeted LRU cache of decoded data products.
+
+    A budget of ``0`` disables the cache.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        """
+        :type max_bytes: :obj:`int`
+        :arg max_bytes: maximum number of bytes held by the cache
+        """
+        if int(max_bytes) < 0:
+            raise ValueError(f"The product cache size must not be negative, got {max_bytes}")
+        self.max_bytes = int(max_bytes)
+        self.current_bytes = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        # (sequence_id, key) -> {generation_id, ...} for invalidation
+        self._generations = {}
+        # (sequence_id, key) -> number of invalidations, so that products read
+        # before an invalidation are not cached after it
+        self._versions = {}
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, cache_key):
+        return cache_key in self._entries
+
+    def get(self, cache_key, default=None):
+        """
+        Return a read-only handle on the cached product, or ``default``
+
+        :type cache_key: :obj:`tuple`
+        :arg cache_key: ``(sequence_id, generation_id, key)``
+        """
+        if not self.enabled:
+            return default
+        with self._lock:
+            entry = self._entries.get(cache_key, _MISSING)
+            if entry is _MISSING:
+                CACHE_MISSES.inc()
+                return default
+            self._entries.move_to_end(cache_key)
+        CACHE_HITS.inc()
+        return read_only(entry[0])
+
+    def version(self, cache_key):
+        """
+        Return the version of the product, to be taken before reading it
+        from the datasource and given back to :meth:`put`
+
+        :type cache_key: :obj:`tuple`
+        :arg cache_key: ``(sequence_id, generation_id, key)``
+        :rtype: :obj:`int`
+        """
+        return self._versions.get((cache_key[0], cache_key[2]), 0)
+
+    def put(self, cache_key, value, size, version=None):
+        """
+        Cache a decoded product and return a read-only handle on it
+
+        Products larger than the whole budget, or invalidated since
+        ``version`` was taken, are not cached and returned unchanged.
+
+        :type cache_key: :obj:`tuple`
+        :arg cache_key: ``(sequence_id, generation_id, key)``
+        :type value: :obj:`object`
+        :arg value: decoded product
+        :type size: :obj:`int`
+        :arg size: estimated size of the product in bytes
+        :type version: :obj:`int`
+        :arg version: :meth:`version` of the product before it was read
+        """
+        if not self.enabled:
+            return value
+        if size > self.max_bytes:
+            logger.debug(f"Product {cache_key} ({size} bytes) exceeds the product cache budget")
+            return value
+        with self._lock:
+            if version is not None and version != self.version(cache_key):
+                # written while it was read, the value may be stale
+                return value
+            self._discard(cache_key)
+            self._entries[cache_key] = (value, size)
+            self._generations.setdefault((cache_key[0], cache_key[2]), set()).add(cache_key[1])
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+                CACHE_EVICTIONS.inc()
+            CACHE_BYTES.set(self.current_bytes)
+        return read_only(value)
+
+    def invalidate(self, sequence_id, generation_id, key):
+        """
+        Drop ``key`` for ``generation_id`` and every later generation of the
+        task manager, as those may resolve to the product just written.
+
+        :type sequence_id: :obj:`int`
+        :type generation_id: :obj:`int`
+        :type key: :obj:`string`
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._versions[(sequence_id, key)] = self._versions.get((sequence_id, key), 0) + 1
+            generations = self._generations.get((sequence_id, key), ())
+            for generation in [g for g in generations if g >= generation_id]:
+                self._discard((sequence_id, generation, key))
+            CACHE_BYTES.set(self.current_bytes)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+            self._versions.clear()
+            self.current_bytes = 0
+            CACHE_BYTES.set(0)
+
+    def _discard(self, cache_key):
+        # caller must hold self._lock
+        entry = self._entries.pop(cache_key, None)
+        if entry is None:
+            return
+        self.current_bytes -= entry[1]
+        sequence_id, generation_id, key = cache_key
+        generations = self._generations.get((sequence_id, key))
+        if generations is not None:
+            generations.discard(generation_id)
+            if not generations:
+                del self._generations[(sequence_id, key)]
@@ -0,0 +1,511 @@
+# SPDX-FileCopyrightText: 2017 Fermi Research Alliance, LLC
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Binary envelope used to store data products in the dataspace.
+
+Every stored product is framed as::
+
+    +-------+----------+-------+-----------------+
+    | magic | codec id | flags | payload ...     |
+    +-------+----------+-------+-----------------+
+      1 B     1 B        1 B
+
+The magic byte identifies (and versions) the envelope, the codec id names
+the compression applied to the payload and the flags describe how the
+payload was serialized.  The payload itself is a pickle (protocol 5) of the
+product.
+
+Large contiguous buffers, such as the numeric columns of a DataFrame, are
+pickled out-of-band when :data:`FLAG_OUT_OF_BAND` is set.  The (uncompressed)
+payload is then a sequence of frames::
+
+    +-------+-----------------+-------------+-------------+-----+
+    | count | frame lengths   | pickle      | buffer 1    | ... |
+    +-------+-----------------+-------------+-------------+-----+
+      4 B     8 B * (count+1)
+
+so that the buffers are written without being copied into the pickle
+stream.  They are read back with a single copy of each buffer frame into
+a :obj:`bytearray`, so that decoded arrays are writable.
+
+Rows written before the envelope existed hold
+``compress(str({"pickled": ..., "value": ...}))`` and are still decoded.
+
+Compression is selected by a :class:`Compression`, products are written
+uncompressed when they are smaller than ``min_size`` or when compressing
+them does not pay off.  :class:`CompressionPolicy` maps product keys to
+their :class:`Compression`, it is built from the ``compression`` section of
+the dataspace configuration::
+
+    dataspace: {
+      compression: {
+        codec: "zlib",        # zlib, zlib_dict, lzma, bz2 or none
+        level: 6,
+        min_size: 1024,
+        products: {
+          Factory_Entries: { codec: "lzma" },
+          job_manifests: { codec: "zlib_dict", dictionary: "/etc/decisionengine/manifests.zdict" },
+        },
+      },
+    }
+
+Preset dictionaries for ``zlib_dict`` can be built with :func:`train_dictionary`.
+They are identified in the payload by their CRC32, a dictionary has to stay
+configured for as long as products compressed with it are kept.
+"""
+
+import ast
+import bz2
+import collections
+import lzma
+import pickle
+import struct
+import time
+import zlib
+
+from decisionengine.framework.util.metrics import Counter, Histogram
+
+__all__ = [
+    "CODEC_BZ2",
+    "CODEC_LZMA",
+    "CODEC_NONE",
+    "CODEC_ZLIB",
+    "CODEC_ZLIB_DICT",
+    "Compression",
+    "CompressionPolicy",
+    "DEFAULT_COMPRESSION",
+    "ENVELOPE_MAGIC",
+    "EnvelopeError",
+    "FLAG_OUT_OF_BAND",
+    "NO_COMPRESSION",
+    "decode",
+    "encode",
+    "is_envelope",
+    "register_dictionary",
+    "train_dictionary",
+]
+
+#: First byte of every framed product, bump it if the layout ever changes
+ENVELOPE_MAGIC = 0xDE
+
+#: Payload is stored as is
+CODEC_NONE = 0
+#: Payload is zlib compressed
+CODEC_ZLIB = 1
+#: Payload is lzma (xz) compressed
+CODEC_LZMA = 2
+#: Payload is bz2 compressed
+CODEC_BZ2 = 3
+#: Payload is the CRC32 of a preset dictionary followed by a zlib stream using it
+CODEC_ZLIB_DICT = 4
+
+#: Payload holds out-of-band pickle buffers
+FLAG_OUT_OF_BAND = 0x01
+
+_KNOWN_FLAGS = FLAG_OUT_OF_BAND
+
+#: Pickle buffers smaller than this are kept in-band
+OUT_OF_BAND_MIN_SIZE = 64 * 1024
+
+#: Payloads smaller than this are not compressed
+DEFAULT_MIN_SIZE = 1024
+
+#: zlib only looks back 32 KiB, a longer preset dictionary is wasted
+ZDICT_MAX_SIZE = 32 * 1024
+
+_HEADER = struct.Struct("!BBB")
+_DICT_ID = struct.Struct("!I")
+_FRAME_COUNT = struct.Struct("!I")
+
+_LEGACY_ENCODING = "latin1"
+
+# Payloads larger than twice the probe size are probed with a fast
+# compression of a sample first, and stored as is when the sample does not
+# shrink below the probe ratio.
+_PROBE_SIZE = 64 * 1024
+_PROBE_RATIO = 0.95
+
+CODEC_SECONDS = Histogram(
+    "de_dataspace_codec_seconds",
+    "Time spent compressing and decompressing data products",
+    ["codec", "operation"],
+)
+COMPRESSION_RATIO = Histogram(
+    "de_dataspace_compression_ratio",
+    "Ratio between the uncompressed and the compressed size of data products",
+    ["codec"],
+    buckets=(1.0, 1.25, 1.5, 2.0, 3.0, 5.0, 10.0, 20.0, 50.0, float("inf")),
+)
+COMPRESSION_SKIPPED = Counter(
+    "de_dataspace_compression_skipped",
+    "Number of data products stored uncompressed",
+    ["reason"],
+)
+
+
+class EnvelopeError(Exception):
+    """
+    Errors due to a malformed product envelope
+    """
+
+    pass
+
+
+_dictionaries = {}
+
+
+def register_dictionary(dictionary):
+    """
+    Make a preset dictionary available to compress and decompress products
+
+    :type dictionary: :obj:`bytes`
+    :rtype: :obj:`int`
+    :returns: the id of the dictionary as stored in the payload
+    """
+    dictionary = bytes(dictionary)
+    dict_id = zlib.crc32(dictionary)
+    _dictionaries[dict_id] = dictionary
+    return dict_id
+
+
+def train_dictionary(samples, size=ZDICT_MAX_SIZE, segment_size=64, shingle_size=8):
+    """
+    Build a zlib preset dictionary from sample payloads
+
+    The samples are cut into segments scored by how many samples share their
+    byte shingles.  The best segments are kept, the best ones at the end of
+    the dictionary where zlib references them most cheaply.
+
+    :type samples: :obj:`list` of :obj:`bytes`
+    :arg samples: payloads representative of the products to compress
+    :type size: :obj:`int`
+    :arg size: maximum size of the dictionary
+    :type segment_size: :obj:`int`
+    :arg segment_size: size of the candidate segments
+    :type shingle_size: :obj:`int`
+    :arg shingle_size: size of the substrings compared between samples
+    :rtype: :obj:`bytes`
+    """
+
+    def shingles(data):
+        return {data[i : i + shingle_size] for i in range(len(data) - shingle_size + 1)}
+
+    samples = [bytes(sample) for sample in samples]
+    frequency = collections.Counter()
+    for sample in samples:
+        frequency.update(shingles(sample))
+
+    scores = {}
+    for sample in samples:
+        for i in range(0, len(sample), segment_size):
+            segment = sample[i : i + segment_size]
+            if segment not in scores and len(segment) >= shingle_size:
+                scores[segment] = sum(frequency[shingle] for shingle in shingles(segment)) / len(segment)
+
+    segments = []
+    length = 0
+    for segment in sorted(scores, key=scores.get, reverse=True):
+        if length + len(segment) > size:
+            break
+        segments.append(segment)
+        length += len(segment)
+    return b"".join(reversed(segments))
+
+
+class _PrefixedCompressor:
+    """
+    Compressor whose output starts with a fixed prefix
+    """
+
+    def __init__(self, prefix, compressor):
+        self._prefix = prefix
+        self._compressor = compressor
+
+    def compress(self, data):
+        prefix, self._prefix = self._prefix, b""
+        return prefix + self._compressor.compress(data)
+
+    def flush(self):
+        return self._prefix + self._compressor.flush()
+
+
+def _zlib_compressor(level, dictionary):
+    return zlib.compressobj(6 if level is None else level)
+
+
+def _lzma_compressor(level, dictionary):
+    return lzma.LZMACompressor(preset=6 if level is None else level)
+
+
+def _bz2_compressor(level, dictionary):
+    return bz2.BZ2Compressor(9 if level is None else level)
+
+
+def _zdict_compressor(level, dictionary):
+    compressor = zlib.compressobj(6 if level is None else level, zdict=dictionary)
+    return _PrefixedCompressor(_DICT_ID.pack(zlib.crc32(dictionary)), compressor)
+
+
+def _zdict_decompress(data):
+    (dict_id,) = _DICT_ID.unpack_from(data)
+    dictionary = _dictionaries.get(dict_id)
+    if dictionary is None:
+        raise EnvelopeError(f"Product compressed with unknown preset dictionary {dict_id:#010x}")
+    decompressor = zlib.decompressobj(zdict=dictionary)
+    return decompressor.decompress(data[_DICT_ID.size :]) + decompressor.flush()
+
+
+# name -> (codec id, compressor(level, dictionary), decompress(data))
+_CODECS = {
+    "none": (CODEC_NONE, None, None),
+    "zlib": (CODEC_ZLIB, _zlib_compressor, zlib.decompress),
+    "lzma": (CODEC_LZMA, _lzma_compressor, lzma.decompress),
+    "bz2": (CODEC_BZ2, _bz2_compressor, bz2.decompress),
+    "zlib_dict": (CODEC_ZLIB_DICT, _zdict_compressor, _zdict_decompress),
+}
+_CODEC_NAMES = {codec_id: name for name, (codec_id, _, _) in _CODECS.items()}
+
+
+class Compression:
+    """
+    Compression settings of a data product
+    """
+
+    def __init__(self, codec="zlib", level=None, min_size=DEFAULT_MIN_SIZE, dictionary=None):
+        """
+        :type codec: :obj:`string`
+        :arg codec: one of ``none``, ``zlib``, ``zlib_dict``, ``lzma`` or ``bz2``
+        :type level: :obj:`int`
+        :arg level: compression level (preset for lzma), ``None`` for the codec default
+        :type min_size: :obj:`int`
+        :arg min_size: payloads smaller than this are stored uncompressed
+        :type dictionary: :obj:`bytes`
+        :arg dictionary: preset dictionary, required by ``zlib_dict``
+        """
+        if codec not in _CODECS:
+            raise ValueError(f"Unknown compression codec '{codec}', expected one of {sorted(_CODECS)}")
+        if codec == "zlib_dict":
+            if not dictionary:
+                raise ValueError("The zlib_dict codec requires a preset dictionary")
+            register_dictionary(dictionary)
+        self.codec = codec
+        self.level = level
+        self.min_size = min_size
+        self.dictionary = dictionary
+
+    def __repr__(self):
+        return f"Compression(codec={self.codec!r}, level={self.level!r}, min_size={self.min_size!r})"
+
+    def compress(self, frames):
+        """
+        Compress a payload given as a sequence of frames
+
+        The frames are fed to a streaming compressor one after the other, so
+        they never have to be concatenated.
+
+        :type frames: :obj:`list` of bytes-like objects
+        :rtype: :obj:`tuple`
+        :returns: ``(codec id, chunks)``, the payload is the concatenation of the chunks
+        """
+        codec_id, compressor, _ = _CODECS[self.codec]
+        if compressor is None:
+            return CODEC_NONE, frames
+        size = sum(memoryview(frame).nbytes for frame in frames)
+        if size < self.min_size:
+            COMPRESSION_SKIPPED.labels("small").inc()
+            return CODEC_NONE, frames
+        if _incompressible(max(frames, key=lambda frame: memoryview(frame).nbytes)):
+            COMPRESSION_SKIPPED.labels("incompressible").inc()
+            return CODEC_NONE, frames
+
+        start = time.perf_counter()
+        compressor = compressor(self.level, self.dictionary)
+        chunks = [compressor.compress(frame) for frame in frames]
+        chunks.append(compressor.flush())
+        CODEC_SECONDS.labels(self.codec, "compress").observe(time.perf_counter() - start)
+
+        compressed_size = sum(len(chunk) for chunk in chunks)
+        if compressed_size >= size:
+            COMPRESSION_SKIPPED.labels("incompressible").inc()
+            return CODEC_NONE, frames
+        COMPRESSION_RATIO.labels(self.codec).observe(size / max(compressed_size, 1))
+        return codec_id, chunks
+
+
+#: Compression used when none is given
+DEFAULT_COMPRESSION = Compression()
+
+#: No compression, for payloads that are not stored
+NO_COMPRESSION = Compression("none")
+
+
+def _incompressible(frame):
+    frame = memoryview(frame).cast("B")
+    if len(frame) < 2 * _PROBE_SIZE:
+        return False
+    middle = len(frame) // 2
+    sample = frame[middle : middle + _PROBE_SIZE]
+    return len(zlib.compress(sample, 1)) >= _PROBE_RATIO * len(sample)
+
+
+class CompressionPolicy:
+    """
+    Selects the :class:`Compression` of each data product
+    """
+
+    def __init__(self, default=None, products=None):
+        """
+        :type default: :obj:`Compression`
+        :arg default: compression of the products without an override
+        :type products: :obj:`dict`
+        :arg products: product key -> :obj:`Compression` overrides
+        """
+        self.default = default or DEFAULT_COMPRESSION
+        self.products = dict(products or {})
+
+    def for_key(self, key):
+        """
+        :type key: :obj:`string`
+        :rtype: :obj:`Compression`
+        """
+        return self.products.get(key, self.default)
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Build the policy from the ``compression`` section of the dataspace configuration
+
+        Per product settings inherit ``min_size`` from the global settings.
+        Raises :obj:`ValueError` on invalid settings and :obj:`OSError` when a
+        dictionary cannot be read.
+
+        :type config: :obj:`dict`
+        :rtype: :obj:`CompressionPolicy`
+        """
+        config = dict(config or {})
+        products = config.pop("products", {})
+        default = cls._compression(config)
+        min_size = config.get("min_size", DEFAULT_MIN_SIZE)
+        return cls(
+            default,
+            {key: cls._compression({"min_size": min_size, **settings}) for key, settings in products.items()},
+        )
+
+    @staticmethod
+    def _compression(settings):
+        settings = dict(settings)
+        unknown = set(settings) - {"codec", "level", "min_size", "dictionary"}
+        if unknown:
+            raise ValueError(f"Unknown compression settings {sorted(unknown)}")
+        if settings.get("dictionary"):
+            with open(settings["dictionary"], "rb") as f:
+                settings["dictionary"] = f.read()
+        return Compression(**settings)
+
+
+def is_envelope(blob):
+    """
+    :type blob: :obj:`bytes`
+    :rtype: :obj:`bool`
+    """
+    return len(blob) >= _HEADER.size and blob[0] == ENVELOPE_MAGIC
+
+
+def _out_of_band(buffers):
+    def buffer_callback(buffer):
+        # a true value keeps the buffer in-band
+        try:
+            raw = buffer.raw()
+        except BufferError:
+            # not contiguous
+            return True
+        if raw.nbytes < OUT_OF_BAND_MIN_SIZE:
+            return True
+        buffers.append(raw)
+        return False
+
+    return buffer_callback
+
+
+def encode(value, compression=None):
+    """
+    Serialize a product into a framed envelope
+
+    :type value: :obj:`object`
+    :arg value: product to store
+    :type compression: :obj:`Compression`
+    :arg compression: compression settings, :obj:`DEFAULT_COMPRESSION` if not given
+    :rtype: :obj:`bytes`
+    """
+    buffers = []
+    pickled = pickle.dumps(value, protocol=5, buffer_callback=_out_of_band(buffers))
+    flags = 0
+    frames = [pickled]
+    if buffers:
+        flags |= FLAG_OUT_OF_BAND
+        lengths = [len(pickled)] + [buffer.nbytes for buffer in buffers]
+        frames = [_FRAME_COUNT.pack(len(buffers)) + struct.pack(f"!{len(lengths)}Q", *lengths), pickled, *buffers]
+    codec_id, chunks = (compression or DEFAULT_COMPRESSION).compress(frames)
+    return b"".join([_HEADER.pack(ENVELOPE_MAGIC, codec_id, flags), *chunks])
+
+
+def decode(blob):
+    """
+    Deserialize a product stored with :func:`encode` or by the legacy
+    ``compress(str(...))`` format
+
+    Out-of-band buffers are copied once, out of the payload, into writable
+    buffers handed to the unpickler, so decoded arrays can be modified in
+    place and do not keep the payload alive.
+
+    :type blob: :obj:`bytes`
+    :rtype: :obj:`object`
+    """
+    if not is_envelope(blob):
+        return _decode_legacy(blob)
+
+    _, codec_id, flags = _HEADER.unpack_from(blob)
+    if flags & ~_KNOWN_FLAGS:
+        raise EnvelopeError(f"Unknown envelope flags {flags:#04x}")
+    payload = memoryview(blob)[_HEADER.size :]
+    if codec_id != CODEC_NONE:
+        name = _CODEC_NAMES.get(codec_id)
+        if name is None:
+            raise EnvelopeError(f"Unknown codec id {codec_id}")
+        start = time.perf_counter()
+        payload = memoryview(_CODECS[name][2](payload))
+        CODEC_SECONDS.labels(name, "decompress").observe(time.perf_counter() - start)
+    if flags & FLAG_OUT_OF_BAND:
+        return _loads_out_of_band(payload)
+    return pickle.loads(payload)
+
+
+def _loads_out_of_band(payload):
+    (count,) = _FRAME_COUNT.unpack_from(payload)
+    lengths = struct.unpack_from(f"!{count + 1}Q", payload, _FRAME_COUNT.size)
+    offset = _FRAME_COUNT.size + 8 * (count + 1)
+    frames = []
+    for length in lengths:
+        frames.append(payload[offset : offset + length])
+        offset += length
+    if offset != len(payload):
+        raise EnvelopeError(f"Out-of-band frames cover {offset} bytes of a {len(payload)} bytes payload")
+    # the payload may be immutable bytes or a read-only memory map
+    return pickle.loads(frames[0], buffers=[bytearray(frame) for frame in frames[1:]])
+
+
+def _decode_legacy(blob):
+    try:
+        text = zlib.decompress(blob).decode(_LEGACY_ENCODING)
+    except zlib.error:
+        text = bytes(blob).decode(_LEGACY_ENCODING)
+    value = ast.literal_eval(text)
+    if not value.get("pickled"):
+        return value.get("value")
+
+    pickled = value.get("value")
+    try:
+        return pickle.loads(zlib.decompress(pickled))
+    except zlib.error:
+        return pickle.loads(pickled)
@@ -1,18 +1,22 @@
 # SPDX-FileCopyrightText: 2017 Fermi Research Alliance, LLC
 # SPDX-License-Identifier: Apache-2.0
 
-import ast
+import contextlib
 import copy
 import pickle
 import threading
 import time
+import types
 import uuid
 import zlib
 
-from collections import UserDict
+from collections.abc import MutableMapping
+from typing import NamedTuple
 
 import structlog
 
+from decisionengine.framework.dataspace import codec
+from decisionengine.framework.dataspace.cache import sizeof
 from decisionengine.framework.modules.logging_configDict import DELOGGER_CHANNEL_NAME, LOGGERNAME
 
 ###############################################################################
@@ -26,6 +30,8 @@ from decisionengine.framework.modules.logging_configDict import DELOGGER_CHANNEL
 
 _ENCODING = "latin1"
 
+_NOT_CACHED = object()
+
 
 def zdumps(obj):
     """
@@ -75,6 +81,51 @@ def decompress(zbytes):
         return zbytes.decode(_ENCODING)
 
 
+class _ReadWriteLock:
+    """
+    Lock held by any number of readers or by a single writer
+
+    Waiting writers go before new readers, so that a steady flow of
+    readers (e.g. transforms running concurrently) does not starve them.
+    The lock is not reentrant.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writing = False
+        self._waiting_writers = 0
+
+    @contextlib.contextmanager
+    def read(self):
+        with self._condition:
+            while self._writing or self._waiting_writers:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    @contextlib.contextmanager
+    def write(self):
+        with self._condition:
+            self._waiting_writers += 1
+            while self._writing or self._readers:
+                self._condition.wait()
+            self._waiting_writers -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
+
+
 class InvalidMetadataError(Exception):
     """
     Errors due to invalid Metadata
@@ -83,7 +134,51 @@ class InvalidMetadataError(Exception):
     pass
 
 
-class Metadata(UserDict):
+class _Record(MutableMapping):
+    """
+    Fixed set of named fields, stored in slots, behaving as a mapping of
+    the field names to their values
+    """
+
+    __slots__ = ()
+
+    #: Names of the fields, in order
+    fields = ()
+
+    def __getitem__(self, name):
+        if name not in self.fields:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def __setitem__(self, name, value):
+        if name not in self.fields:
+            raise KeyError(f"{type(self).__name__} has no field {name}")
+        setattr(self, name, value)
+
+    def __delitem__(self, name):
+        raise TypeError(f"{type(self).__name__} fields cannot be deleted")
+
+    def __iter__(self):
+        return iter(self.fields)
+
+    def __len__(self):
+        return len(self.fields)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self)})"
+
+    @property
+    def data(self):
+        """
+        Read-only view of the fields, set them on the record itself
+        """
+        return types.MappingProxyType(self)
+
+
+class Metadata(_Record):
+
+    __slots__ = ("taskmanager_id", "state", "generation_id", "generation_time", "missed_update_count")
+    fields = __slots__
 
     # Minimum information required for the Metadata dict to be valid
     required_keys = {"taskmanager_id", "state", "generation_id", "generation_time", "missed_update_count"}
@@ -101,20 +196,17 @@ class Metadata(UserDict):
         :type generation_time: :obj:`float`
         :type missed_update_count: :obj:`int`
         """
-        UserDict.__init__(self)
         if state not in Metadata.valid_states:
             structlog.getLogger(LOGGERNAME).exception(f"Invalid Metadata state: {state}")
             raise InvalidMetadataError()
         if not generation_time:
             generation_time = time.time()
 
-        self.data = {
-            "taskmanager_id": taskmanager_id,
-            "state": state,
-            "generation_id": generation_id,
-            "generation_time": int(generation_time),
-            "missed_update_count": missed_update_count,
-        }
+        self.taskmanager_id = taskmanager_id
+        self.state = state
+        self.generation_id = generation_id
+        self.generation_time = int(generation_time)
+        self.missed_update_count = missed_update_count
 
     def set_state(self, state):
         """
@@ -126,10 +218,13 @@ class Metadata(UserDict):
         if state not in Metadata.valid_states:
             structlog.getLogger(LOGGERNAME).exception(f"{state} is not a valid Metadata state")
             raise InvalidMetadataError()
-        self.data["state"] = state
+        self.state = state
+
 
+class Header(_Record):
 
-class Header(UserDict):
+    __slots__ = ("taskmanager_id", "create_time", "expiration_time", "scheduled_create_time", "creator", "schema_id")
+    fields = __slots__
 
     # Minimum information required for the Header dict to be valid
     required_keys = {
@@ -164,7 +259,6 @@ class Header(UserDict):
         :type schema_id: :obj:`int`
         """
 
-        UserDict.__init__(self)
         if not create_time:
             create_time = time.time()
         if not expiration_time:
@@ -172,26 +266,35 @@ class Header(UserDict):
         if not scheduled_create_time:
             scheduled_create_time = time.time()
 
-        self.data = {
-            "taskmanager_id": taskmanager_id,
-            "create_time": int(create_time),
-            "expiration_time": int(expiration_time),
-            "scheduled_create_time": int(scheduled_create_time),
-            "creator": creator,
-            "schema_id": schema_id,
-        }
+        self.taskmanager_id = taskmanager_id
+        self.create_time = int(create_time)
+        self.expiration_time = int(expiration_time)
+        self.scheduled_create_time = int(scheduled_create_time)
+        self.creator = creator
+        self.schema_id = schema_id
 
     def is_valid(self):
         """
         Check if the Header has minimum required information
         """
         try:
-            return set(self.data.keys()).issubset(Header.required_keys)
+            return set(self.keys()).issubset(Header.required_keys)
         except Exception:  # pragma: no cover
             structlog.getLogger(LOGGERNAME).exception("Unexpected error checking Header information")
             raise
 
 
+class ProductEnvelope(NamedTuple):
+    value: object
+    header: Header
+    metadata: Metadata
+
+
+ProductEnvelope.value.__doc__ = "The data product."
+ProductEnvelope.header.__doc__ = "Header of the data product."
+ProductEnvelope.metadata.__doc__ = "Metadata of the data product in the generation it was read from."
+
+
 class ProductRetriever:
     def __init__(self, product_name, product_type, product_source):
         self.name = product_name
@@ -217,7 +320,8 @@ class DataBlock:
         """
 
         self.__internal_data_write_lock = threading.Lock()
-        self.__internal_data_read_lock = threading.Lock()
+        # readers of the key index share it, writers hold it alone
+        self.__internal_data_read_lock = _ReadWriteLock()
         self.logger = structlog.getLogger(LOGGERNAME)
         self.logger = self.logger.bind(module=__name__.split(".")[-1], channel=DELOGGER_CHANNEL_NAME)
         self.logger.debug("Initializing a datablock for %s", name)
@@ -239,6 +343,11 @@ class DataBlock:
         else:
             self.generation_id = self.dataspace.get_last_generation_id(name, taskmanager_id)
 
+        # keys of the current generation, loaded on first use and kept up to
+        # date by _setitem so that membership tests do not hit the datasource
+        self._key_index = None
+        self._key_index_generation = None
+
         self.lock = threading.Lock()
 
     def __str__(self):
@@ -255,12 +364,31 @@ class DataBlock:
         return f"{value}"
 
     def __contains__(self, key):
-        return key in self.keys()  # noqa: SIM118
+        self.logger.debug("datablock waiting for internal read lock in '__contains__'")
+        with self.__internal_data_read_lock.read():
+            return key in self._keys()
 
     def keys(self):
         self.logger.debug("datablock waiting for internal read lock in 'keys'")
-        with self.__internal_data_read_lock:
-            return tuple(self.dataspace.get_datablock(self.sequence_id, self.generation_id).keys())
+        with self.__internal_data_read_lock.read():
+            return tuple(self._keys())
+
+    def _keys(self):
+        """
+        Return the key index of the current generation, the caller holds the
+        internal read lock, for reading or writing
+
+        The index is reloaded when generation_id was changed from outside.
+        Readers loading it at the same time load the same keys.
+
+        :rtype: :obj:`dict`
+        """
+        key_index = self._key_index
+        if key_index is None or self._key_index_generation != self.generation_id:
+            key_index = dict.fromkeys(self.dataspace.get_datablock_keys(self.sequence_id, self.generation_id))
+            self._key_index = key_index
+            self._key_index_generation = self.generation_id
+        return key_index
 
     def store_taskmanager(self, taskmanager_name, taskmanager_id):
         """
@@ -272,7 +400,7 @@ class DataBlock:
         self.logger.debug("datablock waiting for internal write lock in 'store_taskmanager'")
         with self.__internal_data_write_lock:
             self.logger.debug("datablock waiting for internal read lock in 'store_taskmanager'")
-            with self.__internal_data_read_lock:
+            with self.__internal_data_read_lock.write():
                 return self.dataspace.store_taskmanager(taskmanager_name, taskmanager_id)
 
     def get_taskmanager(self, taskmanager_name, taskmanager_id=None):
@@ -311,29 +439,44 @@ class DataBlock:
         """
         self._setitem(key, value, header, metadata)
 
-    def get(self, key, default=None):
+    def put_many(self, products, header, metadata=None):
         """
-        Return the value associated with the key in the database
+        Put several products into the DataBlock in a single transaction
 
-        :type key: :obj:`string`
-        :rtype: :obj:`dict`
+        :type products: :obj:`dict`
+        :type header: :obj:`Header`
+        :type metadata: :obj:`Metadata`
         """
-        return self.__getitem__(key, default=default)
+        if not metadata:
+            metadata = Metadata(
+                self.sequence_id,
+                state="NEW",
+                generation_id=self.generation_id,
+                generation_time=time.time(),
+                missed_update_count=0,
+            )
 
-    def __insert(self, key, value, header, metadata):
+        store_values = {
+            key: codec.encode(value, self.dataspace.compression.for_key(key)) for key, value in products.items()
+        }
+        self.logger.debug("datablock waiting for internal write lock in 'put_many'")
+        with self.__internal_data_write_lock:
+            self.dataspace.put_many(self.sequence_id, self.generation_id, store_values, header, metadata)
+            with self.__internal_data_read_lock.write():
+                self._keys().update(dict.fromkeys(store_values))
+
+    def get(self, key, default=None):
         """
-        Insert a new product into database with header and metadata
+        Return the value associated with the key in the database
 
         :type key: :obj:`string`
-        :type value: :obj:`dict`
-        :type header: :obj:`Header`
-        :type metadata: :obj:`Metadata`
+        :rtype: :obj:`dict`
         """
-        self.dataspace.insert(self.sequence_id, self.generation_id, key, value, header, metadata)
+        return self.__getitem__(key, default=default)
 
     def __update(self, key, value, header, metadata):
         """
-        Update an existing product in the database with header and metadata
+        Insert or update a product in the database with header and metadata
 
         :type key: :obj:`string`
         :type value: :obj:`dict`
@@ -361,43 +504,42 @@ class DataBlock:
                 missed_update_count=0,
             )
 
-        if isinstance(value, dict):
-            store_value = compress({"pickled": False, "value": value})
-        else:
-            store_value = compress({"pickled": True, "value": pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)})
+        store_value = codec.encode(value, self.dataspace.compression.for_key(key))
         self.logger.debug("datablock waiting for internal write lock in '_setitem'")
         with self.__internal_data_write_lock:
-            if key in self:
-                # This has been already inserted, so you are working on a copy
-                # that was backed up. You need to update and adjust the update
-                # counter
-                self.__update(key, store_value, header, metadata)
-            else:
-                self.__insert(key, store_value, header, metadata)
+            # the datasource inserts the product or, when the key was already
+            # put in or copied to this generation, updates it
+            self.__update(key, store_value, header, metadata)
+            with self.__internal_data_read_lock.write():
+                self._keys()[key] = None
 
     def get_dataproducts(self, key=None):
-        values = self.dataspace.get_dataproducts(self.sequence_id, key)
         result = []
 
         try:
-            for value in values:
-                v = ast.literal_eval(decompress(value.get("value")))
-                if v.get("pickled"):
-                    v = zloads(v.get("value"))
-                else:
-                    v = value.get("value")
-                result.append(
-                    {
-                        "key": value["key"],
-                        "generation_id": value["generation_id"],
-                        "taskmanager_id": value["taskmanager_id"],
-                        "value": v,
-                    }
-                )
+            for product in self.iter_dataproducts(key):
+                result.append(product)
         except Exception:  # pragma: no cover
             self.logger.exception("Unexpected error in get_dataproducts")
         return result
 
+    def iter_dataproducts(self, key=None):
+        """
+        Yield the data products of the taskmanager, of every generation,
+        reading and decoding them one at a time
+
+        :type key: :obj:`string`
+        :arg key: only yield the products of key
+        :rtype: :obj:`generator` of :obj:`dict`
+        """
+        for value in self.dataspace.iter_dataproducts(self.sequence_id, key):
+            yield {
+                "key": value["key"],
+                "generation_id": value["generation_id"],
+                "taskmanager_id": value["taskmanager_id"],
+                "value": codec.decode(value["value"]),
+            }
+
     def __getitem__(self, key, default=None):
         """
         Return the value associated with the key in the database
@@ -407,22 +549,27 @@ class DataBlock:
         :rtype: :obj:`dict`
         """
 
+        cache_key = (self.sequence_id, self.generation_id, key)
+        version = self.dataspace.product_cache.version(cache_key)
+        cached = self.dataspace.product_cache.get(cache_key, _NOT_CACHED)
+        if cached is not _NOT_CACHED:
+            return cached
+
         try:
             value = self.dataspace.get_dataproduct(self.sequence_id, self.generation_id, key)
-            value = ast.literal_eval(decompress(value))
         except KeyError:
             self.logger.error(f"Did not get key '{key}' in datablock __getitem__")
-            value = default
+            if not default:
+                self.logger.exception(f"No key '{key}' in datablock __getitem__")
+                raise KeyError(f"No key '{key}' in datablock __getitem__")
+            return default
 
         if not value:
             self.logger.exception(f"No key '{key}' in datablock __getitem__")
             raise KeyError(f"No key '{key}' in datablock __getitem__")
 
-        if value.get("pickled"):
-            return_value = zloads(value.get("value"))
-        else:
-            return_value = value.get("value")
-        return return_value
+        return_value = codec.decode(value)
+        return self.dataspace.product_cache.put(cache_key, return_value, sizeof(return_value, len(value)), version)
 
     def get_header(self, key):
         """
@@ -457,6 +604,42 @@ class DataBlock:
             missed_update_count=metadata_row[6],
         )
 
+    def get_with_envelope(self, key):
+        """
+        Return the value associated with the key together with its Header
+        and Metadata, read in a single query
+
+        :type key: :obj:`string`
+        :rtype: :obj:`ProductEnvelope`
+        """
+        cache_key = (self.sequence_id, self.generation_id, key)
+        version = self.dataspace.product_cache.version(cache_key)
+        envelope = self.dataspace.get_envelope(self.sequence_id, self.generation_id, key)
+
+        value = self.dataspace.product_cache.get(cache_key, _NOT_CACHED)
+        if value is _NOT_CACHED:
+            value = codec.decode(envelope["value"])
+            value = self.dataspace.product_cache.put(cache_key, value, sizeof(value, len(envelope["value"])), version)
+
+        return ProductEnvelope(
+            value,
+            Header(
+                self.taskmanager_id,
+                create_time=envelope["create_time"],
+                expiration_time=envelope["expiration_time"],
+                scheduled_create_time=envelope["scheduled_create_time"],
+                creator=envelope["creator"],
+                schema_id=envelope["schema_id"],
+            ),
+            Metadata(
+                self.taskmanager_id,
+                state=envelope["state"],
+                generation_id=self.generation_id,
+                generation_time=envelope["generation_time"],
+                missed_update_count=envelope["missed_update_count"],
+            ),
+        )
+
     def duplicate(self):
         """
         Duplicate the datablock and return this new DataBlock. The intent is
@@ -475,8 +658,23 @@ class DataBlock:
             dup_datablock = copy.copy(self)
             self.generation_id += 1
             self.dataspace.duplicate_datablock(self.sequence_id, dup_datablock.generation_id, self.generation_id)
+            with self.__internal_data_read_lock.write():
+                # the new generation starts with the keys of the one it was copied from
+                if self._key_index is not None and self._key_index_generation == dup_datablock.generation_id:
+                    dup_datablock._key_index = dict(self._key_index)
+                    self._key_index_generation = self.generation_id
+                else:
+                    self._key_index = None
         return dup_datablock
 
+    def commit(self):
+        """
+        Record the generation of this datablock as complete, once no more
+        products are written to it.  Readers of the committed generation
+        (see :meth:`DataSpace.get_committed_generation`) then move to it.
+        """
+        self.dataspace.commit_generation(self.sequence_id, self.generation_id)
+
     def is_expired(self, key=None):
         """
         Check if the dataproduct for a given key or any key is expired
@@ -135,7 +135,8 @@ class DataSource(metaclass=abc.ABCMeta):  # pragma: no cover
     def update(self, taskmanager_id, generation_id, key, value, header, metadata):
         """
         Update the data in respective tables for the given
-        taskmanager_id, generation_id, key
+        taskmanager_id, generation_id, key, inserting it if the key is
+        not in the generation yet
 
         :type taskmanager_id: :obj:`string`
         :arg taskmanager_id: taskmanager_id for generation to be retrieved
@@ -182,6 +183,93 @@ class DataSource(metaclass=abc.ABCMeta):  # pragma: no cover
         self.logger.info("datasource is getting all dataproducts for a taskmanger")
         return
 
+    @abc.abstractmethod
+    def iter_dataproducts(self, taskmanager_id, key=None):
+        """
+        Yield the data products associated with taskmanager_id one at a
+        time, as :meth:`get_dataproducts` lists them, without holding
+        them all in memory
+
+        One product is yielded for each generation holding the key, in
+        generation order, including the generations sharing the value of
+        an older one.
+
+        :type taskmanager_id: :obj:`string`
+        :type key: :obj:`string`
+        :arg key: data product key
+        """
+        self.logger.info("datasource is streaming the dataproducts of a taskmanger")
+        return
+
+    @abc.abstractmethod
+    def iter_history(
+        self, key, taskmanager_names=None, start_time=None, end_time=None, every_nth=1, limit=None, latest=False
+    ):
+        """
+        Yield the values of key across taskmanagers, oldest taskmanager
+        first and one per generation holding key within each, as dicts
+        holding ``name``, ``taskmanager_id``, ``generation_id``, ``key``
+        and ``value``
+
+        :type key: :obj:`string`
+        :arg key: data product key
+        :type taskmanager_names: :obj:`list`
+        :arg taskmanager_names: names of the taskmanagers (channels) to search, all if not given
+        :type start_time: :obj:`datetime`
+        :arg start_time: earliest start time of the taskmanagers
+        :type end_time: :obj:`datetime`
+        :arg end_time: latest start time of the taskmanagers
+        :type every_nth: :obj:`int`
+        :arg every_nth: only yield the first of every every_nth values of each taskmanager
+        :type limit: :obj:`int`
+        :arg limit: maximum number of values to yield, all if not given
+        :type latest: :obj:`bool`
+        :arg latest: only search the newest taskmanager of each name
+        """
+        self.logger.info("datasource is streaming the history of a dataproduct")
+        return
+
+    @abc.abstractmethod
+    def put_many(self, taskmanager_id, generation_id, products, header, metadata):
+        """
+        Insert or update several products for the given taskmanager_id,
+        generation_id in a single transaction
+
+        :type taskmanager_id: :obj:`string`
+        :arg taskmanager_id: taskmanager_id for generation to be retrieved
+        :type generation_id: :obj:`int`
+        :arg generation_id: generation_id of the data
+        :type products: :obj:`dict`
+        :arg products: values keyed by product key
+        :type header: :obj:`~datablock.Header`
+        :arg header: Header for the values
+        :type metadata: :obj:`~datablock.Metadata`
+        :arg metadata: Metadata for the values
+        """
+        self.logger.info("datasource is storing several products in the database tables")
+        return
+
+    @abc.abstractmethod
+    def get_envelope(self, taskmanager_id, generation_id, key):
+        """
+        Return the value, header and metadata of the given taskmanager_id,
+        generation_id, key in a single lookup
+
+        The returned dict holds ``value``, the header fields
+        ``create_time``, ``expiration_time``, ``scheduled_create_time``,
+        ``creator``, ``schema_id`` and the metadata fields ``state``,
+        ``generation_time``, ``missed_update_count``.
+
+        :type taskmanager_id: :obj:`string`
+        :arg taskmanager_id: taskmanager_id for generation to be retrieved
+        :type generation_id: :obj:`int`
+        :arg generation_id: generation_id of the data
+        :type key: :obj:`string`
+        :arg key: key for the value
+        """
+        self.logger.info("datasource is getting a dataproduct with its header and metadata")
+        return
+
     @abc.abstractmethod
     def get_header(self, taskmanager_id, generation_id, key):
         """
@@ -228,12 +316,29 @@ class DataSource(metaclass=abc.ABCMeta):  # pragma: no cover
         self.logger.info("datasource is getting the datablock for a taskmanger")
         return
 
+    @abc.abstractmethod
+    def get_datablock_keys(self, taskmanager_id, generation_id):
+        """
+        Return the keys of the datablock for the given taskmanager_id,
+        generation_id without retrieving the dataproducts
+
+        :type taskmanager_id: :obj:`string`
+        :arg taskmanager_id: taskmanager_id for generation to be retrieved
+        :type generation_id: :obj:`int`
+        :arg generation_id: generation_id of the data
+        """
+        self.logger.info("datasource is getting the datablock keys for a taskmanger")
+        return
+
     @abc.abstractmethod
     def duplicate_datablock(self, taskmanager_id, generation_id, new_generation_id):
         """
         For the given taskmanager_id, make a copy of the datablock with given
         generation_id, set the generation_id for the datablock copy
 
+        The copy may share the stored products with the original until
+        they are updated in the new generation.
+
         :type taskmanager_id: :obj:`string`
         :arg taskmanager_id: taskmanager_id for generation to be retrieved
         :type generation_id: :obj:`int`
@@ -258,6 +363,34 @@ class DataSource(metaclass=abc.ABCMeta):  # pragma: no cover
         self.logger.info("datasource is getting the last generation id for a taskmanager")
         return
 
+    @abc.abstractmethod
+    def commit_generation(self, taskmanager_id, generation_id):
+        """
+        Record generation_id as the last complete generation of the
+        taskmanager, unless a later one is recorded already
+
+        :type taskmanager_id: :obj:`int`
+        :arg taskmanager_id: sequence id of the taskmanager
+        :type generation_id: :obj:`int`
+        :arg generation_id: generation whose products are all written
+        """
+        self.logger.info("datasource is committing a generation for a taskmanager")
+        return
+
+    @abc.abstractmethod
+    def get_committed_generation(self, taskmanager_name):
+        """
+        Return the newest taskmanager named taskmanager_name with a
+        complete generation, as a dict with its sequence_id,
+        taskmanager_id and that generation_id
+
+        :type taskmanager_name: :obj:`string`
+        :arg taskmanager_name: task manager name
+        :rtype: :obj:`dict`
+        """
+        self.logger.info("datasource is getting the committed generation for a taskmanager")
+        return
+
     @abc.abstractmethod
     def close(self):
         """
@@ -305,11 +438,19 @@ class DataSource(metaclass=abc.ABCMeta):  # pragma: no cover
         return
 
     @abc.abstractmethod
-    def delete_data_older_than(self, days):
+    def delete_data_older_than(self, days, batch_size=None):
         """
         Delete data older that interval
+
+        With batch_size, at most batch_size rows are deleted and the caller
+        repeats the call until it returns 0.
+
         :type days: :obj:`long`
         :arg days: remove data older than interval
+        :type batch_size: :obj:`int`
+        :arg batch_size: maximum number of rows to delete, None deletes them all
+        :rtype: :obj:`int`
+        :returns: number of rows deleted
         """
         self.logger.info("datasource is deleting data")
         return
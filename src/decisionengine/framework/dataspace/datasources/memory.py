@@ -0,0 +1,607 @@
+# SPDX-FileCopyrightText: 2017 Fermi Research Alliance, LLC
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+A datasource keeping everything in process memory
+
+Data products are indexed by taskmanager sequence id, generation and key.
+Like the SQLAlchemy datasource, duplicating a datablock only copies the
+per-generation metadata, the products themselves are shared with the
+generation they were copied from until they are written again.
+
+Nothing is persisted and the data is private to the process that stores
+it: the channels run in their own processes, so the decision engine's
+queries (e.g. ``de-client --print-product``) do not see their products.
+Only the newest ``max_generations`` generations of each taskmanager are
+retained.
+"""
+import datetime
+import itertools
+import threading
+
+import decisionengine.framework.dataspace.datasource as ds
+
+__all__ = [
+    "DEFAULT_MAX_GENERATIONS",
+    "MemoryDataSource",
+]
+
+#: Default number of generations retained per taskmanager
+DEFAULT_MAX_GENERATIONS = 16
+
+_HEADER_FIELDS = ("create_time", "expiration_time", "scheduled_create_time", "creator", "schema_id")
+_METADATA_FIELDS = ("state", "generation_time", "missed_update_count")
+
+
+def _as_datetime(value):
+    if isinstance(value, str):
+        return datetime.datetime.fromisoformat(value)
+    return value
+
+
+class MemoryDataSource(ds.DataSource):
+    """
+    A DecisionEngine data source held in memory
+
+    .. code-block:: python
+
+        {
+            "dataspace": {
+                "datasource": {
+                    "module": "decisionengine.framework.dataspace.datasources.memory",
+                    "name": "MemoryDataSource",
+                    "config": {
+                        "max_generations": 16,
+                    }
+                }
+            }
+        }
+    """
+
+    def __init__(self, config_dict):
+        super().__init__(config_dict)
+        self.logger.debug("Initializing a memory datasource")
+
+        self.max_generations = config_dict.get("max_generations", DEFAULT_MAX_GENERATIONS)
+        if self.max_generations < 2:
+            # a channel works on two generations at once
+            raise ValueError(f"max_generations must be at least 2, got {self.max_generations}")
+
+        self._lock = threading.RLock()
+        self._sequence = itertools.count(1)
+        # sequence_id -> taskmanager row
+        self._taskmanagers = {}
+        # sequence_id -> generation_id -> key -> (product, metadata), where
+        # product is (written generation_id, value, header) and is shared
+        # between the generations of a duplicated datablock
+        self._datablocks = {}
+        # sequence_id -> last complete generation_id
+        self._committed = {}
+
+    def _taskmanager(self, taskmanager_id):
+        try:
+            return self._taskmanagers[taskmanager_id]
+        except KeyError:
+            raise KeyError(f"No taskmanager with sequence id {taskmanager_id}")
+
+    def _entry(self, taskmanager_id, generation_id, key):
+        try:
+            return self._datablocks[taskmanager_id][generation_id][key]
+        except KeyError:
+            raise KeyError(f"No key '{key}' in generation {generation_id} of taskmanager {taskmanager_id}")
+
+    def _generation(self, taskmanager_id, generation_id):
+        self._taskmanager(taskmanager_id)
+        generations = self._datablocks.setdefault(taskmanager_id, {})
+        if generation_id not in generations:
+            generations[generation_id] = {}
+            self._retain(generations)
+        return generations[generation_id]
+
+    def _retain(self, generations):
+        for generation_id in sorted(generations)[: -self.max_generations]:
+            del generations[generation_id]
+
+    def _put(self, taskmanager_id, generation_id, key, value, header, metadata, update):
+        block = self._generation(taskmanager_id, generation_id)
+        old_product, old_metadata = block.get(key, ((None, None, {}), {}))
+        if update:
+            header = {field: header.get(field, old_product[2].get(field)) for field in _HEADER_FIELDS}
+            metadata = {field: metadata.get(field, old_metadata.get(field)) for field in _METADATA_FIELDS}
+        else:
+            header = {field: header.get(field) for field in _HEADER_FIELDS}
+            metadata = {field: metadata.get(field) for field in _METADATA_FIELDS}
+        block[key] = ((generation_id, value, header), metadata)
+
+    def create_tables(self):
+        """
+        Nothing to create
+
+        Returns:
+            None
+        """
+        self.logger.info("datasource MemoryDataSource has no tables to create")
+
+    def store_taskmanager(self, name, taskmanager_id, datestamp=None):
+        """
+        Store TaskManager
+
+        Args:
+            name (str): name of taskmanager to store
+            taskmanager_id (str/uuid): id of taskmanager to store
+            datestamp (datetime): datetime of created object, defaults to 'now'
+
+        Returns:
+            int: the sequence id of the taskmanager
+        """
+        with self._lock:
+            sequence_id = next(self._sequence)
+            self._taskmanagers[sequence_id] = {
+                "sequence_id": sequence_id,
+                "taskmanager_id": taskmanager_id,
+                "name": name,
+                "datestamp": datestamp or datetime.datetime.now(),
+            }
+            return sequence_id
+
+    def get_taskmanager(self, taskmanager_name, taskmanager_id=None):
+        """
+        Find the task manager by name/uuid, the newest one if several match
+
+        Args:
+            taskmanager_name (str): name of taskmanager to retrieve
+            taskmanager_id (str/uuid): id of taskmanager to retrieve
+
+        Returns:
+            dict: the matching taskmanager
+        """
+        with self._lock:
+            matches = [
+                tm
+                for tm in self._taskmanagers.values()
+                if tm["name"] == taskmanager_name and (not taskmanager_id or tm["taskmanager_id"] == taskmanager_id)
+            ]
+            if not matches:
+                raise KeyError(f"No taskmanager named {taskmanager_name}")
+            return dict(max(matches, key=lambda tm: tm["sequence_id"]))
+
+    def get_taskmanagers(self, taskmanager_name=None, start_time=None, end_time=None):
+        """
+        Find taskmanagers that meet our search
+
+        Args:
+            taskmanager_name (str): name of taskmanager to retrieve
+            start_time (datetime): Datetime to confine against
+            end_time (datetime): Datetime to confine against
+
+        Returns:
+            list: each element is a dict() describing a taskmanager
+        """
+        start_time = _as_datetime(start_time)
+        end_time = _as_datetime(end_time)
+        with self._lock:
+            return [
+                dict(tm)
+                for tm in sorted(self._taskmanagers.values(), key=lambda tm: tm["datestamp"])
+                if (not taskmanager_name or tm["name"] == taskmanager_name)
+                and (not start_time or tm["datestamp"] >= start_time)
+                and (not end_time or tm["datestamp"] <= end_time)
+            ]
+
+    def get_last_generation_id(self, taskmanager_name, taskmanager_id=None):
+        """
+        Return last generation id for current task manager
+        or taskmanager w/ task_manager_id.
+
+        Args:
+            taskmanager_name (str): name of taskmanager to retrieve
+            taskmanager_id (str/uuid): id of taskmanager to retrieve
+
+        Returns:
+            int: the largest generation holding products
+        """
+        with self._lock:
+            generations = [
+                generation_id
+                for sequence_id, tm in self._taskmanagers.items()
+                if tm["name"] == taskmanager_name and (not taskmanager_id or tm["taskmanager_id"] == taskmanager_id)
+                for generation_id, block in self._datablocks.get(sequence_id, {}).items()
+                if block
+            ]
+            if not generations:
+                raise KeyError("No matching entries found")
+            return max(generations)
+
+    def commit_generation(self, taskmanager_id, generation_id):
+        """
+        Record generation_id as the last complete generation of
+        taskmanager_id, unless a later one is recorded already
+
+        Args:
+            taskmanager_id (int): sequence id of the taskmanager
+            generation_id (int): generation whose products are all written
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._taskmanager(taskmanager_id)
+            self._committed[taskmanager_id] = max(generation_id, self._committed.get(taskmanager_id, generation_id))
+
+    def get_committed_generation(self, taskmanager_name):
+        """
+        Find the newest taskmanager named taskmanager_name with a complete generation
+
+        Args:
+            taskmanager_name (str): name of taskmanager to retrieve
+
+        Returns:
+            dict: sequence_id, taskmanager_id and the last complete generation_id
+        """
+        with self._lock:
+            committed = [
+                sequence_id
+                for sequence_id in self._committed
+                if self._taskmanagers[sequence_id]["name"] == taskmanager_name
+            ]
+            if not committed:
+                raise KeyError(f"No complete generation of taskmanager {taskmanager_name}")
+            tm = self._taskmanagers[max(committed)]
+            return {
+                "sequence_id": tm["sequence_id"],
+                "taskmanager_id": tm["taskmanager_id"],
+                "generation_id": self._committed[tm["sequence_id"]],
+            }
+
+    def insert(self, taskmanager_id, generation_id, key, value, header, metadata):
+        """
+        Insert a product for the given taskmanager_id, generation_id, key
+
+        Args:
+            taskmanager_id (int): sequence id of the taskmanager
+            generation_id (int): generation id to create
+            key (str): key for the value
+            value (obj): Value can be an object or dict or a binary
+            header (datablock.Header): Header for the value
+            metadata (datablock.Metadata): Metadata for the value
+
+        Returns:
+            None
+        """
+        taskmanager_id = int(taskmanager_id)
+        with self._lock:
+            self._put(taskmanager_id, generation_id, key, value, header, metadata, update=False)
+
+    def update(self, taskmanager_id, generation_id, key, value, header, metadata):
+        """
+        Insert or update a product of the given taskmanager_id, generation_id, key
+
+        Args:
+            taskmanager_id (int): sequence id of the taskmanager
+            generation_id (int): generation id to update
+            key (str): key for the value
+            value (obj): Value can be an object or dict or a binary
+            header (datablock.Header): Header for the value
+            metadata (datablock.Metadata): Metadata for the value
+
+        Returns:
+            None
+        """
+        taskmanager_id = int(taskmanager_id)
+        with self._lock:
+            block = self._generation(taskmanager_id, generation_id)
+            self._put(taskmanager_id, generation_id, key, value, header, metadata, update=key in block)
+
+    def put_many(self, taskmanager_id, generation_id, products, header, metadata):
+        """
+        Insert or update several products of the given taskmanager_id,
+        generation_id
+
+        Args:
+            taskmanager_id (int): sequence id of the taskmanager
+            generation_id (int): generation id to write
+            products (dict): values keyed by product key
+            header (datablock.Header): Header shared by the values
+            metadata (datablock.Metadata): Metadata shared by the values
+
+        Returns:
+            None
+        """
+        taskmanager_id = int(taskmanager_id)
+        with self._lock:
+            block = self._generation(taskmanager_id, generation_id)
+            for key, value in products.items():
+                self._put(taskmanager_id, generation_id, key, value, header, metadata, update=key in block)
+
+    def get_envelope(self, taskmanager_id, generation_id, key):
+        """
+        Return the value, header and metadata of the given taskmanager_id,
+        generation_id, key
+
+        Args:
+            taskmanager_id (int): sequence id of the taskmanager
+            generation_id (int): generation id to locate
+            key (str): key for the value
+
+        Returns:
+            dict: value, header and metadata fields
+        """
+        taskmanager_id = int(taskmanager_id)
+        with self._lock:
+            (_, value, header), metadata = self._entry(taskmanager_id, generation_id, key)
+            return {"value": value, **header, **metadata}
+
+    def get_header(self, taskmanager_id, generation_id, key):
+        """
+        Return the header of the given taskmanager_id, generation_id, key
+
+        Args:
+            taskmanager_id (int): sequence id of the taskmanager
+            generation_id (int): generation id to locate
+            key (str): key for the value
+
+        Returns:
+            tuple: in the order of :meth:`SQLAlchemyDS.get_header`
+        """
+        taskmanager_id = int(taskmanager_id)
+        with self._lock:
+            tm = self._taskmanager(taskmanager_id)
+            (written_generation_id, _, header), _ = self._entry(taskmanager_id, generation_id, key)
+            return (
+                tm["taskmanager_id"],
+                taskmanager_id,
+                written_generation_id,
+                key,
+                *(header[field] for field in _HEADER_FIELDS),
+            )
+
+    def get_metadata(self, taskmanager_id, generation_id, key):
+        """
+        Return the metadata of the given taskmanager_id, generation_id, key
+
+        Args:
+            taskmanager_id (int): sequence id of the taskmanager
+            generation_id (int): generation id to locate
+            key (str): key for the value
+
+        Returns:
+            tuple: in the order of :meth:`SQLAlchemyDS.get_metadata`
+        """
+        taskmanager_id = int(taskmanager_id)
+        with self._lock:
+            tm = self._taskmanager(taskmanager_id)
+            _, metadata = self._entry(taskmanager_id, generation_id, key)
+            return (
+                tm["taskmanager_id"],
+                taskmanager_id,
+                generation_id,
+                key,
+                *(metadata[field] for field in _METADATA_FIELDS),
+            )
+
+    def get_dataproducts(self, taskmanager_id, key=None):
+        """
+        Return the retained data products of taskmanager_id, one per
+        generation holding them
+
+        Args:
+            taskmanager_id (int): sequence id of the taskmanager
+            key (str): key for the value
+
+        Returns:
+            list: each element is a dict()
+        """
+        taskmanager_id = int(taskmanager_id)
+        with self._lock:
+            return [
+                {
+                    "generation_id": generation_id,
+                    "key": product_key,
+                    "taskmanager_id": taskmanager_id,
+                    "value": value,
+                }
+                for generation_id, block in sorted(self._datablocks.get(taskmanager_id, {}).items())
+                for product_key, ((_, value, _), _) in block.items()
+                if not key or product_key == key
+            ]
+
+    def iter_dataproducts(self, taskmanager_id, key=None):
+        """
+        Yield the retained data products of taskmanager_id, one per
+        generation holding them
+
+        The products are held in memory already, they are collected
+        without copying them.
+
+        Args:
+            taskmanager_id (int): sequence id of the taskmanager
+            key (str): key for the value
+
+        Returns:
+            generator: each element is a dict()
+        """
+        yield from self.get_dataproducts(taskmanager_id, key)
+
+    def iter_history(
+        self, key, taskmanager_names=None, start_time=None, end_time=None, every_nth=1, limit=None, latest=False
+    ):
+        """
+        Yield the retained values of key across taskmanagers, oldest
+        taskmanager first
+
+        Args:
+            key (str): key for the value
+            taskmanager_names (list): names of the taskmanagers to search, all if not given
+            start_time (datetime): earliest start time of the taskmanagers
+            end_time (datetime): latest start time of the taskmanagers
+            every_nth (int): only yield the first of every every_nth values of each taskmanager
+            limit (int): maximum number of values to yield, all if not given
+            latest (bool): only search the newest taskmanager of each name
+
+        Returns:
+            generator: each element is a dict()
+        """
+        if every_nth < 1:
+            raise ValueError(f"every_nth must be a positive integer, not {every_nth}")
+        if limit is not None and limit < 0:
+            raise ValueError(f"limit must not be negative, not {limit}")
+
+        start_time = _as_datetime(start_time)
+        end_time = _as_datetime(end_time)
+        with self._lock:
+            newest = {}
+            for tm in self._taskmanagers.values():
+                newest[tm["name"]] = max(newest.get(tm["name"], 0), tm["sequence_id"])
+            taskmanagers = [
+                tm
+                for tm in sorted(self._taskmanagers.values(), key=lambda tm: (tm["datestamp"], tm["sequence_id"]))
+                if (not taskmanager_names or tm["name"] in taskmanager_names)
+                and (not start_time or tm["datestamp"] >= start_time)
+                and (not end_time or tm["datestamp"] <= end_time)
+                and (not latest or newest[tm["name"]] == tm["sequence_id"])
+            ]
+
+        remaining = limit
+        for tm in taskmanagers:
+            for product in self.get_dataproducts(tm["sequence_id"], key)[::every_nth]:
+                if remaining is not None:
+                    if remaining <= 0:
+                        return
+                    remaining -= 1
+                yield {"name": tm["name"], **product}
+
+    def get_dataproduct(self, taskmanager_id, generation_id, key):
+        """
+        Return the value of the given taskmanager_id, generation_id, key
+
+        Args:
+            taskmanager_id (int): sequence id of the taskmanager
+            generation_id (int): generation id to locate
+            key (str): key for the value
+
+        Returns:
+            obj: The possibly binary value stored earlier
+        """
+        taskmanager_id = int(taskmanager_id)
+        with self._lock:
+            (_, value, _), _ = self._entry(taskmanager_id, generation_id, key)
+            return value
+
+    def get_datablock(self, taskmanager_id, generation_id):
+        """
+        Return the entire datablock of the given taskmanager_id, generation_id
+
+        Args:
+            taskmanager_id (int): sequence id of the taskmanager
+            generation_id (int): generation id to locate
+
+        Returns:
+            dict: with all set keys and their associated values
+        """
+        taskmanager_id = int(taskmanager_id)
+        with self._lock:
+            block = self._datablocks.get(taskmanager_id, {}).get(generation_id, {})
+            return {key: value for key, ((_, value, _), _) in block.items()}
+
+    def get_datablock_keys(self, taskmanager_id, generation_id):
+        """
+        Return the keys of the given taskmanager_id, generation_id
+
+        Args:
+            taskmanager_id (int): sequence id of the taskmanager
+            generation_id (int): generation id to locate
+
+        Returns:
+            list: keys in the order they were first stored
+        """
+        taskmanager_id = int(taskmanager_id)
+        with self._lock:
+            return list(self._datablocks.get(taskmanager_id, {}).get(generation_id, {}))
+
+    def duplicate_datablock(self, taskmanager_id, generation_id, new_generation_id):
+        """
+        Copy the datablock of taskmanager_id, generation_id to new_generation_id
+
+        Args:
+            taskmanager_id (int): sequence id of the taskmanager
+            generation_id (int): generation id to clone
+            new_generation_id (int): generation id to create
+
+        Returns:
+            None
+        """
+        taskmanager_id = int(taskmanager_id)
+        with self._lock:
+            block = self._datablocks.get(taskmanager_id, {}).get(generation_id, {})
+            copied = {key: (product, dict(metadata)) for key, (product, metadata) in block.items()}
+            self._generation(taskmanager_id, new_generation_id).update(copied)
+
+    def delete_data_older_than(self, days, batch_size=None):
+        """
+        Delete taskmanagers, and their products, older than days
+
+        Args:
+            days (int): remove data older than this many days
+            batch_size (int): maximum number of products to delete,
+                None deletes them all
+
+        Returns:
+            int: number of products and taskmanagers deleted
+        """
+        if days <= 0:
+            # do not log stack trace, Exception thrown is handled by the caller
+            raise ValueError(f"Argument has to be positive, non zero integer. Supplied {days}")
+
+        too_old = datetime.datetime.now() - datetime.timedelta(days=days)
+        deleted = 0
+        with self._lock:
+            for sequence_id, tm in list(self._taskmanagers.items()):
+                if tm["datestamp"] >= too_old:
+                    continue
+                generations = self._datablocks.get(sequence_id, {})
+                for generation_id in sorted(generations):
+                    block = generations[generation_id]
+                    while block and (batch_size is None or deleted < batch_size):
+                        block.popitem()
+                        deleted += 1
+                    if block:
+                        return deleted
+                    del generations[generation_id]
+                del self._taskmanagers[sequence_id]
+                self._datablocks.pop(sequence_id, None)
+                self._committed.pop(sequence_id, None)
+                deleted += 1
+        return deleted
+
+    def close(self):
+        """
+        Nothing to close, the data stays available
+
+        Returns:
+            None
+        """
+        self.logger.debug("Terminating a MemoryDataSource datasource")
+
+    def reset_connections(self):
+        """
+        Nothing to reset
+
+        Returns:
+            None
+        """
+        self.logger.debug("Resetting the MemoryDataSource connections")
+
+    def connect(self):
+        """
+        Nothing to connect to
+
+        Returns:
+            None
+        """
+        self.logger.debug("Connecting a MemoryDataSource datasource")
+
+    def get_schema(self, table=None):
+        """
+        Given the table name return it's schema
+        """
+        raise NotImplementedError("This doesn't seem to be used")
@@ -28,12 +28,24 @@ class NullDataSource(ds.DataSource):  # pragma: no cover
     def get_last_generation_id(self, taskmanager_name, taskmanager_id=None):
         super().get_last_generation_id(taskmanager_name, taskmanager_id)
 
+    def commit_generation(self, taskmanager_id, generation_id):
+        super().commit_generation(taskmanager_id, generation_id)
+
+    def get_committed_generation(self, taskmanager_name):
+        super().get_committed_generation(taskmanager_name)
+
     def insert(self, taskmanager_id, generation_id, key, value, header, metadata):
         super().insert(taskmanager_id, generation_id, key, value, header, metadata)
 
     def update(self, taskmanager_id, generation_id, key, value, header, metadata):
         super().update(taskmanager_id, generation_id, key, value, header, metadata)
 
+    def put_many(self, taskmanager_id, generation_id, products, header, metadata):
+        super().put_many(taskmanager_id, generation_id, products, header, metadata)
+
+    def get_envelope(self, taskmanager_id, generation_id, key):
+        super().get_envelope(taskmanager_id, generation_id, key)
+
     def get_header(self, taskmanager_id, generation_id, key):
         super().get_header(taskmanager_id, generation_id, key)
 
@@ -43,17 +55,28 @@ class NullDataSource(ds.DataSource):  # pragma: no cover
     def get_dataproducts(self, taskmanager_id, key=None):
         super().get_dataproducts(taskmanager_id, key)
 
+    def iter_dataproducts(self, taskmanager_id, key=None):
+        super().iter_dataproducts(taskmanager_id, key)
+
+    def iter_history(
+        self, key, taskmanager_names=None, start_time=None, end_time=None, every_nth=1, limit=None, latest=False
+    ):
+        super().iter_history(key, taskmanager_names, start_time, end_time, every_nth, limit, latest)
+
     def get_dataproduct(self, taskmanager_id, generation_id, key):
         super().get_dataproduct(taskmanager_id, generation_id, key)
 
     def get_datablock(self, taskmanager_id, generation_id):
         super().get_datablock(taskmanager_id, generation_id)
 
+    def get_datablock_keys(self, taskmanager_id, generation_id):
+        super().get_datablock_keys(taskmanager_id, generation_id)
+
     def duplicate_datablock(self, taskmanager_id, generation_id, new_generation_id):
         super().duplicate_datablock(taskmanager_id, generation_id, new_generation_id)
 
-    def delete_data_older_than(self, days):
-        super().delete_data_older_than(days)
+    def delete_data_older_than(self, days, batch_size=None):
+        super().delete_data_older_than(days, batch_size)
 
     def close(self):
         super().close()
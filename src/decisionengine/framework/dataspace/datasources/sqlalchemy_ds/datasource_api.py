@@ -3,31 +3,341 @@
 
 """
 The datasource layer for our abstraction
+
+Generations are copy-on-write: duplicating a datablock only copies its
+metadata rows, which record the keys belonging to the new generation.
+Dataproduct and header rows are written for the generation that sets them,
+and a read for (generation, key) resolves to the newest row written at or
+before that generation, provided the key belongs to it.
+
+Values are content addressed: a dataproduct row names the SHA-256 of its
+value, stored once per taskmanager in the blob table, so a product that does
+not change from one generation to the next does not store its value again.
+Values from a size threshold may be kept out of the database, in a
+:class:`file_store.FileStore`.
 """
+import contextlib
 import datetime
+import functools
+import hashlib
 
 import sqlalchemy
 import sqlalchemy.sql as sql
 import structlog
 
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.exc import NoResultFound
-from sqlalchemy.orm import scoped_session
+from sqlalchemy.orm import aliased, scoped_session
 
 import decisionengine.framework.dataspace.datasource as ds
 
 from decisionengine.framework.modules.logging_configDict import DELOGGER_CHANNEL_NAME, LOGGERNAME
 
-from . import db_schema
-from .utils import add_engine_pidguard, clone_model, orm_as_dict
+from . import db_schema, file_store
+from .utils import add_engine_pidguard, add_sqlite_pragmas, orm_as_dict, ProcessLock, SQLITE_PRAGMAS
 
 __all__ = [
     "SQLAlchemyDS",
 ]
 
+_HEADER_FIELDS = ("create_time", "expiration_time", "scheduled_create_time", "creator", "schema_id")
+_METADATA_FIELDS = ("state", "generation_time", "missed_update_count")
+
+# INSERT ... ON CONFLICT DO UPDATE constructs of the dialects providing one
+_DIALECT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+# rows buffered by the server-side cursors streaming dataproducts, which may be large
+_STREAM_ROWS = 8
+
 # setup queue hooks
 add_engine_pidguard(sqlalchemy.pool.QueuePool)
 
 
+def _visible_generation(table, taskmanager_id, generation_id, key):
+    """
+    Subquery selecting the newest generation, at or before generation_id,
+    holding a row of table for key
+
+    Args:
+        table (db_schema.Base): Dataproduct or Header
+        taskmanager_id: id of taskmanager, a value or a column to correlate with
+        generation_id: generation id to resolve, a value or a column to correlate with
+        key: key for the value, a value or a column to correlate with
+
+    Returns:
+        sqlalchemy.sql.expression.ScalarSelect: the generation id
+    """
+    older = aliased(table)
+    return (
+        sql.select(sql.func.max(older.generation_id))
+        .where(older.taskmanager_id == taskmanager_id)
+        .where(older.key == key)
+        .where(older.generation_id <= generation_id)
+        .scalar_subquery()
+    )
+
+
+def _in_generation(table, taskmanager_id, generation_id, key):
+    """
+    Condition true if key belongs to the given generation
+
+    Args:
+        table (db_schema.Base): Metadata or its period table
+        taskmanager_id (str/uuid): id of taskmanager
+        generation_id (int): generation id to check
+        key (str): key for the value
+
+    Returns:
+        sqlalchemy.sql.expression.Exists: the condition
+    """
+    return (
+        sql.exists()
+        .where(table.taskmanager_id == taskmanager_id)
+        .where(table.generation_id == generation_id)
+        .where(table.key == key)
+    )
+
+
+def _visible_in(tables):
+    """
+    Condition joining each metadata row to the dataproduct row holding its
+    value, the newest one written at or before the generation of the
+    metadata row
+
+    Args:
+        tables (db_schema.ProductTables): tables of the taskmanager
+
+    Returns:
+        sqlalchemy.sql.expression.BooleanClauseList: the condition
+    """
+    return sql.and_(
+        tables.dataproduct.taskmanager_id == tables.metadata.taskmanager_id,
+        tables.dataproduct.key == tables.metadata.key,
+        tables.dataproduct.generation_id
+        == _visible_generation(
+            tables.dataproduct, tables.metadata.taskmanager_id, tables.metadata.generation_id, tables.metadata.key
+        ),
+    )
+
+
+def _advance_generation(taskmanager_id, generation_id):
+    """
+    Statement recording generation_id as the last generation of
+    taskmanager_id, unless a later one is recorded already
+
+    Run in the transaction writing the products of the generation, so
+    the recorded generation is committed with them.
+
+    Args:
+        taskmanager_id (str/uuid): id of taskmanager
+        generation_id (int): generation id written
+
+    Returns:
+        sqlalchemy.sql.expression.Update: the statement
+    """
+    return (
+        sql.update(db_schema.Taskmanager)
+        .where(db_schema.Taskmanager.sequence_id == taskmanager_id)
+        .where(
+            sql.or_(
+                db_schema.Taskmanager.generation_id.is_(None),
+                db_schema.Taskmanager.generation_id < generation_id,
+            )
+        )
+        .values(generation_id=generation_id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _value_of(tables):
+    """
+    Columns locating the value of the dataproduct rows, to select with an
+    outer join on :func:`_blob_of` and read with :meth:`SQLAlchemyDS._value`
+
+    Rows written before the blob table have no value_hash and keep their
+    own value.
+
+    Args:
+        tables (db_schema.ProductTables): tables of the taskmanager
+
+    Returns:
+        tuple: the value, external and value_hash columns
+    """
+    return (
+        sql.func.coalesce(tables.blob.value, tables.dataproduct.value).label("value"),
+        tables.blob.external.label("external"),
+        tables.dataproduct.value_hash.label("value_hash"),
+    )
+
+
+def _blob_of(tables):
+    """
+    Condition joining the dataproduct rows to the blob holding their value
+
+    Args:
+        tables (db_schema.ProductTables): tables of the taskmanager
+
+    Returns:
+        sqlalchemy.sql.expression.BooleanClauseList: the condition
+    """
+    return sql.and_(
+        tables.blob.taskmanager_id == tables.dataproduct.taskmanager_id,
+        tables.blob.hash == tables.dataproduct.value_hash,
+    )
+
+
+def _store_blobs(session, table, taskmanager_id, values, store=None):
+    """
+    Store the values of taskmanager_id missing from table
+
+    Values of at least the threshold of store are written to its files,
+    their blob rows are marked external.
+
+    Args:
+        session (sqlalchemy.orm.Session): session of the transaction
+        table (db_schema.Base): Blob or its period table
+        taskmanager_id (str/uuid): id of taskmanager
+        values (dict): values keyed by their hash
+        store (file_store.FileStore): file store of the large values, if any
+
+    Returns:
+        None
+    """
+    existing = set(
+        session.execute(
+            sql.select(table.hash).where(table.taskmanager_id == taskmanager_id).where(table.hash.in_(list(values)))
+        ).scalars()
+    )
+    rows = []
+    for value_hash, value in values.items():
+        if value_hash in existing:
+            continue
+        external = store is not None and len(value) >= store.threshold
+        if external:
+            store.write(taskmanager_id, value_hash, value)
+            value = b""
+        rows.append({"taskmanager_id": taskmanager_id, "hash": value_hash, "value": value, "external": external})
+    if not rows:
+        return
+
+    dialect_insert = _DIALECT_INSERTS.get(session.get_bind().dialect.name)
+    if dialect_insert is not None:
+        # another process may store the same value meanwhile
+        statement = dialect_insert(table.__table__).on_conflict_do_nothing(index_elements=["taskmanager_id", "hash"])
+    else:
+        statement = sql.insert(table.__table__)
+    session.execute(statement, rows)
+
+
+@functools.lru_cache(maxsize=64)
+def _envelope_query(tables):
+    """
+    Statement selecting the value, header and metadata of a key in one
+    round trip, with the taskmanager_id, generation_id and key bound at
+    execution
+
+    Args:
+        tables (db_schema.ProductTables): tables of the taskmanager
+
+    Returns:
+        sqlalchemy.sql.expression.Select: the statement
+    """
+    taskmanager_id = sql.bindparam("taskmanager_id")
+    generation_id = sql.bindparam("generation_id")
+    key = sql.bindparam("key")
+    return (
+        sql.select(
+            *_value_of(tables),
+            *(getattr(tables.header, field) for field in _HEADER_FIELDS),
+            *(getattr(tables.metadata, field) for field in _METADATA_FIELDS),
+        )
+        .select_from(tables.metadata)
+        .join(
+            tables.dataproduct,
+            sql.and_(
+                tables.dataproduct.taskmanager_id == taskmanager_id,
+                tables.dataproduct.key == key,
+                tables.dataproduct.generation_id
+                == _visible_generation(tables.dataproduct, taskmanager_id, generation_id, key),
+            ),
+        )
+        .join(
+            tables.header,
+            sql.and_(
+                tables.header.taskmanager_id == taskmanager_id,
+                tables.header.key == key,
+                tables.header.generation_id == _visible_generation(tables.header, taskmanager_id, generation_id, key),
+            ),
+        )
+        .outerjoin(tables.blob, _blob_of(tables))
+        .where(tables.metadata.taskmanager_id == taskmanager_id)
+        .where(tables.metadata.generation_id == generation_id)
+        .where(tables.metadata.key == key)
+    )
+
+
+def _upsert(session, table, taskmanager_id, generation_id, values):
+    """
+    Insert or update rows of table for taskmanager_id, generation_id
+
+    SQLite and PostgreSQL use a single INSERT ... ON CONFLICT DO UPDATE on
+    the (taskmanager_id, generation_id, key) unique constraint, other
+    dialects look up the existing keys and run an INSERT and an UPDATE.
+
+    Args:
+        session (sqlalchemy.orm.Session): session of the transaction
+        table (db_schema.Base): Metadata, Dataproduct or Header
+        taskmanager_id (str/uuid): id of taskmanager
+        generation_id (int): generation id to write
+        values (dict): column values keyed by product key, with the same columns for every key
+
+    Returns:
+        None
+    """
+    columns = list(next(iter(values.values())))
+    rows = [
+        {"taskmanager_id": taskmanager_id, "generation_id": generation_id, "key": key, **fields}
+        for key, fields in values.items()
+    ]
+
+    dialect_insert = _DIALECT_INSERTS.get(session.get_bind().dialect.name)
+    if dialect_insert is not None:
+        statement = dialect_insert(table.__table__)
+        statement = statement.on_conflict_do_update(
+            index_elements=["taskmanager_id", "generation_id", "key"],
+            set_={column: statement.excluded[column] for column in columns},
+        )
+        session.execute(statement, rows)
+        return
+
+    existing = set(
+        session.execute(
+            sql.select(table.key)
+            .where(table.taskmanager_id == taskmanager_id)
+            .where(table.generation_id == generation_id)
+            .where(table.key.in_(list(values)))
+        ).scalars()
+    )
+    to_insert = [row for row in rows if row["key"] not in existing]
+    # bind parameters may not be named after the columns they set
+    to_update = [{f"b_{name}": value for name, value in row.items()} for row in rows if row["key"] in existing]
+    if to_insert:
+        session.execute(sql.insert(table.__table__), to_insert)
+    if to_update:
+        table_columns = table.__table__.c
+        session.execute(
+            sql.update(table.__table__)
+            .where(table_columns.taskmanager_id == sql.bindparam("b_taskmanager_id"))
+            .where(table_columns.generation_id == sql.bindparam("b_generation_id"))
+            .where(table_columns.key == sql.bindparam("b_key"))
+            .values({column: sql.bindparam(f"b_{column}") for column in columns}),
+            to_update,
+        )
+
+
 class SQLAlchemyDS(ds.DataSource):
     """
     A DecisionEngine data source via the SQL Alchemy ORM
@@ -51,6 +361,21 @@ class SQLAlchemyDS(ds.DataSource):
             }
         }
 
+    With a SQLite database file each process keeps a pool of connections
+    set up with the PRAGMAs of :data:`utils.SQLITE_PRAGMAS` (WAL journal,
+    ``synchronous=NORMAL``, memory mapped reads and a larger page cache),
+    and its writes are serialized.  ``"sqlite_pragmas"`` overrides them,
+    a PRAGMA set to ``None`` keeps the SQLite default.
+
+    With ``"table_period": "daily"`` or ``"weekly"`` the products of new
+    taskmanagers are stored in tables for the day or the week they started,
+    see :mod:`db_schema`, and retention drops the tables of expired periods.
+
+    With ``"file_store": "/path/to/directory"`` values of at least
+    ``"file_store_threshold"`` bytes (8 MiB by default) are stored in files
+    of that directory instead of the database and read memory mapped.
+    Retention deletes the files of the deleted taskmanagers.
+
     Exceptions should be caught and logged by the caller.
     """
 
@@ -65,9 +390,22 @@ class SQLAlchemyDS(ds.DataSource):
             # unit testing in "echo" mode for ease of debugging
             self.logger.debug("Initializing a SQLAlchemyDS datasource")
 
-        self.config_dict = config_dict
+        # the private keys are taken out of a copy, other datasources are built from the same configuration
+        self.config_dict = dict(config_dict)
         self.config_dict["future"] = True  # force 2.0 behavior
+        self.sqlite_pragmas = {**SQLITE_PRAGMAS, **self.config_dict.pop("sqlite_pragmas", {})}
+        self.table_period = self.config_dict.pop("table_period", None)
+        if self.table_period is not None and self.table_period not in db_schema.PERIODS:
+            raise ValueError(f"table_period must be one of {', '.join(db_schema.PERIODS)}, not {self.table_period}")
+        store_path = self.config_dict.pop("file_store", None)
+        store_threshold = self.config_dict.pop("file_store_threshold", file_store.DEFAULT_THRESHOLD)
+        self.file_store = file_store.FileStore(store_path, store_threshold) if store_path else None
+        # tables of the taskmanagers, by sequence id, and the period tables known to exist
+        self._product_tables = {}
+        self._period_tables_created = set()
         self.engine = None
+        # writers of a process take turns instead of contending on the SQLite file lock
+        self._write_lock = contextlib.nullcontext()
         self.sessionmaker = db_schema.SessionMaker
 
         self.connect()
@@ -86,14 +424,134 @@ class SQLAlchemyDS(ds.DataSource):
         self.logger.info("datasource SQLAlchemyDS is creating the database tables (if needed)")
 
         # this is not smart enough to manage schema migrations
-        db_schema.Base.metadata.create_all(bind=self.engine)
+        db_schema.Base.metadata.create_all(
+            bind=self.engine,
+            tables=[table for table in db_schema.Base.metadata.sorted_tables if "period" not in table.info],
+        )
+
+        # columns added after the tables may have been created
+        for column in db_schema.LATE_COLUMNS:
+            self._add_late_column(column)
+
+        # period tables created by an earlier schema
+        periods = set(map(db_schema.period_of_table, sqlalchemy.inspect(self.engine).get_table_names()))
+        periods.discard(None)
+        for period in sorted(periods):
+            tables = self._create_period_tables(period)
+            for column in db_schema.LATE_COLUMNS:
+                for table, period_table in zip(db_schema.PRODUCT_TABLES, tables):
+                    if column.table is table.__table__:
+                        self._add_late_column(period_table.__table__.c[column.name])
+
+        # indexes added after the tables may have been created
+        for index in db_schema.LATE_INDEXES:
+            index.create(bind=self.engine, checkfirst=True)
 
         self.logger.debug("datasource SQLAlchemyDS done creating the database tables")
 
+    def _add_late_column(self, column):
+        """
+        Add column to its table if the table was created without it
+
+        The last generation of the taskmanagers is filled in from their
+        metadata when taskmanager.generation_id is added, and their last
+        complete generation is taken to be the one before it when
+        taskmanager.committed_generation_id is added.
+
+        Args:
+            column (sqlalchemy.Column): a column of :data:`db_schema.LATE_COLUMNS`,
+                or its copy in a period table
+
+        Returns:
+            None
+        """
+        table = column.table
+        if column.name in {found["name"] for found in sqlalchemy.inspect(self.engine).get_columns(table.name)}:
+            return
+
+        self.logger.info(f"datasource SQLAlchemyDS is adding column {column.name} to table {table.name}")
+        column_type = column.type.compile(dialect=self.engine.dialect)
+        try:
+            with self.engine.begin() as connection:
+                connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}")
+                if column is db_schema.Taskmanager.__table__.c.generation_id:
+                    periods = connection.execute(sql.select(db_schema.TaskmanagerPeriod.period).distinct()).scalars()
+                    for tables in (db_schema.PRODUCT_TABLES, *map(db_schema.period_tables, periods)):
+                        connection.execute(
+                            sql.update(db_schema.Taskmanager)
+                            .where(db_schema.Taskmanager.generation_id.is_(None))
+                            .values(
+                                generation_id=sql.select(sql.func.max(tables.metadata.generation_id))
+                                .where(tables.metadata.taskmanager_id == db_schema.Taskmanager.sequence_id)
+                                .scalar_subquery()
+                            )
+                        )
+                if column is db_schema.Taskmanager.__table__.c.committed_generation_id:
+                    connection.execute(
+                        sql.update(db_schema.Taskmanager)
+                        .where(db_schema.Taskmanager.generation_id > 1)
+                        .values(committed_generation_id=db_schema.Taskmanager.generation_id - 1)
+                    )
+        except sqlalchemy.exc.DatabaseError:
+            # another process may have added it first
+            if column.name not in {found["name"] for found in sqlalchemy.inspect(self.engine).get_columns(table.name)}:
+                raise
+
+    def _create_period_tables(self, period):
+        """
+        Create the period tables of period, if needed
+
+        Args:
+            period (str): suffix of the period tables
+
+        Returns:
+            db_schema.ProductTables: the period tables
+        """
+        tables = db_schema.period_tables(period)
+        if period not in self._period_tables_created:
+            for table in tables:
+                try:
+                    table.__table__.create(bind=self.engine, checkfirst=True)
+                except sqlalchemy.exc.DatabaseError:
+                    # another process may have created it first
+                    if not sqlalchemy.inspect(self.engine).has_table(table.__table__.name):
+                        raise
+            self._period_tables_created.add(period)
+        return tables
+
+    def _tables(self, taskmanager_id):
+        """
+        Return the tables holding the products of taskmanager_id
+
+        Args:
+            taskmanager_id (int): sequence id of the taskmanager
+
+        Returns:
+            db_schema.ProductTables: the tables
+        """
+        taskmanager_id = int(taskmanager_id)
+        tables = self._product_tables.get(taskmanager_id)
+        if tables is None:
+            with self.engine.connect() as connection:
+                row = connection.execute(
+                    sql.select(db_schema.Taskmanager.sequence_id, db_schema.TaskmanagerPeriod.period)
+                    .outerjoin(db_schema.TaskmanagerPeriod)
+                    .where(db_schema.Taskmanager.sequence_id == taskmanager_id)
+                ).one_or_none()
+            if row is None:
+                # nothing stored for an unknown taskmanager, do not remember it
+                return db_schema.PRODUCT_TABLES
+            tables = db_schema.period_tables(row.period) if row.period else db_schema.PRODUCT_TABLES
+            self._product_tables[taskmanager_id] = tables
+        return tables
+
     def store_taskmanager(self, name, taskmanager_id, datestamp=None):
         """
         Store TaskManager in database
 
+        With a table_period, the period tables of the datestamp are created
+        if needed and hold the products of the taskmanager.
+
         Args:
             name (str): name of taskmanager to retrieve
             taskmanager_id (str/uuid): id of taskmanager to retrieve
@@ -105,11 +563,22 @@ class SQLAlchemyDS(ds.DataSource):
         my_tm = db_schema.Taskmanager(name=name, taskmanager_id=taskmanager_id)
         if datestamp:
             my_tm.datestamp = datestamp
-        with self.session() as session:
-            session.add(my_tm)
-            session.commit()
-            session.refresh(my_tm)
-
+        with self._write_lock:
+            tables = db_schema.PRODUCT_TABLES
+            if self.table_period:
+                # the period follows the clock retention compares datestamps with
+                my_tm.datestamp = datestamp or datetime.datetime.now()
+                period = db_schema.period_of(my_tm.datestamp, self.table_period)
+                tables = self._create_period_tables(period)
+            with self.session() as session:
+                session.add(my_tm)
+                session.flush()
+                if self.table_period:
+                    session.add(db_schema.TaskmanagerPeriod(sequence_id=my_tm.sequence_id, period=period))
+                session.commit()
+                session.refresh(my_tm)
+
+        self._product_tables[my_tm.sequence_id] = tables
         return my_tm.sequence_id
 
     def get_taskmanager(self, taskmanager_name, taskmanager_id=None):
@@ -174,23 +643,84 @@ class SQLAlchemyDS(ds.DataSource):
             taskmanager_name (str): name of taskmanager to retrieve
             taskmanager_id (str/uuid): id of taskmanager to retrieve
 
+        The generation is the one recorded on the taskmanager rows by the
+        writes, see :func:`_advance_generation`, there is no need to scan
+        the metadata.
+
         Returns:
             int: the largest generation stored within the database
         """
+        query = sql.select(sql.func.max(db_schema.Taskmanager.generation_id)).where(
+            db_schema.Taskmanager.name == taskmanager_name
+        )
+        if taskmanager_id:
+            query = query.where(db_schema.Taskmanager.taskmanager_id == taskmanager_id)
+
         with self.session() as session:
-            query = (
-                session.query(sql.func.max(db_schema.Dataproduct.generation_id).label("generation_id"))
-                .join(db_schema.Taskmanager)
-                .filter(db_schema.Taskmanager.name == taskmanager_name)
+            result = session.execute(query).scalar()
+
+        if result is None:
+            raise NoResultFound("No matching entries found")
+        return result
+
+    def commit_generation(self, taskmanager_id, generation_id):
+        """
+        Record generation_id as the last complete generation of
+        taskmanager_id, unless a later one is recorded already
+
+        Args:
+            taskmanager_id (int): sequence id of the taskmanager
+            generation_id (int): generation whose products are all written
+
+        Returns:
+            None
+        """
+        with self._write_lock, self.session() as session:
+            session.execute(
+                sql.update(db_schema.Taskmanager)
+                .where(db_schema.Taskmanager.sequence_id == taskmanager_id)
+                .where(
+                    sql.or_(
+                        db_schema.Taskmanager.committed_generation_id.is_(None),
+                        db_schema.Taskmanager.committed_generation_id < generation_id,
+                    )
+                )
+                .values(committed_generation_id=generation_id)
+                .execution_options(synchronize_session=False)
             )
+            session.commit()
 
-            if taskmanager_id:
-                query = query.filter(db_schema.Taskmanager.taskmanager_id == taskmanager_id)
+    def get_committed_generation(self, taskmanager_name):
+        """
+        Find the newest taskmanager named taskmanager_name with a complete
+        generation, with one lookup of the taskmanager name index
+
+        Readers of that generation never see a partly written one, the
+        generation is only recorded once all its products are committed.
+
+        Args:
+            taskmanager_name (str): name of taskmanager to retrieve
+
+        Returns:
+            dict: sequence_id, taskmanager_id and the last complete generation_id
+        """
+        query = (
+            sql.select(
+                db_schema.Taskmanager.sequence_id,
+                db_schema.Taskmanager.taskmanager_id,
+                db_schema.Taskmanager.committed_generation_id.label("generation_id"),
+            )
+            .where(db_schema.Taskmanager.name == taskmanager_name)
+            .where(db_schema.Taskmanager.committed_generation_id.is_not(None))
+            .order_by(db_schema.Taskmanager.sequence_id.desc())
+            .limit(1)
+        )
+        with self.session() as session:
+            row = session.execute(query).one_or_none()
 
-            result = query.scalar()
-            if result is None:
-                raise NoResultFound("No matching entries found")
-            return result
+        if row is None:
+            raise NoResultFound(f"No complete generation of taskmanager {taskmanager_name}")
+        return dict(row._mapping)
 
     def insert(self, taskmanager_id, generation_id, key, value, header, metadata):
         """
@@ -208,13 +738,16 @@ class SQLAlchemyDS(ds.DataSource):
         Returns:
             None
         """
-        my_dataproduct = db_schema.Dataproduct(
+        tables = self._tables(taskmanager_id)
+        value_hash = hashlib.sha256(value).hexdigest()
+        my_dataproduct = tables.dataproduct(
             taskmanager_id=taskmanager_id,
             generation_id=generation_id,
             key=key,
-            value=value,
+            value=b"",
+            value_hash=value_hash,
         )
-        my_header = db_schema.Header(
+        my_header = tables.header(
             taskmanager_id=taskmanager_id,
             generation_id=generation_id,
             key=key,
@@ -224,7 +757,7 @@ class SQLAlchemyDS(ds.DataSource):
             creator=header.get("creator"),
             schema_id=header.get("schema_id"),
         )
-        my_metadata = db_schema.Metadata(
+        my_metadata = tables.metadata(
             taskmanager_id=taskmanager_id,
             generation_id=generation_id,
             key=key,
@@ -233,8 +766,11 @@ class SQLAlchemyDS(ds.DataSource):
             missed_update_count=metadata.get("missed_update_count"),
         )
 
-        with self.session() as session:
+        with self._write_lock, self.session() as session:
+            _store_blobs(session, tables.blob, taskmanager_id, {value_hash: value}, self.file_store)
             session.add_all([my_dataproduct, my_header, my_metadata])
+            session.flush()
+            session.execute(_advance_generation(taskmanager_id, generation_id))
             session.commit()
             session.refresh(my_dataproduct)
             session.refresh(my_header)
@@ -242,9 +778,13 @@ class SQLAlchemyDS(ds.DataSource):
 
     def update(self, taskmanager_id, generation_id, key, value, header, metadata):
         """
-        Update the data in respective tables for the given
+        Insert or update the data in respective tables for the given
         taskmanager_id, generation_id, key
 
+        When the value was only inherited from an earlier generation, the
+        dataproduct and header rows are written for this generation, leaving
+        the earlier ones untouched.
+
         Args:
             taskmanager_id (str/uuid): id of taskmanager to retrieve
             generation_id (int): generation id to update
@@ -256,60 +796,107 @@ class SQLAlchemyDS(ds.DataSource):
         Returns:
             None
         """
-        # fetch the records
-        with self.session() as session:
-            my_dataproduct = (
-                session.query(db_schema.Dataproduct)
-                .filter(db_schema.Dataproduct.taskmanager_id == taskmanager_id)
-                .filter(db_schema.Dataproduct.generation_id == generation_id)
-                .filter(db_schema.Dataproduct.key == key)
-                .one()
-            )
-            my_header = (
-                session.query(db_schema.Header)
-                .filter(db_schema.Header.taskmanager_id == taskmanager_id)
-                .filter(db_schema.Header.generation_id == generation_id)
-                .filter(db_schema.Header.key == key)
-                .one()
-            )
-            my_metadata = (
-                session.query(db_schema.Metadata)
-                .filter(db_schema.Metadata.taskmanager_id == taskmanager_id)
-                .filter(db_schema.Metadata.generation_id == generation_id)
-                .filter(db_schema.Metadata.key == key)
-                .one()
-            )
+        self.put_many(taskmanager_id, generation_id, {key: value}, header, metadata)
 
-        # update the attribs
+    def put_many(self, taskmanager_id, generation_id, products, header, metadata):
+        """
+        Insert or update several products of the given taskmanager_id,
+        generation_id in a single transaction
 
-        # dataproduct
-        my_dataproduct.value = value
+        Each table is written with a single executemany upsert, see
+        :func:`_upsert`.  Header and metadata fields missing from header
+        and metadata keep their stored values.  Only the values not stored
+        yet for the taskmanager are written to the blob table.
 
-        # header
-        my_header.create_time = header.get("create_time", my_header.create_time)
-        my_header.expiration_time = header.get("expiration_time", my_header.expiration_time)
-        my_header.scheduled_create_time = header.get("scheduled_create_time", my_header.scheduled_create_time)
-        my_header.creator = header.get("creator", my_header.creator)
-        my_header.schema_id = header.get("schema_id", my_header.schema_id)
+        Args:
+            taskmanager_id (str/uuid): id of taskmanager to retrieve
+            generation_id (int): generation id to write
+            products (dict): values keyed by product key
+            header (datablock.Header): Header shared by the values
+            metadata (datablock.Metadata): Metadata shared by the values
 
-        # metadata
-        my_metadata.state = metadata.get("state", my_metadata.state)
-        my_metadata.generation_time = metadata.get("generation_time", my_metadata.generation_time)
-        my_metadata.missed_update_count = metadata.get("missed_update_count", my_metadata.missed_update_count)
+        Returns:
+            None
+        """
+        if not products:
+            return
+
+        tables = self._tables(taskmanager_id)
+        header_fields = {field: header[field] for field in _HEADER_FIELDS if field in header}
+        metadata_fields = {field: metadata[field] for field in _METADATA_FIELDS if field in metadata}
+        hashes = {key: hashlib.sha256(value).hexdigest() for key, value in products.items()}
+        rows = {
+            tables.metadata: {key: metadata_fields for key in products},
+            tables.dataproduct: {key: {"value": b"", "value_hash": value_hash} for key, value_hash in hashes.items()},
+            tables.header: {key: header_fields for key in products},
+        }
 
-        # save the changes and validate we can fetch the results
-        with self.session() as session:
-            session.add_all([my_dataproduct, my_header, my_metadata])
+        with self._write_lock, self.session() as session:
+            _store_blobs(
+                session,
+                tables.blob,
+                taskmanager_id,
+                {hashes[key]: value for key, value in products.items()},
+                self.file_store,
+            )
+            for table, values in rows.items():
+                _upsert(session, table, taskmanager_id, generation_id, values)
+            session.execute(_advance_generation(taskmanager_id, generation_id))
             session.commit()
-            session.refresh(my_dataproduct)
-            session.refresh(my_header)
-            session.refresh(my_metadata)
+
+    def _value(self, taskmanager_id, row):
+        """
+        Return the value of a row selected with :func:`_value_of`
+
+        Args:
+            taskmanager_id (str/uuid): id of taskmanager of the row
+            row (sqlalchemy.engine.Row): the row
+
+        Returns:
+            obj: the value, memory mapped if it is in the file store
+        """
+        if row.external:
+            if self.file_store is None:
+                raise RuntimeError(f"Value {row.value_hash} is in a file store, none is configured")
+            return self.file_store.read(taskmanager_id, row.value_hash)
+        return row.value
+
+    def get_envelope(self, taskmanager_id, generation_id, key):
+        """
+        Return the value, header and metadata for the given
+        taskmanager_id, generation_id, key with a single query
+
+        Args:
+            taskmanager_id (str/uuid): id of taskmanager to retrieve
+            generation_id (int): generation id to locate
+            key (str): key for the value
+
+        Returns:
+            dict: value, header and metadata fields
+        """
+        tables = self._tables(taskmanager_id)
+        try:
+            with self.session() as session:
+                row = session.execute(
+                    _envelope_query(tables),
+                    {"taskmanager_id": taskmanager_id, "generation_id": generation_id, "key": key},
+                ).one()
+        except NoResultFound as __e:
+            raise KeyError("Converted to implementation agnostic exception").with_traceback(__e.__traceback__)
+
+        envelope = dict(row._mapping)
+        del envelope["external"], envelope["value_hash"]
+        envelope["value"] = self._value(taskmanager_id, row)
+        return envelope
 
     def get_header(self, taskmanager_id, generation_id, key):
         """
         Return the header from the header table for the given
         taskmanager_id, generation_id, key
 
+        The header is the one visible from the generation, its
+        generation_id is the generation that wrote it.
+
         Args:
             taskmanager_id (str/uuid): id of taskmanager to retrieve
             generation_id (int): generation id to locate
@@ -327,23 +914,28 @@ class SQLAlchemyDS(ds.DataSource):
                    header.creator,
                    header.schema_id
         """
+        tables = self._tables(taskmanager_id)
         with self.session() as session:
             my_header = (
                 session.query(
                     db_schema.Taskmanager.taskmanager_id.label("tm_uuid"),
-                    db_schema.Header.taskmanager_id,
-                    db_schema.Header.generation_id,
-                    db_schema.Header.key,
-                    db_schema.Header.create_time,
-                    db_schema.Header.expiration_time,
-                    db_schema.Header.scheduled_create_time,
-                    db_schema.Header.creator,
-                    db_schema.Header.schema_id,
+                    tables.header.taskmanager_id,
+                    tables.header.generation_id,
+                    tables.header.key,
+                    tables.header.create_time,
+                    tables.header.expiration_time,
+                    tables.header.scheduled_create_time,
+                    tables.header.creator,
+                    tables.header.schema_id,
                 )
                 .join(db_schema.Taskmanager)
-                .filter(db_schema.Header.taskmanager_id == taskmanager_id)
-                .filter(db_schema.Header.generation_id == generation_id)
-                .filter(db_schema.Header.key == key)
+                .filter(tables.header.taskmanager_id == taskmanager_id)
+                .filter(tables.header.key == key)
+                .filter(
+                    tables.header.generation_id
+                    == _visible_generation(tables.header, taskmanager_id, generation_id, key)
+                )
+                .filter(_in_generation(tables.metadata, taskmanager_id, generation_id, key))
                 .one()
             )
 
@@ -379,21 +971,22 @@ class SQLAlchemyDS(ds.DataSource):
                    metadata.generation_time,
                    metadata.missed_update_count
         """
+        tables = self._tables(taskmanager_id)
         with self.session() as session:
             my_metadata = (
                 session.query(
                     db_schema.Taskmanager.taskmanager_id.label("tm_uuid"),
-                    db_schema.Metadata.taskmanager_id,
-                    db_schema.Metadata.generation_id,
-                    db_schema.Metadata.key,
-                    db_schema.Metadata.state,
-                    db_schema.Metadata.generation_time,
-                    db_schema.Metadata.missed_update_count,
+                    tables.metadata.taskmanager_id,
+                    tables.metadata.generation_id,
+                    tables.metadata.key,
+                    tables.metadata.state,
+                    tables.metadata.generation_time,
+                    tables.metadata.missed_update_count,
                 )
                 .join(db_schema.Taskmanager)
-                .filter(db_schema.Metadata.taskmanager_id == taskmanager_id)
-                .filter(db_schema.Metadata.generation_id == generation_id)
-                .filter(db_schema.Metadata.key == key)
+                .filter(tables.metadata.taskmanager_id == taskmanager_id)
+                .filter(tables.metadata.generation_id == generation_id)
+                .filter(tables.metadata.key == key)
                 .one()
             )
 
@@ -417,34 +1010,159 @@ class SQLAlchemyDS(ds.DataSource):
             key (str): key for the value
 
         Returns:
-            tuple: each element is the matching row as a dict()
+            list: each element is the matching row as a dict()
         """
-        with self.session() as session:
-            query = (
-                session.query(
-                    db_schema.Dataproduct.taskmanager_id,
-                    db_schema.Dataproduct.generation_id,
-                    db_schema.Dataproduct.key,
-                    db_schema.Dataproduct.value,
-                )
-                .filter(db_schema.Dataproduct.taskmanager_id == taskmanager_id)
-                .order_by(db_schema.Dataproduct.id)
+        return list(self.iter_dataproducts(taskmanager_id, key))
+
+    def iter_dataproducts(self, taskmanager_id, key=None):
+        """
+        Yield the data products associated with taskmanager_id one at a
+        time, one per generation holding them, in generation order
+
+        A generation that did not write a key still yields the value it
+        shares with the older generations.
+
+        The rows are fetched from a server-side cursor, at most
+        :data:`_STREAM_ROWS` at a time, on a connection of their own,
+        held until the generator is exhausted or closed.
+
+        Args:
+            taskmanager_id (str/uuid): id of taskmanager to retrieve
+            key (str): key for the value
+
+        Returns:
+            generator: each element is the matching row as a dict()
+        """
+        tables = self._tables(taskmanager_id)
+        query = (
+            sql.select(
+                tables.metadata.taskmanager_id,
+                tables.metadata.generation_id,
+                tables.metadata.key,
+                *_value_of(tables),
             )
+            .select_from(tables.metadata)
+            .join(tables.dataproduct, _visible_in(tables))
+            .outerjoin(tables.blob, _blob_of(tables))
+            .where(tables.metadata.taskmanager_id == taskmanager_id)
+            .order_by(tables.metadata.generation_id, tables.metadata.id)
+        )
+        if key:
+            query = query.where(tables.metadata.key == key)
+
+        with self.engine.connect() as connection:
+            result = connection.execution_options(stream_results=True).execute(query).yield_per(_STREAM_ROWS)
+            for row in result:
+                yield {
+                    "generation_id": row.generation_id,
+                    "key": row.key,
+                    "taskmanager_id": row.taskmanager_id,
+                    "value": self._value(taskmanager_id, row),
+                }
+
+    def iter_history(
+        self, key, taskmanager_names=None, start_time=None, end_time=None, every_nth=1, limit=None, latest=False
+    ):
+        """
+        Yield the values of key across taskmanagers, oldest taskmanager
+        first and one per generation holding key within each, like
+        :meth:`iter_dataproducts`
 
-            if key:
-                query = query.filter(db_schema.Dataproduct.key == key)
+        The matching taskmanagers are looked up first, then the values of
+        all of them that share a table layout are read by one query, which
+        samples and limits the metadata rows of the generations before
+        resolving their values on the (taskmanager_id, key, generation_id)
+        index, and is streamed like :meth:`iter_dataproducts`.
 
-            rows = []
-            for row in query.all():
-                rows.append(
-                    {
+        Args:
+            key (str): key for the value
+            taskmanager_names (list): names of the taskmanagers to search, all if not given
+            start_time (datetime): earliest start time of the taskmanagers
+            end_time (datetime): latest start time of the taskmanagers
+            every_nth (int): only yield the first of every every_nth values of each taskmanager
+            limit (int): maximum number of values to yield, all if not given
+            latest (bool): only search the newest taskmanager of each name
+
+        Returns:
+            generator: each element is a dict() with the name, taskmanager_id,
+                generation_id, key and value of a row
+        """
+        if every_nth < 1:
+            raise ValueError(f"every_nth must be a positive integer, not {every_nth}")
+        if limit is not None and limit < 0:
+            raise ValueError(f"limit must not be negative, not {limit}")
+
+        taskmanagers = sql.select(db_schema.Taskmanager.sequence_id).order_by(
+            db_schema.Taskmanager.datestamp, db_schema.Taskmanager.sequence_id
+        )
+        if taskmanager_names:
+            taskmanagers = taskmanagers.where(db_schema.Taskmanager.name.in_(list(taskmanager_names)))
+        if start_time:
+            taskmanagers = taskmanagers.where(db_schema.Taskmanager.datestamp >= start_time)
+        if end_time:
+            taskmanagers = taskmanagers.where(db_schema.Taskmanager.datestamp <= end_time)
+        if latest:
+            taskmanagers = taskmanagers.where(
+                db_schema.Taskmanager.sequence_id.in_(
+                    sql.select(sql.func.max(db_schema.Taskmanager.sequence_id)).group_by(db_schema.Taskmanager.name)
+                )
+            )
+        with self.engine.connect() as connection:
+            sequence_ids = connection.execute(taskmanagers).scalars().all()
+
+        # the taskmanagers of each table layout, in the order they started
+        by_tables = {}
+        for sequence_id in sequence_ids:
+            by_tables.setdefault(self._tables(sequence_id), []).append(sequence_id)
+
+        remaining = limit
+        for tables, sequence_ids in by_tables.items():
+            if remaining == 0:
+                return
+            metadata = tables.metadata
+            rows = sql.select(metadata.id).where(metadata.taskmanager_id.in_(sequence_ids)).where(metadata.key == key)
+            if every_nth > 1:
+                ranked = rows.add_columns(
+                    sql.func.row_number()
+                    .over(partition_by=metadata.taskmanager_id, order_by=(metadata.generation_id, metadata.id))
+                    .label("rank")
+                ).subquery()
+                rows = sql.select(ranked.c.id).where((ranked.c.rank - 1) % every_nth == 0)
+            query = (
+                sql.select(
+                    db_schema.Taskmanager.name,
+                    metadata.taskmanager_id,
+                    metadata.generation_id,
+                    metadata.key,
+                    *_value_of(tables),
+                )
+                .select_from(metadata)
+                .join(db_schema.Taskmanager, db_schema.Taskmanager.sequence_id == metadata.taskmanager_id)
+                .join(tables.dataproduct, _visible_in(tables))
+                .outerjoin(tables.blob, _blob_of(tables))
+                .where(metadata.id.in_(rows))
+                .order_by(
+                    db_schema.Taskmanager.datestamp,
+                    metadata.taskmanager_id,
+                    metadata.generation_id,
+                    metadata.id,
+                )
+            )
+            if remaining is not None:
+                query = query.limit(remaining)
+
+            with self.engine.connect() as connection:
+                result = connection.execution_options(stream_results=True).execute(query).yield_per(_STREAM_ROWS)
+                for row in result:
+                    if remaining is not None:
+                        remaining -= 1
+                    yield {
+                        "name": row.name,
+                        "taskmanager_id": row.taskmanager_id,
                         "generation_id": row.generation_id,
                         "key": row.key,
-                        "taskmanager_id": row.taskmanager_id,
-                        "value": row.value,
+                        "value": self._value(row.taskmanager_id, row),
                     }
-                )
-            return rows
 
     def get_dataproduct(self, taskmanager_id, generation_id, key):
         """
@@ -459,19 +1177,26 @@ class SQLAlchemyDS(ds.DataSource):
         Returns:
             obj: The possibly binary value stored earlier
         """
+        tables = self._tables(taskmanager_id)
         try:
             with self.session() as session:
                 my_dataproduct = (
-                    session.query(db_schema.Dataproduct.value)
-                    .filter(db_schema.Dataproduct.taskmanager_id == taskmanager_id)
-                    .filter(db_schema.Dataproduct.generation_id == generation_id)
-                    .filter(db_schema.Dataproduct.key == key)
+                    session.query(*_value_of(tables))
+                    .select_from(tables.dataproduct)
+                    .outerjoin(tables.blob, _blob_of(tables))
+                    .filter(tables.dataproduct.taskmanager_id == taskmanager_id)
+                    .filter(tables.dataproduct.key == key)
+                    .filter(
+                        tables.dataproduct.generation_id
+                        == _visible_generation(tables.dataproduct, taskmanager_id, generation_id, key)
+                    )
+                    .filter(_in_generation(tables.metadata, taskmanager_id, generation_id, key))
                     .one()
                 )
         except NoResultFound as __e:
             raise KeyError("Converted to implementation agnostic exception").with_traceback(__e.__traceback__)
 
-        return my_dataproduct.value
+        return self._value(taskmanager_id, my_dataproduct)
 
     def get_datablock(self, taskmanager_id, generation_id):
         """
@@ -485,25 +1210,68 @@ class SQLAlchemyDS(ds.DataSource):
         Returns:
             dict: with all set keys and their associated values
         """
+        tables = self._tables(taskmanager_id)
         with self.session() as session:
             rows = (
-                session.query(db_schema.Dataproduct.key, db_schema.Dataproduct.value)
-                .filter(db_schema.Dataproduct.taskmanager_id == taskmanager_id)
-                .filter(db_schema.Dataproduct.generation_id == generation_id)
+                session.query(tables.metadata.key, *_value_of(tables))
+                .select_from(tables.metadata)
+                .join(
+                    tables.dataproduct,
+                    sql.and_(
+                        tables.dataproduct.taskmanager_id == tables.metadata.taskmanager_id,
+                        tables.dataproduct.key == tables.metadata.key,
+                    ),
+                )
+                .outerjoin(tables.blob, _blob_of(tables))
+                .filter(tables.metadata.taskmanager_id == taskmanager_id)
+                .filter(tables.metadata.generation_id == generation_id)
+                .filter(
+                    tables.dataproduct.generation_id
+                    == _visible_generation(
+                        tables.dataproduct, tables.metadata.taskmanager_id, generation_id, tables.metadata.key
+                    )
+                )
                 .all()
             )
 
         datablock = {}
         for row in rows:
-            datablock[row.key] = row.value
+            datablock[row.key] = self._value(taskmanager_id, row)
 
         return datablock
 
+    def get_datablock_keys(self, taskmanager_id, generation_id):
+        """
+        Return the keys of the datablock for the given taskmanager_id,
+        generation_id without loading any dataproduct
+
+        Args:
+            taskmanager_id (str/uuid): id of taskmanager to retrieve
+            generation_id (int): generation id to locate
+
+        Returns:
+            list: keys in the order they were first stored
+        """
+        tables = self._tables(taskmanager_id)
+        with self.session() as session:
+            rows = (
+                session.query(tables.metadata.key)
+                .filter(tables.metadata.taskmanager_id == taskmanager_id)
+                .filter(tables.metadata.generation_id == generation_id)
+                .order_by(tables.metadata.id)
+                .all()
+            )
+
+        return [row.key for row in rows]
+
     def duplicate_datablock(self, taskmanager_id, generation_id, new_generation_id):
         """
         For the given taskmanager_id, make a copy of the datablock with given
         generation_id, set the generation_id for the datablock copy
 
+        Only the metadata rows are copied, the new generation shares the
+        dataproduct and header rows of the older ones until it writes its own.
+
         Args:
             taskmanager_id (str/uuid): id of taskmanager to retrieve
             generation_id (int): generation id to clone
@@ -512,62 +1280,174 @@ class SQLAlchemyDS(ds.DataSource):
         Returns:
             None
         """
-
-        existing_blocks = []
-
-        # fetch the records
-        with self.session() as session:
-            existing_blocks.extend(
-                session.query(db_schema.Dataproduct)
-                .filter(db_schema.Dataproduct.taskmanager_id == taskmanager_id)
-                .filter(db_schema.Dataproduct.generation_id == generation_id)
-                .all()
-            )
-            existing_blocks.extend(
-                session.query(db_schema.Header)
-                .filter(db_schema.Header.taskmanager_id == taskmanager_id)
-                .filter(db_schema.Header.generation_id == generation_id)
-                .all()
-            )
-            existing_blocks.extend(
-                session.query(db_schema.Metadata)
-                .filter(db_schema.Metadata.taskmanager_id == taskmanager_id)
-                .filter(db_schema.Metadata.generation_id == generation_id)
-                .all()
+        tables = self._tables(taskmanager_id)
+        columns = ("taskmanager_id", "generation_id", "key", "state", "generation_time", "missed_update_count")
+        rows = (
+            sql.select(
+                tables.metadata.taskmanager_id,
+                sql.literal(new_generation_id, type_=sqlalchemy.Integer),
+                tables.metadata.key,
+                tables.metadata.state,
+                tables.metadata.generation_time,
+                tables.metadata.missed_update_count,
             )
+            .where(tables.metadata.taskmanager_id == taskmanager_id)
+            .where(tables.metadata.generation_id == generation_id)
+        )
 
-        new_blocks = []
+        with self._write_lock, self.session() as session:
+            if session.execute(sql.insert(tables.metadata).from_select(columns, rows)).rowcount:
+                session.execute(_advance_generation(taskmanager_id, new_generation_id))
+            session.commit()
 
-        # match content with new generation id
-        for block in existing_blocks:
-            new_blocks.append(clone_model(block, generation_id=new_generation_id))
+    def _drop_expired_periods(self, to_old):
+        """
+        Drop the period tables of the periods ended before to_old, with
+        their taskmanagers
 
-        # save the new records and validate we can fetch the results
-        with self.session() as session:
-            session.add_all(new_blocks)
-            session.commit()
-            map(session.refresh, existing_blocks)
+        Args:
+            to_old (datetime.datetime): expiry of the data
 
-    def delete_data_older_than(self, days):
+        Returns:
+            int: number of taskmanagers deleted
+        """
+        with self.session() as session:
+            periods = set(session.execute(sql.select(db_schema.TaskmanagerPeriod.period).distinct()).scalars())
+        # tables left over by an interrupted drop
+        periods.update(map(db_schema.period_of_table, sqlalchemy.inspect(self.engine).get_table_names()))
+        periods.discard(None)
+
+        deleted = 0
+        for period in sorted(periods):
+            if db_schema.period_end(period) > to_old:
+                continue
+            self.logger.info(f"Dropping the tables of expired period {period}")
+            expired = sql.select(db_schema.TaskmanagerPeriod.sequence_id).where(
+                db_schema.TaskmanagerPeriod.period == period
+            )
+            with self.engine.begin() as connection:
+                for table in db_schema.period_tables(period):
+                    table.__table__.drop(bind=connection, checkfirst=True)
+                sequence_ids = connection.execute(expired).scalars().all()
+                connection.execute(
+                    sql.delete(db_schema.TaskmanagerPeriod).where(db_schema.TaskmanagerPeriod.period == period)
+                )
+                deleted += connection.execute(
+                    sql.delete(db_schema.Taskmanager).where(db_schema.Taskmanager.sequence_id.in_(sequence_ids))
+                ).rowcount
+            self._period_tables_created.discard(period)
+            for sequence_id in sequence_ids:
+                self._product_tables.pop(sequence_id, None)
+        return deleted
+
+    def delete_data_older_than(self, days, batch_size=None):
         """
         Delete data older that interval
 
+        The period tables of the periods that ended before the interval are
+        dropped, with their taskmanagers.  Then the metadata, headers, products
+        and blobs of the other expired taskmanagers are deleted oldest first,
+        followed by the taskmanagers left without any.  With batch_size, at
+        most batch_size of those rows are deleted, so a
+        large backlog is removed by repeated calls, each its own short
+        transaction, that carry on from the rows the previous calls left.
+        The call that completes the deletion also cleans up the file store,
+        see :meth:`_sweep_file_store`.
+
         Args:
             days (int): remove data older than this many days
+            batch_size (int): maximum number of metadata, header, product
+                and blob rows to delete, None deletes them all
 
         Returns:
-            None
+            int: number of rows deleted, not counting the rows of dropped tables
         """
         if days <= 0:
             # do not log stack trace, Exception thrown is handled by the caller
             raise ValueError(f"Argument has to be positive, non zero integer. Supplied {days}")
 
         to_old = datetime.datetime.now() - datetime.timedelta(days=days)
-        with self.session() as session:
-            session.query(db_schema.Taskmanager).filter(db_schema.Taskmanager.datestamp < to_old).delete(
-                synchronize_session=False
+        expired = sql.select(db_schema.Taskmanager.sequence_id).where(db_schema.Taskmanager.datestamp < to_old)
+        with self._write_lock:
+            dropped = self._drop_expired_periods(to_old)
+
+            with self.session() as session:
+                sequence_ids = session.execute(expired).scalars().all()
+            tables = {db_schema.PRODUCT_TABLES: None}
+            tables.update(dict.fromkeys(map(self._tables, sequence_ids)))
+
+            deleted = 0
+            with self.session() as session:
+                # metadata first, so the keys of a generation disappear before their products
+                for table in (table for product_tables in tables for table in product_tables):
+                    rows = sql.select(table.id).where(table.taskmanager_id.in_(expired))
+                    if batch_size is not None:
+                        if deleted >= batch_size:
+                            break
+                        rows = rows.order_by(table.id).limit(batch_size - deleted)
+                    deleted += session.execute(
+                        sql.delete(table).where(table.id.in_(rows)).execution_options(synchronize_session=False)
+                    ).rowcount
+                else:
+                    empty = (
+                        session.execute(
+                            expired.where(
+                                *(
+                                    ~sql.exists().where(table.taskmanager_id == db_schema.Taskmanager.sequence_id)
+                                    for product_tables in tables
+                                    for table in product_tables
+                                )
+                            )
+                        )
+                        .scalars()
+                        .all()
+                    )
+                    session.execute(
+                        sql.delete(db_schema.TaskmanagerPeriod)
+                        .where(db_schema.TaskmanagerPeriod.sequence_id.in_(empty))
+                        .execution_options(synchronize_session=False)
+                    )
+                    deleted += session.execute(
+                        sql.delete(db_schema.Taskmanager)
+                        .where(db_schema.Taskmanager.sequence_id.in_(empty))
+                        .execution_options(synchronize_session=False)
+                    ).rowcount
+                session.commit()
+
+        if self.file_store is not None and (batch_size is None or deleted < batch_size):
+            self._sweep_file_store()
+        return dropped + deleted
+
+    def _sweep_file_store(self):
+        """
+        Delete the files of the deleted taskmanagers, and the files no
+        blob row references
+
+        Returns:
+            None
+        """
+        stored = self.file_store.taskmanagers()
+        with self.engine.connect() as connection:
+            live = set(
+                connection.execute(
+                    sql.select(db_schema.Taskmanager.sequence_id).where(db_schema.Taskmanager.sequence_id.in_(stored))
+                ).scalars()
             )
-            session.commit()
+        for sequence_id in stored:
+            if sequence_id not in live:
+                self.logger.debug(f"Deleting the files of taskmanager {sequence_id}")
+                self.file_store.delete_taskmanager(sequence_id)
+                continue
+            blob = self._tables(sequence_id).blob
+            with self.engine.connect() as connection:
+                referenced = set(
+                    connection.execute(
+                        sql.select(blob.hash).where(blob.taskmanager_id == sequence_id).where(blob.external.is_(True))
+                    ).scalars()
+                )
+            orphans = self.file_store.delete_orphans(sequence_id, referenced)
+            if orphans:
+                self.logger.info(f"Deleted {orphans} unreferenced files of taskmanager {sequence_id}")
 
     def close(self):
         """
@@ -599,12 +1479,21 @@ class SQLAlchemyDS(ds.DataSource):
         Returns:
             None
         """
-        # sqlite doesn't support the QueuePool connection class
-        poolclass = sqlalchemy.pool.QueuePool
-        if self.config_dict["url"].startswith("sqlite:/"):
-            poolclass = sqlalchemy.pool.NullPool
-        self.engine = sqlalchemy.create_engine(**self.config_dict, poolclass=poolclass)
+        url = sqlalchemy.engine.make_url(self.config_dict["url"])
+        engine_args = dict(self.config_dict, poolclass=sqlalchemy.pool.QueuePool)
+        sqlite_file = url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:")
+        if sqlite_file:
+            # a persistent pool per process, its connections move between threads
+            engine_args["connect_args"] = {"check_same_thread": False, **engine_args.get("connect_args", {})}
+            if not isinstance(self._write_lock, ProcessLock):
+                self._write_lock = ProcessLock()
+        elif url.get_backend_name() == "sqlite":
+            # in memory databases are not shared between the connections of a pool
+            engine_args["poolclass"] = sqlalchemy.pool.NullPool
+        self.engine = sqlalchemy.create_engine(**engine_args)
         add_engine_pidguard(self.engine)
+        if sqlite_file:
+            add_sqlite_pragmas(self.engine, self.sqlite_pragmas)
         self.logger.debug(
             f"Trying to connect as {self.engine.url.drivername}://{self.engine.url.username}@{self.engine.url.host}:{self.engine.url.port}/{self.engine.url.database}"
         )
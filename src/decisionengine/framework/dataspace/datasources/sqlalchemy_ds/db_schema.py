@@ -3,19 +3,42 @@
 
 """
 The table layout and utilities for our SQLAlchemy ORM
+
+The metadata, headers and products of a taskmanager live either in the
+``metadata``, ``header``, ``dataproduct`` and ``blob`` tables or, for the
+taskmanagers listed in ``taskmanager_period``, in copies of them for the day
+or the week the taskmanager started, e.g. ``dataproduct_w20240101``.  Retention then
+drops the tables of a whole period instead of deleting their rows.
 """
-from sqlalchemy import Column, ForeignKey, Index, sql, UniqueConstraint
+import datetime
+import re
+import threading
+
+from typing import NamedTuple
+
+from sqlalchemy import Column, ForeignKey, Index, sql, Table, UniqueConstraint
 from sqlalchemy.orm import declarative_base, relationship, sessionmaker
-from sqlalchemy.types import BigInteger, DateTime, Integer, LargeBinary, String, Text
+from sqlalchemy.types import BigInteger, Boolean, DateTime, Integer, LargeBinary, String, Text
 
 __all__ = [
+    "LATE_COLUMNS",
+    "LATE_INDEXES",
+    "PERIODS",
+    "PRODUCT_TABLES",
     "Base",
     "SessionMaker",
     "Schema",
     "Taskmanager",
+    "TaskmanagerPeriod",
     "Header",
     "Metadata",
     "Dataproduct",
+    "Blob",
+    "ProductTables",
+    "period_end",
+    "period_of",
+    "period_of_table",
+    "period_tables",
 ]
 
 Base = declarative_base()
@@ -75,6 +98,8 @@ class Taskmanager(Base):
         info="",
         comment="",
     )
+    generation_id = Column(Integer, nullable=True, info="", comment="last generation holding products")
+    committed_generation_id = Column(Integer, nullable=True, info="", comment="last generation completely written")
 
     # Indexes, etc
     __table_args__ = (
@@ -135,6 +160,8 @@ class Header(Base):
             "generation_id",
         ),
         Index("ix_header_key", "key", postgresql_using="hash"),
+        # resolves the newest generation of a key, see datasource_api
+        Index("ix_header_taskmanager_id_key_generation_id", "taskmanager_id", "key", "generation_id"),
         UniqueConstraint("taskmanager_id", "generation_id", "key", name="uq_header_taskmanager_id_generation_id_key"),
     )
 
@@ -202,6 +229,7 @@ class Dataproduct(Base):
     key = Column(Text, nullable=False, info="", comment="")
     value = Column(LargeBinary, nullable=False, info="", comment="")
     id = Column(SBigInteger, primary_key=True, index=True, unique=True, info="", comment="")
+    value_hash = Column(String(length=64), nullable=True, info="", comment="hash of the value stored in blob")
 
     taskmanager = relationship("Taskmanager", back_populates="task_dataproduct", passive_deletes=True)
 
@@ -213,7 +241,219 @@ class Dataproduct(Base):
             "generation_id",
         ),
         Index("ix_dataproduct_key", "key", postgresql_using="hash"),
+        # resolves the newest generation of a key, see datasource_api
+        Index("ix_dataproduct_taskmanager_id_key_generation_id", "taskmanager_id", "key", "generation_id"),
         UniqueConstraint(
             "taskmanager_id", "generation_id", "key", name="uq_dataproduct_taskmanager_id_generation_id_key"
         ),
     )
+
+
+class Blob(Base):
+    """
+    The distinct values of the dataproducts of a taskmanager, keyed by
+    their SHA-256
+
+    Dataproduct rows with a value_hash store an empty value and share the
+    blob row of their hash, the others, written before blobs, store their
+    own value.  Blobs with external set store an empty value too, theirs
+    is in the file store of the datasource.
+    """
+
+    __tablename__ = "blob"
+
+    taskmanager_id = Column(
+        ForeignKey("taskmanager.sequence_id", ondelete="CASCADE"),
+        nullable=False,
+        info="",
+        comment="",
+    )
+    hash = Column(String(length=64), nullable=False, info="", comment="")
+    value = Column(LargeBinary, nullable=False, info="", comment="")
+    id = Column(SBigInteger, primary_key=True, index=True, unique=True, info="", comment="")
+    external = Column(Boolean, nullable=True, info="", comment="value stored in the file store")
+
+    # Indexes, etc
+    __table_args__ = (UniqueConstraint("taskmanager_id", "hash", name="uq_blob_taskmanager_id_hash"),)
+
+
+# Columns added after the first release of the schema, create_all()
+# does not add them to existing tables
+LATE_COLUMNS = [
+    Taskmanager.__table__.c.generation_id,
+    Taskmanager.__table__.c.committed_generation_id,
+    Dataproduct.__table__.c.value_hash,
+    Blob.__table__.c.external,
+]
+
+# Indexes added after the first release of the schema, create_all()
+# does not add them to existing tables
+LATE_INDEXES = [
+    index
+    for table in (Header.__table__, Dataproduct.__table__)
+    for index in table.indexes
+    if index.name.endswith("_taskmanager_id_key_generation_id")
+]
+
+
+class TaskmanagerPeriod(Base):
+    """
+    The period tables holding the metadata, headers and products of a
+    taskmanager, see :func:`period_tables`
+
+    Taskmanagers without a row here use the metadata, header and
+    dataproduct tables.
+    """
+
+    __tablename__ = "taskmanager_period"
+
+    sequence_id = Column(
+        ForeignKey("taskmanager.sequence_id", ondelete="CASCADE"),
+        primary_key=True,
+        info="",
+        comment="",
+    )
+    period = Column(String(length=16), nullable=False, info="", comment="suffix of the period table names")
+
+    __table_args__ = (Index("ix_taskmanager_period_period", "period"),)
+
+
+class ProductTables(NamedTuple):
+    """
+    The tables holding the metadata, headers and products of a taskmanager
+    """
+
+    metadata: type
+    """Metadata or its period table"""
+
+    header: type
+    """Header or its period table"""
+
+    dataproduct: type
+    """Dataproduct or its period table"""
+
+    blob: type
+    """Blob or its period table"""
+
+
+PRODUCT_TABLES = ProductTables(Metadata, Header, Dataproduct, Blob)
+
+#: Per-period table layouts: the table suffix letter and the period length
+PERIODS = {
+    "daily": ("d", datetime.timedelta(days=1)),
+    "weekly": ("w", datetime.timedelta(days=7)),
+}
+
+_PERIOD_TABLE_NAME = re.compile(r"^(?:metadata|header|dataproduct|blob)_([dw]\d{8})$")
+_PERIOD_TABLES = {}
+_PERIOD_TABLES_LOCK = threading.Lock()
+
+
+def period_of(datestamp, period):
+    """
+    Return the suffix of the period tables for a taskmanager started at datestamp
+
+    Weeks start on Mondays.
+
+    Args:
+        datestamp (datetime.datetime): start of the taskmanager
+        period (str): one of :data:`PERIODS`
+
+    Returns:
+        str: the suffix, the period letter and its first day
+    """
+    letter, length = PERIODS[period]
+    start = datestamp.date()
+    if length.days == 7:
+        start -= datetime.timedelta(days=start.weekday())
+    return f"{letter}{start:%Y%m%d}"
+
+
+def period_end(suffix):
+    """
+    Return the end of the period of the tables named with suffix
+
+    Args:
+        suffix (str): suffix from :func:`period_of`
+
+    Returns:
+        datetime.datetime: start of the next period
+    """
+    length = next(length for letter, length in PERIODS.values() if letter == suffix[0])
+    return datetime.datetime.strptime(suffix[1:], "%Y%m%d") + length
+
+
+def period_of_table(name):
+    """
+    Return the period suffix of a period table name
+
+    Args:
+        name (str): name of a database table
+
+    Returns:
+        str: the suffix, None for any other table
+    """
+    match = _PERIOD_TABLE_NAME.match(name)
+    return match.group(1) if match else None
+
+
+def _copy_table(table, name):
+    """
+    Copy table, with its indexes and constraints, as name
+
+    ``Table.to_metadata()`` cannot copy the ``info=""`` of our columns.
+    """
+    columns = [
+        Column(
+            column.name,
+            column.type,
+            *(ForeignKey(key.target_fullname, ondelete=key.ondelete) for key in column.foreign_keys),
+            primary_key=column.primary_key,
+            nullable=column.nullable,
+            default=column.default.arg if column.default is not None else None,
+        )
+        for column in table.columns
+    ]
+    indexes = [
+        Index(
+            index.name.replace(table.name, name, 1),
+            *(column.name for column in index.columns),
+            unique=index.unique,
+            **index.dialect_kwargs,
+        )
+        for index in table.indexes
+        if isinstance(index.name, str)
+    ]
+    constraints = [
+        UniqueConstraint(
+            *(column.name for column in constraint.columns), name=constraint.name.replace(table.name, name, 1)
+        )
+        for constraint in table.constraints
+        if isinstance(constraint, UniqueConstraint) and isinstance(constraint.name, str)
+    ]
+    return Table(name, Base.metadata, *columns, *indexes, *constraints, info={"period": True})
+
+
+def period_tables(suffix):
+    """
+    Return the period tables named with suffix, mapping them on first use
+
+    The tables are copies of the metadata, header, dataproduct and blob tables,
+    their indexes and constraints renamed after them, marked with
+    ``Table.info["period"]`` so ``create_tables()`` leaves them out.
+
+    Args:
+        suffix (str): suffix from :func:`period_of`
+
+    Returns:
+        ProductTables: the mapped classes
+    """
+    with _PERIOD_TABLES_LOCK:
+        if suffix not in _PERIOD_TABLES:
+            models = []
+            for model in PRODUCT_TABLES:
+                name = f"{model.__tablename__}_{suffix}"
+                table = _copy_table(model.__table__, name)
+                models.append(type(f"{model.__name__}_{suffix}", (Base,), {"__table__": table}))
+            _PERIOD_TABLES[suffix] = ProductTables(*models)
+        return _PERIOD_TABLES[suffix]
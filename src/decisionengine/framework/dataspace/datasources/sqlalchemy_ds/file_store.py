@@ -0,0 +1,131 @@
+# SPDX-FileCopyrightText: 2017 Fermi Research Alliance, LLC
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Files holding the large product values of SQLAlchemyDS
+
+A value is stored as ``<path>/<taskmanager sequence id>/<sha256>``, the blob
+row of its hash only records that the value is in a file.  Values are read
+through a read-only memory map, so they are not copied before decoding.
+"""
+import mmap
+import os
+import pathlib
+import shutil
+import threading
+import time
+
+__all__ = ["FileStore", "DEFAULT_THRESHOLD"]
+
+#: Values of this many bytes or more are stored in files
+DEFAULT_THRESHOLD = 8 * 1024 * 1024
+
+#: Files not referenced by a blob row are kept this long, their row may not be committed yet
+ORPHAN_GRACE_SECONDS = 3600
+
+
+class FileStore:
+    """
+    Content addressed files of the taskmanagers
+    """
+
+    def __init__(self, path, threshold=DEFAULT_THRESHOLD):
+        """
+        Args:
+            path (str): directory of the files, created if needed
+            threshold (int): size, in bytes, from which values are stored in files
+        """
+        if threshold <= 0:
+            raise ValueError(f"file_store_threshold must be a positive number of bytes, not {threshold}")
+        self.path = pathlib.Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.threshold = threshold
+
+    def _file(self, taskmanager_id, value_hash):
+        return self.path / str(int(taskmanager_id)) / value_hash
+
+    def write(self, taskmanager_id, value_hash, value):
+        """
+        Store value, unless the file of value_hash exists already
+
+        The file is written under a temporary name and renamed, so a
+        reader never maps a partial file.
+
+        Args:
+            taskmanager_id (int): sequence id of the taskmanager
+            value_hash (str): SHA-256 of value
+            value (bytes): the value
+
+        Returns:
+            None
+        """
+        path = self._file(taskmanager_id, value_hash)
+        if path.exists():
+            # keep it from being swept as an orphan before its row is committed
+            os.utime(path)
+            return
+        path.parent.mkdir(exist_ok=True)
+        partial = path.with_name(f".{value_hash}.{os.getpid()}.{threading.get_ident()}")
+        with open(partial, "wb") as f:
+            f.write(value)
+        os.replace(partial, path)
+
+    def read(self, taskmanager_id, value_hash):
+        """
+        Map the file of value_hash
+
+        Args:
+            taskmanager_id (int): sequence id of the taskmanager
+            value_hash (str): SHA-256 of the value
+
+        Returns:
+            memoryview: the value, valid as long as it is referenced
+        """
+        with open(self._file(taskmanager_id, value_hash), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return memoryview(b"")
+            return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def taskmanagers(self):
+        """
+        Returns:
+            list: sequence ids of the taskmanagers holding files
+        """
+        return [int(entry.name) for entry in self.path.iterdir() if entry.is_dir() and entry.name.isdigit()]
+
+    def delete_taskmanager(self, taskmanager_id):
+        """
+        Delete the files of taskmanager_id
+
+        Args:
+            taskmanager_id (int): sequence id of the taskmanager
+
+        Returns:
+            None
+        """
+        shutil.rmtree(self.path / str(int(taskmanager_id)), ignore_errors=True)
+
+    def delete_orphans(self, taskmanager_id, referenced):
+        """
+        Delete the files of taskmanager_id, older than
+        :data:`ORPHAN_GRACE_SECONDS`, whose hash is not referenced
+
+        Args:
+            taskmanager_id (int): sequence id of the taskmanager
+            referenced (set): hashes of the blob rows of the taskmanager
+
+        Returns:
+            int: number of files deleted
+        """
+        deleted = 0
+        expired = time.time() - ORPHAN_GRACE_SECONDS
+        for path in (self.path / str(int(taskmanager_id))).iterdir():
+            if path.name in referenced:
+                continue
+            try:
+                if path.stat().st_mtime < expired:
+                    path.unlink()
+                    deleted += 1
+            except FileNotFoundError:
+                pass
+        return deleted
@@ -5,13 +5,23 @@
 Code not written by us
 """
 import os
+import threading
+import weakref
 
 import sqlalchemy
 import structlog
 
 from decisionengine.framework.modules.logging_configDict import LOGGERNAME
 
-__all__ = ["orm_as_dict", "clone_model", "add_engine_pidguard"]
+__all__ = ["orm_as_dict", "clone_model", "add_engine_pidguard", "add_sqlite_pragmas", "ProcessLock", "SQLITE_PRAGMAS"]
+
+#: PRAGMAs set on every SQLite connection of a file backed database
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,  # negative values are in KiB
+}
 
 
 def orm_as_dict(obj):
@@ -68,3 +78,47 @@ def add_engine_pidguard(engine):
             raise sqlalchemy.exc.DisconnectionError(
                 f"Connection record belongs to pid {connection_record.info['pid']}, attempting to check out in pid {pid}"
             )
+
+
+def add_sqlite_pragmas(engine, pragmas):
+    """
+    Set the given PRAGMAs on each new SQLite connection of the engine,
+    a pragma set to None is left at the SQLite default
+    """
+    statements = []
+    for name, value in pragmas.items():
+        if value is None:
+            continue
+        if not name.isidentifier() or not (isinstance(value, int) or str(value).isidentifier()):
+            raise ValueError(f"Invalid SQLite pragma {name}={value}")
+        statements.append(f"PRAGMA {name}={value}")
+    structlog.getLogger(LOGGERNAME).debug(f"setting up {statements} for {engine}")
+
+    @sqlalchemy.event.listens_for(engine, "connect")
+    def connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for statement in statements:
+            cursor.execute(statement)
+        cursor.close()
+
+
+class ProcessLock:
+    """
+    A lock private to each process, a lock held while forking is released
+    in the child
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        reference = weakref.ref(self)
+        os.register_at_fork(after_in_child=lambda: reference() and reference()._reset())
+
+    def _reset(self):
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self._lock.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._lock.release()
@@ -17,14 +17,18 @@ import pytest
 from pytest_postgresql import factories
 
 from decisionengine.framework.dataspace.datablock import Header, Metadata
+from decisionengine.framework.dataspace.datasources.memory import MemoryDataSource
 from decisionengine.framework.dataspace.datasources.sqlalchemy_ds import SQLAlchemyDS as SQLAlchemy_datasource
 
 __all__ = [
     "DATABASES_TO_TEST",
+    "DATASOURCES_TO_TEST",
+    "MEMORY_DATASOURCE",
     "PG_PROG",
     "PG_DE_DB_WITHOUT_SCHEMA",
     "SQLALCHEMY_PG_WITH_SCHEMA",
     "SQLALCHEMY_TEMPFILE_SQLITE",
+    "SQLALCHEMY_TEMPFILE_SQLITE_WEEKLY",
     "datasource",
     "mock_data_block",
 ]
@@ -49,6 +53,11 @@ if sys.version_info.major == 3 and sys.version_info.minor > 6 and platform.pytho
 else:
     DATABASES_TO_TEST = ("SQLALCHEMY_PG_WITH_SCHEMA",)
 
+# datasources that do not need a database server or file, and alternate layouts
+DATASOURCES_TO_TEST = DATABASES_TO_TEST + ("MEMORY_DATASOURCE",)
+if "SQLALCHEMY_TEMPFILE_SQLITE" in DATABASES_TO_TEST:
+    DATASOURCES_TO_TEST += ("SQLALCHEMY_TEMPFILE_SQLITE_WEEKLY",)
+
 
 @pytest.fixture()
 def SQLALCHEMY_PG_WITH_SCHEMA(PG_DE_DB_WITHOUT_SCHEMA):
@@ -90,7 +99,23 @@ def SQLALCHEMY_TEMPFILE_SQLITE(tmp_path):
     gc.collect()  # free any in-memory DBs or cached connections
 
 
-@pytest.fixture(params=DATABASES_TO_TEST)
+@pytest.fixture()
+def SQLALCHEMY_TEMPFILE_SQLITE_WEEKLY(SQLALCHEMY_TEMPFILE_SQLITE):
+    """
+    Setup an SQLite database storing the products in weekly tables.
+    """
+    yield {**SQLALCHEMY_TEMPFILE_SQLITE, "table_period": "weekly"}
+
+
+@pytest.fixture()
+def MEMORY_DATASOURCE():
+    """
+    Setup the configuration of an in-memory datasource.
+    """
+    yield {"module": "decisionengine.framework.dataspace.datasources.memory", "name": "MemoryDataSource"}
+
+
+@pytest.fixture(params=DATASOURCES_TO_TEST)
 def datasource(request):
     """
     This parameterized fixture will setup up various datasources.
@@ -104,11 +129,19 @@ def datasource(request):
     """
     conn_fixture = request.getfixturevalue(request.param)
 
+    if request.param == "MEMORY_DATASOURCE":
+        my_ds = MemoryDataSource({})
+        load_sample_data_into_datasource(my_ds)
+        yield my_ds
+        return
+
     db_info = {}
     try:
         # SQL Alchemy
         db_info["url"] = conn_fixture["url"]
         db_info["echo"] = True  # put SQLAlchemy into extra chatty mode
+        if "table_period" in conn_fixture:
+            db_info["table_period"] = conn_fixture["table_period"]
     except TypeError:
         # psycopg2
         db_info["host"] = conn_fixture.info.host
@@ -7,19 +7,28 @@ This test plan covers a generic dataspace object via
 pytest parameters.
 """
 import datetime
+import hashlib
+import os
+import types
+
+from unittest import mock
 
 import pytest
+import sqlalchemy
 
 from sqlalchemy.exc import NoResultFound
 
 from decisionengine.framework.dataspace.datablock import Header, Metadata
+from decisionengine.framework.dataspace.datasources.sqlalchemy_ds import datasource_api
 from decisionengine.framework.dataspace.datasources.tests.fixtures import (  # noqa: F401
     DATABASES_TO_TEST,
     datasource,
+    MEMORY_DATASOURCE,
     PG_DE_DB_WITHOUT_SCHEMA,
     PG_PROG,
     SQLALCHEMY_PG_WITH_SCHEMA,
     SQLALCHEMY_TEMPFILE_SQLITE,
+    SQLALCHEMY_TEMPFILE_SQLITE_WEEKLY,
 )
 
 
@@ -28,6 +37,46 @@ def test_create_tables(datasource):  # noqa: F811
     datasource.create_tables()
 
 
+def test_sqlite_file_mode(datasource):  # noqa: F811
+    if getattr(datasource, "engine", None) is None or datasource.engine.dialect.name != "sqlite":
+        pytest.skip("SQLite specific")
+
+    assert isinstance(datasource.engine.pool, sqlalchemy.pool.QueuePool)
+    with datasource.engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert connection.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+
+
+def test_generation_id_column_migration(datasource):  # noqa: F811
+    """Is the last generation of the taskmanagers filled in on databases without it"""
+    if getattr(datasource, "engine", None) is None or datasource.engine.dialect.name != "sqlite":
+        pytest.skip("SQLite specific")
+
+    datasource.duplicate_datablock(1, 1, 5)
+    with datasource.engine.begin() as connection:
+        connection.exec_driver_sql("ALTER TABLE taskmanager DROP COLUMN generation_id")
+
+    migrated = datasource_api.SQLAlchemyDS({"url": str(datasource.engine.url)})
+    assert migrated.get_last_generation_id(taskmanager_name="taskmanager1") == 5
+    assert migrated.get_last_generation_id(taskmanager_name="taskmanager2") == 2
+    migrated.close()
+
+
+def test_committed_generation_id_column_migration(datasource):  # noqa: F811
+    """Is the generation before the last one taken as complete on databases without the column"""
+    if getattr(datasource, "engine", None) is None or datasource.engine.dialect.name != "sqlite":
+        pytest.skip("SQLite specific")
+
+    with datasource.engine.begin() as connection:
+        connection.exec_driver_sql("ALTER TABLE taskmanager DROP COLUMN committed_generation_id")
+
+    migrated = datasource_api.SQLAlchemyDS({"url": str(datasource.engine.url)})
+    assert migrated.get_committed_generation("taskmanager2")["generation_id"] == 1
+    with pytest.raises(NoResultFound):
+        migrated.get_committed_generation("taskmanager1")
+    migrated.close()
+
+
 def test_reset_connections(datasource):  # noqa: F811
     """reset_connections() should be safe to call any time"""
     datasource.reset_connections()
@@ -164,6 +213,50 @@ def test_get_last_generation_id_not_exist(datasource):  # noqa: F811
         )
 
 
+def test_committed_generation(datasource):  # noqa: F811
+    """Is the last complete generation recorded, and never moved back"""
+    with pytest.raises((KeyError, NoResultFound)):
+        datasource.get_committed_generation("taskmanager1")
+
+    datasource.commit_generation(1, 3)
+    datasource.commit_generation(1, 2)
+    assert datasource.get_committed_generation("taskmanager1") == {
+        "sequence_id": 1,
+        "taskmanager_id": "11111111-1111-1111-1111-111111111111",
+        "generation_id": 3,
+    }
+
+    # the newest taskmanager of the name with a complete generation
+    sequence_id = datasource.store_taskmanager("taskmanager1", "33333333-3333-3333-3333-333333333333")
+    assert datasource.get_committed_generation("taskmanager1")["sequence_id"] == 1
+    datasource.commit_generation(sequence_id, 1)
+    assert datasource.get_committed_generation("taskmanager1") == {
+        "sequence_id": sequence_id,
+        "taskmanager_id": "33333333-3333-3333-3333-333333333333",
+        "generation_id": 1,
+    }
+
+
+def test_get_envelope(datasource):  # noqa: F811
+    """Can we fetch a dataproduct with its header and metadata?"""
+    result = datasource.get_envelope(
+        taskmanager_id=1,
+        generation_id=1,
+        key="my_test_key",
+    )
+
+    assert result["value"] == datasource.get_dataproduct(taskmanager_id=1, generation_id=1, key="my_test_key")
+    assert result["creator"] == "module"
+    assert result["state"] == datasource.get_metadata(taskmanager_id=1, generation_id=1, key="my_test_key")[4]
+
+    with pytest.raises(KeyError):
+        datasource.get_envelope(
+            taskmanager_id=1,
+            generation_id=1,
+            key="no_such_key_exists",
+        )
+
+
 def test_get_header(datasource):  # noqa: F811
     """Can we fetch a header?"""
     result = datasource.get_header(
@@ -280,6 +373,91 @@ def test_get_dataproducts_not_exist(datasource):  # noqa: F811
     assert result == []
 
 
+def test_iter_dataproducts(datasource):  # noqa: F811
+    """Are the dataproducts streamed, leaving the datasource usable meanwhile"""
+    products = datasource.iter_dataproducts(taskmanager_id=1)
+    assert isinstance(products, types.GeneratorType)
+    assert next(products)["key"] == "my_test_key"
+
+    datasource.put_many(1, 1, {"new_key": b"new_value"}, Header(1), Metadata(1))
+    assert datasource.get_dataproduct(taskmanager_id=1, generation_id=1, key="new_key") == b"new_value"
+    # the stream reads the products stored when it started
+    assert [product["value"] for product in products] == [b"a_test_value"]
+
+    products = datasource.iter_dataproducts(taskmanager_id=1, key="new_key")
+    assert next(products)["value"] == b"new_value"
+    products.close()
+    assert list(datasource.iter_dataproducts(taskmanager_id=100)) == []
+
+
+def test_iter_history(datasource):  # noqa: F811
+    """Are the values of a key read across taskmanagers, sampled and limited"""
+    tm2 = datasource.get_taskmanager(taskmanager_name="taskmanager2")["sequence_id"]
+    for generation_id in range(3, 9):
+        datasource.duplicate_datablock(tm2, generation_id - 1, generation_id)
+        datasource.put_many(tm2, generation_id, {"other_test_key": bytes([generation_id])}, Header(tm2), Metadata(tm2))
+
+    history = datasource.iter_history("other_test_key")
+    assert isinstance(history, types.GeneratorType)
+    assert next(history) == {
+        "name": "taskmanager2",
+        "taskmanager_id": tm2,
+        "generation_id": 2,
+        "key": "other_test_key",
+        "value": b"other_test_value",
+    }
+    assert [product["generation_id"] for product in history] == [3, 4, 5, 6, 7, 8]
+    assert [product["generation_id"] for product in datasource.iter_history("other_test_key", every_nth=3)] == [2, 5, 8]
+    assert [product["generation_id"] for product in datasource.iter_history("other_test_key", limit=2)] == [2, 3]
+    assert [
+        product["generation_id"] for product in datasource.iter_history("other_test_key", every_nth=2, limit=2)
+    ] == [2, 4]
+
+    yesterday = str(datetime.datetime.now() - datetime.timedelta(days=1))
+    assert list(datasource.iter_history("other_test_key", ["taskmanager1"])) == []
+    assert list(datasource.iter_history("my_test_key", start_time=yesterday)) == []
+    assert [product["value"] for product in datasource.iter_history("my_test_key", end_time=yesterday)] == [
+        b"my_test_value"
+    ]
+
+    tm3 = datasource.store_taskmanager("taskmanager1", "33333333-3333-3333-3333-333333333333")
+    datasource.put_many(tm3, 1, {"my_test_key": b"newest_value"}, Header(tm3), Metadata(tm3))
+    assert [product["value"] for product in datasource.iter_history("my_test_key", ["taskmanager1"])] == [
+        b"my_test_value",
+        b"newest_value",
+    ]
+    assert [product["value"] for product in datasource.iter_history("my_test_key", latest=True)] == [b"newest_value"]
+
+    with pytest.raises(ValueError):
+        next(datasource.iter_history("my_test_key", every_nth=0))
+
+
+def test_history_of_shared_products(datasource):  # noqa: F811
+    """Does every generation holding a key yield it, written or shared with an older one"""
+    datasource.duplicate_datablock(1, 1, 2)
+    datasource.update(1, 2, "a_test_key", b"a_new_value", Header(1), Metadata(1, generation_id=2))
+    datasource.duplicate_datablock(1, 2, 3)
+
+    assert [
+        (product["generation_id"], product["value"]) for product in datasource.get_dataproducts(1, "my_test_key")
+    ] == [
+        (1, b"my_test_value"),
+        (2, b"my_test_value"),
+        (3, b"my_test_value"),
+    ]
+    assert [
+        (product["generation_id"], product["value"]) for product in datasource.iter_dataproducts(1, "a_test_key")
+    ] == [
+        (1, b"a_test_value"),
+        (2, b"a_new_value"),
+        (3, b"a_new_value"),
+    ]
+    assert [
+        (product["generation_id"], product["value"]) for product in datasource.iter_history("my_test_key", every_nth=2)
+    ] == [(1, b"my_test_value"), (3, b"my_test_value")]
+    assert [product["generation_id"] for product in datasource.iter_history("a_test_key", limit=2)] == [1, 2]
+
+
 def test_get_dataproduct(datasource):  # noqa: F811
     """Can we get the dataproduct by uuid with key"""
     result2 = datasource.get_dataproduct(
@@ -376,6 +554,149 @@ def test_update(datasource):  # noqa: F811
     assert result1 == b"I changed IT"
 
 
+def test_put_many(datasource):  # noqa: F811
+    """Do bulk puts insert new keys and update existing ones"""
+    header = Header(1, creator="put_many")
+    metadata = Metadata(1, state="END_CYCLE", generation_id=1)
+    datasource.put_many(
+        taskmanager_id=1,
+        generation_id=1,
+        products={"my_test_key": b"I changed IT", "new_key_1": b"one", "new_key_2": b"two"},
+        header=header,
+        metadata=metadata,
+    )
+
+    assert datasource.get_dataproduct(taskmanager_id=1, generation_id=1, key="my_test_key") == b"I changed IT"
+    assert datasource.get_dataproduct(taskmanager_id=1, generation_id=1, key="new_key_2") == b"two"
+    assert datasource.get_header(taskmanager_id=1, generation_id=1, key="my_test_key")[7] == "put_many"
+    assert datasource.get_metadata(taskmanager_id=1, generation_id=1, key="new_key_1")[4] == "END_CYCLE"
+    assert datasource.get_datablock_keys(1, 1) == ["my_test_key", "a_test_key", "new_key_1", "new_key_2"]
+
+    # inherited keys get their own rows in the new generation
+    datasource.duplicate_datablock(1, 1, 2)
+    datasource.put_many(1, 2, {"new_key_1": b"uno"}, header, metadata)
+    assert datasource.get_dataproduct(taskmanager_id=1, generation_id=2, key="new_key_1") == b"uno"
+    assert datasource.get_dataproduct(taskmanager_id=1, generation_id=1, key="new_key_1") == b"one"
+
+
+def test_update_inserts_new_key(datasource):  # noqa: F811
+    """Does update store a key the generation does not hold yet"""
+    datasource.update(1, 1, "new_key", b"new_value", Header(1), Metadata(1))
+
+    assert datasource.get_dataproduct(taskmanager_id=1, generation_id=1, key="new_key") == b"new_value"
+    assert datasource.get_datablock_keys(1, 1) == ["my_test_key", "a_test_key", "new_key"]
+
+
+def test_put_many_without_upsert_support(datasource):  # noqa: F811
+    """Do dialects without ON CONFLICT fall back to separate inserts and updates"""
+    if not hasattr(datasource, "engine"):
+        pytest.skip("SQLAlchemy specific")
+
+    with mock.patch.dict(datasource_api._DIALECT_INSERTS, clear=True):
+        datasource.put_many(1, 1, {"my_test_key": b"I changed IT", "new_key": b"new_value"}, Header(1), Metadata(1))
+
+    assert datasource.get_dataproduct(taskmanager_id=1, generation_id=1, key="my_test_key") == b"I changed IT"
+    assert datasource.get_dataproduct(taskmanager_id=1, generation_id=1, key="new_key") == b"new_value"
+
+
+def test_unchanged_values_share_a_blob(datasource):  # noqa: F811
+    """Are values repeated across generations stored once, and older rows still read"""
+    if not hasattr(datasource, "engine"):
+        pytest.skip("SQLAlchemy specific")
+
+    for generation_id in range(2, 7):
+        datasource.duplicate_datablock(1, generation_id - 1, generation_id)
+        datasource.put_many(
+            1, generation_id, {"same": b"same value", "own": bytes([generation_id])}, Header(1), Metadata(1)
+        )
+
+    tables = datasource._tables(1)
+    with datasource.engine.connect() as connection:
+        blobs = connection.execute(
+            sqlalchemy.select(tables.blob.value)
+            .where(tables.blob.taskmanager_id == 1)
+            .where(tables.blob.value == b"same value")
+        ).all()
+    assert len(blobs) == 1
+    assert datasource.get_dataproduct(taskmanager_id=1, generation_id=6, key="same") == b"same value"
+    assert datasource.get_datablock(1, 4)["own"] == bytes([4])
+    assert datasource.get_envelope(1, 3, "own")["value"] == bytes([3])
+
+    # rows written before the blob table keep their value
+    with datasource.engine.begin() as connection:
+        connection.execute(
+            sqlalchemy.update(tables.dataproduct)
+            .where(tables.dataproduct.generation_id == 6)
+            .where(tables.dataproduct.key == "same")
+            .values(value=b"legacy value", value_hash=None)
+        )
+    assert datasource.get_dataproduct(taskmanager_id=1, generation_id=6, key="same") == b"legacy value"
+    assert datasource.get_datablock(1, 6)["same"] == b"legacy value"
+    assert datasource.get_dataproduct(taskmanager_id=1, generation_id=5, key="same") == b"same value"
+
+
+def test_file_store(datasource, tmp_path):  # noqa: F811
+    """Are large values stored in files, read memory mapped and deleted with their taskmanager"""
+    if not hasattr(datasource, "engine"):
+        pytest.skip("SQLAlchemy specific")
+
+    config = {"url": str(datasource.engine.url), "file_store": str(tmp_path), "file_store_threshold": 1024}
+    if datasource.table_period:
+        config["table_period"] = datasource.table_period
+    stored = datasource_api.SQLAlchemyDS(config)
+    large = bytes(range(256)) * 8
+    stored.put_many(1, 1, {"large": large, "small": b"small"}, Header(1), Metadata(1))
+
+    assert [path.name for path in (tmp_path / "1").iterdir()] == [hashlib.sha256(large).hexdigest()]
+    value = stored.get_dataproduct(taskmanager_id=1, generation_id=1, key="large")
+    assert isinstance(value, memoryview)
+    assert value == large
+    assert stored.get_envelope(1, 1, "large")["value"] == large
+    assert stored.get_datablock(1, 1) == {
+        "my_test_key": b"my_test_value",
+        "a_test_key": b"a_test_value",
+        "large": large,
+        "small": b"small",
+    }
+    assert [row["value"] for row in stored.get_dataproducts(1, "large")] == [large]
+
+    # files without a blob row are deleted once they are old enough
+    (tmp_path / "2").mkdir()
+    (tmp_path / "2" / "orphan").write_bytes(large)
+    os.utime(tmp_path / "2" / "orphan", (0, 0))
+    stored.delete_data_older_than(10)
+    assert not (tmp_path / "1").exists()
+    assert not (tmp_path / "2" / "orphan").exists()
+    stored.close()
+
+
+def test_file_store_shared_config(datasource, tmp_path):  # noqa: F811
+    """Do all the datasources built from one configuration store and sweep files"""
+    if not hasattr(datasource, "engine"):
+        pytest.skip("SQLAlchemy specific")
+
+    config = {"url": str(datasource.engine.url), "file_store": str(tmp_path), "file_store_threshold": 1024}
+    if datasource.table_period:
+        config["table_period"] = datasource.table_period
+    first = datasource_api.SQLAlchemyDS(config)
+    second = datasource_api.SQLAlchemyDS(config)
+    assert second.file_store is not None
+
+    large = bytes(range(256)) * 8
+    second.put_many(1, 1, {"large": large}, Header(1), Metadata(1))
+    assert [path.name for path in (tmp_path / "1").iterdir()] == [hashlib.sha256(large).hexdigest()]
+    assert first.get_dataproduct(taskmanager_id=1, generation_id=1, key="large") == large
+
+    (tmp_path / "2").mkdir()
+    (tmp_path / "2" / "orphan").write_bytes(large)
+    os.utime(tmp_path / "2" / "orphan", (0, 0))
+    second.delete_data_older_than(10)
+    assert not (tmp_path / "1").exists()
+    assert not (tmp_path / "2" / "orphan").exists()
+    first.close()
+    second.close()
+
+
 def test_update_bad(datasource):  # noqa: F811
     """Do updates fail to work on bogus taskmanager as expected"""
     metadata_row = datasource.get_metadata(
@@ -429,6 +750,69 @@ def test_delete_data_older_than_arg(datasource):  # noqa: F811
         datasource.get_taskmanager(taskmanager_name="taskmanager1")
 
 
+def test_delete_data_older_than_in_batches(datasource):  # noqa: F811
+    """Are old entries deleted a batch at a time"""
+    if getattr(datasource, "table_period", None):
+        pytest.skip("expired periods are dropped whole")
+
+    assert datasource.delete_data_older_than(10, batch_size=1) == 1
+    # the old taskmanager stays until all its data is gone
+    result1 = datasource.get_taskmanager(taskmanager_name="taskmanager1")
+    assert result1["name"] == "taskmanager1"
+
+    while datasource.delete_data_older_than(10, batch_size=1):
+        pass
+    with pytest.raises((KeyError, NoResultFound)):
+        datasource.get_taskmanager(taskmanager_name="taskmanager1")
+
+    tm = datasource.get_taskmanager(taskmanager_name="taskmanager2")
+    assert datasource.get_datablock(tm["sequence_id"], 2) == {"other_test_key": b"other_test_value"}
+
+
+def test_table_period(datasource):  # noqa: F811
+    """Are products stored in, and expired with, the tables of their period"""
+    if not getattr(datasource, "table_period", None):
+        pytest.skip("per-period table layout specific")
+
+    inspector = sqlalchemy.inspect(datasource.engine)
+    assert inspector.has_table("dataproduct_w20160314")
+    assert inspector.has_table("header_w20160314")
+    assert inspector.has_table("metadata_w20160314")
+    with datasource.engine.connect() as connection:
+        assert connection.exec_driver_sql("SELECT count(*) FROM dataproduct").scalar() == 0
+        assert connection.exec_driver_sql("SELECT count(*) FROM dataproduct_w20160314").scalar() == 2
+
+    with pytest.raises(ValueError):
+        datasource_api.SQLAlchemyDS({"url": "sqlite://", "table_period": "monthly"})
+
+    # the taskmanager is deleted with the tables of its period
+    assert datasource.delete_data_older_than(10, batch_size=1) == 1
+    assert not sqlalchemy.inspect(datasource.engine).has_table("dataproduct_w20160314")
+    with pytest.raises((KeyError, NoResultFound)):
+        datasource.get_taskmanager(taskmanager_name="taskmanager1")
+
+    tm = datasource.get_taskmanager(taskmanager_name="taskmanager2")
+    assert datasource.get_datablock(tm["sequence_id"], 2) == {"other_test_key": b"other_test_value"}
+    assert datasource.get_last_generation_id(taskmanager_name="taskmanager2") == 2
+
+
+def test_config_is_not_modified(tmp_path):
+    """Do datasources built from the same configuration all get its settings"""
+    config = {
+        "url": f"sqlite:///{tmp_path / 'de.sqlite'}",
+        "table_period": "weekly",
+        "sqlite_pragmas": {"cache_size": -1024},
+    }
+    expected = dict(config)
+    first = datasource_api.SQLAlchemyDS(config)
+    second = datasource_api.SQLAlchemyDS(config)
+    assert config == expected
+    for ds in (first, second):
+        assert ds.table_period == "weekly"
+        assert ds.sqlite_pragmas["cache_size"] == -1024
+        ds.close()
+
+
 def test_get_datablock(datasource):  # noqa: F811
     tm = datasource.get_taskmanager(taskmanager_name="taskmanager1")
     gen_id = datasource.get_last_generation_id(taskmanager_name="taskmanager1")
@@ -437,6 +821,14 @@ def test_get_datablock(datasource):  # noqa: F811
     assert result1 == {"my_test_key": b"my_test_value", "a_test_key": b"a_test_value"}
 
 
+def test_get_datablock_keys(datasource):  # noqa: F811
+    tm = datasource.get_taskmanager(taskmanager_name="taskmanager1")
+    gen_id = datasource.get_last_generation_id(taskmanager_name="taskmanager1")
+
+    assert datasource.get_datablock_keys(tm["sequence_id"], gen_id) == ["my_test_key", "a_test_key"]
+    assert datasource.get_datablock_keys(tm["sequence_id"], gen_id + 1) == []
+
+
 def test_duplicate_datablock(datasource):  # noqa: F811
     """Can we duplicate taskmanager1 and all its entries"""
     result1 = datasource.get_last_generation_id(
@@ -457,3 +849,32 @@ def test_duplicate_datablock(datasource):  # noqa: F811
         taskmanager_id="11111111-1111-1111-1111-111111111111",
     )
     assert result1 == 90
+
+
+def test_duplicate_datablock_copy_on_write(datasource):  # noqa: F811
+    """New generations share the products of the older ones until they write their own"""
+    datasource.duplicate_datablock(1, 1, 2)
+
+    # nothing but the metadata is copied
+    assert len(datasource.get_dataproducts(taskmanager_id=1)) == 4
+    assert datasource.get_dataproduct(1, 2, "my_test_key") == b"my_test_value"
+    assert datasource.get_header(1, 2, "my_test_key")[2] == 1
+    assert datasource.get_metadata(1, 2, "my_test_key")[2] == 2
+    assert datasource.get_datablock(1, 2) == {"my_test_key": b"my_test_value", "a_test_key": b"a_test_value"}
+
+    # writing to the new generation leaves the older one untouched
+    datasource.update(1, 2, "my_test_key", b"my_new_value", Header(1), Metadata(1, generation_id=2))
+    assert datasource.get_dataproduct(1, 2, "my_test_key") == b"my_new_value"
+    assert datasource.get_dataproduct(1, 1, "my_test_key") == b"my_test_value"
+    assert datasource.get_header(1, 2, "my_test_key")[2] == 2
+    assert len(datasource.get_dataproducts(taskmanager_id=1)) == 4
+
+    # keys added to the older generation after the copy do not belong to the new one
+    datasource.insert(1, 1, "late_test_key", b"late_test_value", Header(1), Metadata(1, generation_id=1))
+    with pytest.raises(KeyError):
+        datasource.get_dataproduct(1, 2, "late_test_key")
+    assert "late_test_key" not in datasource.get_datablock(1, 2)
+
+    # generations copied from a copy still resolve to the original rows
+    datasource.duplicate_datablock(1, 2, 3)
+    assert datasource.get_datablock(1, 3) == {"my_test_key": b"my_new_value", "a_test_key": b"a_test_value"}
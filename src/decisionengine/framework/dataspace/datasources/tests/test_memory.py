@@ -0,0 +1,27 @@
+# SPDX-FileCopyrightText: 2017 Fermi Research Alliance, LLC
+# SPDX-License-Identifier: Apache-2.0
+
+import pytest
+
+from decisionengine.framework.dataspace.datablock import Header, Metadata
+from decisionengine.framework.dataspace.datasources.memory import MemoryDataSource
+
+
+def test_retains_newest_generations():
+    datasource = MemoryDataSource({"max_generations": 2})
+    sequence_id = datasource.store_taskmanager("taskmanager1", "11111111-1111-1111-1111-111111111111")
+    value = b"my_test_value"
+    datasource.insert(sequence_id, 1, "my_test_key", value, Header(sequence_id), Metadata(sequence_id))
+
+    datasource.duplicate_datablock(sequence_id, 1, 2)
+    datasource.duplicate_datablock(sequence_id, 2, 3)
+
+    assert datasource.get_last_generation_id("taskmanager1") == 3
+    assert datasource.get_datablock_keys(sequence_id, 1) == []
+    # the product is shared, not copied, between the generations
+    assert datasource.get_dataproduct(sequence_id, 3, "my_test_key") is value
+    assert datasource.get_header(sequence_id, 3, "my_test_key")[2] == 1
+    assert datasource.get_metadata(sequence_id, 3, "my_test_key")[2] == 3
+
+    with pytest.raises(ValueError):
+        MemoryDataSource({"max_generations": 1})
@@ -1,10 +1,15 @@
 # SPDX-FileCopyrightText: 2017 Fermi Research Alliance, LLC
 # SPDX-License-Identifier: Apache-2.0
 
+import copy
+import functools
 import importlib
 
 import structlog
 
+from decisionengine.framework.dataspace.cache import DEFAULT_CACHE_BYTES, ProductCache
+from decisionengine.framework.dataspace.codec import CompressionPolicy
+from decisionengine.framework.dataspace.write_behind import DEFAULT_QUEUE_SIZE, WriteBehind
 from decisionengine.framework.modules.logging_configDict import DELOGGER_CHANNEL_NAME, LOGGERNAME
 from decisionengine.framework.util.singleton import ScopedSingleton
 
@@ -105,6 +110,12 @@ class DataSpace:
             logger.exception("Error in initializing DataSpace!")
             raise DataSpaceConfigurationError("Invalid dataspace configuration")
 
+        try:
+            self.compression = CompressionPolicy.from_config(config["dataspace"].get("compression"))
+        except (OSError, TypeError, ValueError) as e:
+            logger.exception("Error in initializing DataSpace!")
+            raise DataSpaceConfigurationError(f"Invalid dataspace compression configuration: {e}")
+
         self.config = config
 
         # Connect to the datasource/database
@@ -112,6 +123,13 @@ class DataSpace:
             self._db_driver_module, self._db_driver_name, self._db_driver_config
         )
 
+        # Opt-in read cache for decoded data products, shared by the datablocks of this dataspace
+        self.product_cache = ProductCache(config["dataspace"].get("product_cache_bytes", DEFAULT_CACHE_BYTES))
+
+        # Opt-in background persistence of the data products
+        write_behind_queue_size = config["dataspace"].get("write_behind_queue_size", DEFAULT_QUEUE_SIZE)
+        self.write_behind = WriteBehind(write_behind_queue_size) if write_behind_queue_size else None
+
         # Datablocks, current and previous, keyed by taskmanager_ids
         self.curr_datablocks = {}
         self.prev_datablocks = {}
@@ -119,36 +137,99 @@ class DataSpace:
     def __str__(self):  # pragma: no cover
         return f"{vars(self)}"
 
-    def insert(self, taskmanager_id, generation_id, key, value, header, metadata):
+    def _store(self, operation, taskmanager_id, generation_id, products, write, *args):
+        """
+        Persist products with the datasource method write, or queue it when
+        write-behind is enabled
+
+        :type operation: :obj:`string`
+        :type taskmanager_id: :obj:`string`
+        :type generation_id: :obj:`int`
+        :type products: :obj:`dict`
+        :arg products: stored values keyed by product key
+        :type write: :obj:`callable`
+        :arg write: datasource method called with taskmanager_id, generation_id and args
+        """
         try:
-            self.datasource.insert(taskmanager_id, generation_id, key, value, header, metadata)
+            if self.write_behind:
+                # the caller may reuse its header and metadata for its next put
+                write = functools.partial(write, taskmanager_id, generation_id, *map(copy.copy, args))
+                pending = {(taskmanager_id, generation_id, key): value for key, value in products.items()}
+                self.write_behind.submit(write, pending)
+            else:
+                write(taskmanager_id, generation_id, *args)
         except Exception:  # pragma: no cover
-            logger.exception("Error in dataspace insert!")
+            logger.exception(f"Error in dataspace {operation}!")
             raise
+        finally:
+            for key in products:
+                self.product_cache.invalidate(taskmanager_id, generation_id, key)
+
+    def flush(self):
+        """
+        Wait until the queued writes are persisted, a no-op without write-behind
+        """
+        if self.write_behind:
+            self.write_behind.flush()
+
+    def insert(self, taskmanager_id, generation_id, key, value, header, metadata):
+        self._store(
+            "insert", taskmanager_id, generation_id, {key: value}, self.datasource.insert, key, value, header, metadata
+        )
 
     def update(self, taskmanager_id, generation_id, key, value, header, metadata):
-        try:
-            self.datasource.update(taskmanager_id, generation_id, key, value, header, metadata)
-        except Exception:  # pragma: no cover
-            logger.exception("Error in dataspace update!")
-            raise
+        self._store(
+            "update", taskmanager_id, generation_id, {key: value}, self.datasource.update, key, value, header, metadata
+        )
+
+    def put_many(self, taskmanager_id, generation_id, products, header, metadata):
+        self._store(
+            "put_many", taskmanager_id, generation_id, products, self.datasource.put_many, products, header, metadata
+        )
 
     def get_datablock(self, taskmanager_id, generation_id):
+        self.flush()
         return self.datasource.get_datablock(taskmanager_id, generation_id)
 
+    def get_datablock_keys(self, taskmanager_id, generation_id):
+        self.flush()
+        return self.datasource.get_datablock_keys(taskmanager_id, generation_id)
+
     def get_dataproduct(self, taskmanager_id, generation_id, key):
+        if self.write_behind:
+            value = self.write_behind.get((taskmanager_id, generation_id, key))
+            if value is not None:
+                return value
         return self.datasource.get_dataproduct(taskmanager_id, generation_id, key)
 
     def get_dataproducts(self, taskmanager_id, key=None):
+        self.flush()
         return self.datasource.get_dataproducts(taskmanager_id, key)
 
+    def iter_dataproducts(self, taskmanager_id, key=None):
+        self.flush()
+        return self.datasource.iter_dataproducts(taskmanager_id, key)
+
+    def iter_history(
+        self, key, taskmanager_names=None, start_time=None, end_time=None, every_nth=1, limit=None, latest=False
+    ):
+        self.flush()
+        return self.datasource.iter_history(key, taskmanager_names, start_time, end_time, every_nth, limit, latest)
+
+    def get_envelope(self, taskmanager_id, generation_id, key):
+        self.flush()
+        return self.datasource.get_envelope(taskmanager_id, generation_id, key)
+
     def get_header(self, taskmanager_id, generation_id, key):
+        self.flush()
         return self.datasource.get_header(taskmanager_id, generation_id, key)
 
     def get_metadata(self, taskmanager_id, generation_id, key):
+        self.flush()
         return self.datasource.get_metadata(taskmanager_id, generation_id, key)
 
     def duplicate_datablock(self, taskmanager_id, generation_id, new_generation_id):
+        self.flush()
         return self.datasource.duplicate_datablock(taskmanager_id, generation_id, new_generation_id)
 
     def delete(self, taskmanager_id, all_generations=False):
@@ -165,14 +246,31 @@ class DataSpace:
         self.datasource.mark_demented(taskmanager_id, generation_id, keys)
 
     def close(self):
-        self.datasource.close()
+        try:
+            if self.write_behind:
+                self.write_behind.close()
+        finally:
+            self.datasource.close()
 
     def store_taskmanager(self, name, taskmanager_id, datestamp=None):
         return self.datasource.store_taskmanager(name, taskmanager_id, datestamp)
 
     def get_last_generation_id(self, taskmanager_name, taskmanager_id=None):
+        self.flush()
         return self.datasource.get_last_generation_id(taskmanager_name, taskmanager_id)
 
+    def commit_generation(self, taskmanager_id, generation_id):
+        if self.write_behind:
+            # recorded once the queued writes of the generation are persisted
+            self.write_behind.submit(
+                functools.partial(self.datasource.commit_generation, taskmanager_id, generation_id), {}
+            )
+        else:
+            self.datasource.commit_generation(taskmanager_id, generation_id)
+
+    def get_committed_generation(self, taskmanager_name):
+        return self.datasource.get_committed_generation(taskmanager_name)
+
     def get_taskmanager(self, taskmanager_name, taskmanager_id=None):
         return self.datasource.get_taskmanager(taskmanager_name, taskmanager_id)
 
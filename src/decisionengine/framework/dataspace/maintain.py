@@ -1,6 +1,7 @@
 # SPDX-FileCopyrightText: 2017 Fermi Research Alliance, LLC
 # SPDX-License-Identifier: Apache-2.0
 
+import datetime
 import threading
 
 import structlog
@@ -9,6 +10,13 @@ import decisionengine.framework.dataspace.dataspace as dataspace
 
 from decisionengine.framework.modules.logging_configDict import DELOGGER_CHANNEL_NAME, LOGGERNAME
 from decisionengine.framework.taskmanager.ProcessingState import ProcessingState, State, STOPPING_CONDITIONS
+from decisionengine.framework.util.metrics import Counter, Gauge, Histogram
+
+REAPER_DELETED_ROWS = Counter("de_reaper_deleted_rows", "Number of database rows deleted by the reaper")
+REAPER_BATCH_DURATION = Histogram("de_reaper_batch_duration_seconds", "Time to delete one batch of expired data")
+REAPER_LAST_COMPLETED = Gauge(
+    "de_reaper_last_completed_timestamp_seconds", "Time the reaper last deleted all the expired data"
+)
 
 
 class Reaper:
@@ -22,6 +30,8 @@ class Reaper:
 
     MIN_RETENTION_INTERVAL_DAYS = 7
     MIN_SECONDS_BETWEEN_RUNS = 2 * 60 * 59
+    DEFAULT_BATCH_SIZE = 10000
+    DEFAULT_SECONDS_BETWEEN_BATCHES = 1
 
     def __init__(self, config):
         """
@@ -36,6 +46,8 @@ class Reaper:
         # since we must validate this, have a private store space
         self.__retention_interval = self.MIN_RETENTION_INTERVAL_DAYS
         self.__seconds_between_runs = self.MIN_SECONDS_BETWEEN_RUNS
+        self.__batch_size = self.DEFAULT_BATCH_SIZE
+        self.__seconds_between_batches = self.DEFAULT_SECONDS_BETWEEN_BATCHES
 
         if not config.get("dataspace"):
             self.logger.exception("Error in initializing Reaper!")
@@ -53,6 +65,10 @@ class Reaper:
             db_driver_config = config["dataspace"]["datasource"]["config"]
             self.retention_interval = config["dataspace"]["retention_interval_in_days"]
             self.seconds_between_runs = config["dataspace"].get("reaper_run_interval", 24 * 60 * 60)
+            self.batch_size = config["dataspace"].get("reaper_batch_size", self.DEFAULT_BATCH_SIZE)
+            self.seconds_between_batches = config["dataspace"].get(
+                "reaper_seconds_between_batches", self.DEFAULT_SECONDS_BETWEEN_BATCHES
+            )
         except KeyError:
             self.logger.exception("Error in initializing Reaper!")
             raise dataspace.DataSpaceConfigurationError("Invalid dataspace configuration")
@@ -63,6 +79,7 @@ class Reaper:
 
         self.thread = None
         self.state = ProcessingState()
+        self.progress = {"rows_deleted": 0, "batches": 0, "started": None, "completed": None}
 
     @property
     def retention_interval(self):
@@ -94,19 +111,73 @@ class Reaper:
         self.logger.debug(f"Reaper setting seconds_between_runs to {value}.")
         self.__seconds_between_runs = int(value)
 
+    @property
+    def batch_size(self):
+        """We have data constraints, so use a property to track"""
+        return self.__batch_size
+
+    @batch_size.setter
+    def batch_size(self, value):
+        if int(value) < 1:
+            self.logger.exception("Error in initializing Reaper!")
+            raise ValueError("The reaper batch size has to be a positive number of rows")
+        self.logger.debug(f"Reaper setting batch_size to {value}.")
+        self.__batch_size = int(value)
+
+    @property
+    def seconds_between_batches(self):
+        """We have data constraints, so use a property to track"""
+        return self.__seconds_between_batches
+
+    @seconds_between_batches.setter
+    def seconds_between_batches(self, value):
+        if float(value) < 0:
+            self.logger.exception("Error in initializing Reaper!")
+            raise ValueError("The time between reaper batches cannot be negative")
+        self.logger.debug(f"Reaper setting seconds_between_batches to {value}.")
+        self.__seconds_between_batches = float(value)
+
     def reap(self):
         """
-        Actually spawn the query to delete the old records.
-        Lock the state as this task doesn't have a cancel option.
+        Actually spawn the queries to delete the old records.
+
+        The records are deleted in batches of at most batch_size rows,
+        waiting seconds_between_batches between them.  Lock the state
+        while a batch runs as it doesn't have a cancel option; a stop
+        is honoured between batches.  Every batch is committed on its
+        own, so an interrupted run is carried on by the next one.
         """
         with self.state.lock:
             if self.state.should_stop():
                 return
             self.logger.info("Reaper.reap() started.")
             self.state.set(State.ACTIVE)
-            self.datasource.delete_data_older_than(self.retention_interval)
-            self.state.set(State.STEADY)
-            self.logger.info("Reaper.reap() completed.")
+            self.progress.update(rows_deleted=0, batches=0, started=datetime.datetime.now(), completed=None)
+
+        while True:
+            with self.state.lock:
+                if self.state.should_stop():
+                    self.logger.info(f"Reaper.reap() interrupted after {self.progress['batches']} batches.")
+                    return
+                with REAPER_BATCH_DURATION.time():
+                    deleted = self.datasource.delete_data_older_than(self.retention_interval, self.batch_size)
+            if not deleted:
+                break
+            REAPER_DELETED_ROWS.inc(deleted)
+            self.progress["rows_deleted"] += deleted
+            self.progress["batches"] += 1
+            self.logger.debug(f"Reaper deleted {deleted} rows, {self.progress['rows_deleted']} in this run.")
+            if deleted < self.batch_size:
+                # a short batch found nothing left to delete
+                break
+            self.state.wait_until(STOPPING_CONDITIONS, timeout=self.seconds_between_batches)
+
+        with self.state.lock:
+            self.progress["completed"] = datetime.datetime.now()
+            REAPER_LAST_COMPLETED.set(self.progress["completed"].timestamp())
+            if not self.state.should_stop():
+                self.state.set(State.STEADY)
+            self.logger.info(f"Reaper.reap() completed, {self.progress['rows_deleted']} rows deleted.")
 
     def _reaper_loop(self, delay):
         """
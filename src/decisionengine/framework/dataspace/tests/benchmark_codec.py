@@ -0,0 +1,130 @@
+# SPDX-FileCopyrightText: 2017 Fermi Research Alliance, LLC
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Compare the legacy ``compress(str(...))`` product envelope with the binary
+envelope of :mod:`decisionengine.framework.dataspace.codec`.
+
+Not collected by pytest, run it by hand::
+
+    python -m decisionengine.framework.dataspace.tests.benchmark_codec
+
+Every measurement runs in a fresh process so that the reported peak RSS
+(``VmHWM``) only accounts for the operation being measured.
+"""
+
+import argparse
+import ast
+import multiprocessing
+import os
+import pickle
+import resource
+import tempfile
+import time
+
+import numpy
+import pandas as pd
+
+from decisionengine.framework.dataspace import codec, datablock
+
+
+def make_dataframe(target_bytes):
+    """
+    Build a DataFrame of roughly ``target_bytes`` mixing numeric and string columns
+    """
+
+    def build(rows):
+        rng = numpy.random.default_rng(42)
+        return pd.DataFrame(
+            {
+                "ReqIdleGlideins": rng.integers(0, 1000, rows),
+                "ReqMaxGlideins": rng.integers(0, 1000, rows),
+                "GlideinPrice": rng.random(rows),
+                "Utilization": rng.random(rows),
+                "EntryName": rng.choice(["CMS_T1_US_FNAL", "CMS_T2_US_UCSD", "AWS_us_east_1"], rows),
+            }
+        )
+
+    sample = 1000
+    row_bytes = build(sample).memory_usage(deep=True).sum() / sample
+    return build(int(target_bytes / row_bytes))
+
+
+def legacy_encode(value):
+    return datablock.compress({"pickled": True, "value": pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)})
+
+
+def legacy_decode(blob):
+    value = ast.literal_eval(datablock.decompress(blob))
+    return datablock.zloads(value.get("value"))
+
+
+ENVELOPES = {
+    "legacy": (legacy_encode, legacy_decode),
+    "binary": (codec.encode, codec.decode),
+}
+
+
+def _maxrss():
+    # ru_maxrss survives exec, so the children would inherit the peak of this
+    # process; VmHWM belongs to the address space and starts afresh
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _measure(envelope, operation, source, results):
+    encode, decode = ENVELOPES[envelope]
+    if operation == "encode":
+        data = make_dataframe(source)
+    else:
+        with open(source, "rb") as f:
+            data = f.read()
+    baseline = _maxrss()
+    start = time.perf_counter()
+    out = (encode if operation == "encode" else decode)(data)
+    elapsed = time.perf_counter() - start
+    results.put((elapsed, max(_maxrss() - baseline, 0), len(out) if operation == "encode" else None))
+
+
+def measure(envelope, operation, source):
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    proc = ctx.Process(target=_measure, args=(envelope, operation, source, results))
+    proc.start()
+    result = results.get()
+    proc.join()
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=float, default=10, help="approximate DataFrame size in MB")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement, the best one is reported")
+    args = parser.parse_args(argv)
+    target_bytes = int(args.size_mb * 1024 * 1024)
+
+    print(f"DataFrame memory usage: {make_dataframe(target_bytes).memory_usage(deep=True).sum() / 2**20:.1f} MiB")
+    print(f"{'envelope':<10}{'operation':<10}{'time [s]':>10}{'peak RSS [MiB]':>16}{'stored [MiB]':>14}")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for envelope, (encode, _) in ENVELOPES.items():
+            # the decode runs read the stored product from disk so that building
+            # the DataFrame does not count towards their peak RSS
+            blob = os.path.join(tmpdir, envelope)
+            with open(blob, "wb") as f:
+                f.write(encode(make_dataframe(target_bytes)))
+            for operation, source in (("encode", target_bytes), ("decode", blob)):
+                runs = [measure(envelope, operation, source) for _ in range(args.repeat)]
+                elapsed = min(r[0] for r in runs)
+                peak = min(r[1] for r in runs)
+                stored = f"{runs[0][2] / 2**20:.1f}" if runs[0][2] is not None else ""
+                print(f"{envelope:<10}{operation:<10}{elapsed:>10.3f}{peak / 2**20:>16.1f}{stored:>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,26 +9,32 @@ from decisionengine.framework.dataspace import dataspace as ds
 from decisionengine.framework.dataspace.datasources.tests.fixtures import (  # noqa: F401
     DATABASES_TO_TEST,
     datasource,
+    DATASOURCES_TO_TEST,
     load_sample_data_into_datasource,
+    MEMORY_DATASOURCE,
     PG_DE_DB_WITHOUT_SCHEMA,
     PG_PROG,
     SQLALCHEMY_PG_WITH_SCHEMA,
     SQLALCHEMY_TEMPFILE_SQLITE,
+    SQLALCHEMY_TEMPFILE_SQLITE_WEEKLY,
 )
 
 __all__ = [
     "PG_DE_DB_WITHOUT_SCHEMA",
     "PG_PROG",
     "DATABASES_TO_TEST",
+    "DATASOURCES_TO_TEST",
+    "MEMORY_DATASOURCE",
     "SQLALCHEMY_PG_WITH_SCHEMA",
     "SQLALCHEMY_TEMPFILE_SQLITE",
+    "SQLALCHEMY_TEMPFILE_SQLITE_WEEKLY",
     "datasource",
     "dataspace",
     "load_sample_data_into_datasource",
 ]
 
 
-@pytest.fixture(params=DATABASES_TO_TEST)
+@pytest.fixture(params=DATASOURCES_TO_TEST)
 def dataspace(request):
     """
     This parameterized fixture will setup up various datasources.
@@ -41,11 +47,19 @@ def dataspace(request):
     """
     conn_fixture = request.getfixturevalue(request.param)
 
+    if request.param == "MEMORY_DATASOURCE":
+        my_ds = ds.DataSpace({"dataspace": {"datasource": {**conn_fixture, "config": {}}}})
+        load_sample_data_into_datasource(my_ds)
+        yield my_ds
+        return
+
     db_info = {}
     try:
         # SQL Alchemy
         db_info["url"] = conn_fixture["url"]
         db_info["echo"] = True  # put into extra chatty mode for tests
+        if "table_period" in conn_fixture:
+            db_info["table_period"] = conn_fixture["table_period"]
     except TypeError:
         # psycopg2
         db_info["host"] = conn_fixture.info.host
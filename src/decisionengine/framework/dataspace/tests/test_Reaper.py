@@ -85,7 +85,7 @@ def test_start_stop_stop(reaper):
 
 
 def test_state_can_be_active(reaper):
-    def sleepnow(arg1=None, arg2=None):
+    def sleepnow(*args, **kwargs):
         time.sleep(3)
 
     with mock.patch.object(NullDataSource, "delete_data_older_than", new=sleepnow):
@@ -96,7 +96,7 @@ def test_state_can_be_active(reaper):
 
 @pytest.mark.timeout(20)
 def test_state_sets_timer_and_uses_it(reaper):
-    def sleepnow(arg1=None, arg2=None):
+    def sleepnow(*args, **kwargs):
         time.sleep(3)
 
     with mock.patch.object(NullDataSource, "delete_data_older_than", new=sleepnow):
@@ -111,6 +111,33 @@ def test_state_sets_timer_and_uses_it(reaper):
         reaper.state.wait_while(State.ACTIVE)  # let the reaper finish its scan
 
 
+def test_reap_in_batches(reaper):
+    reaper.batch_size = 10
+    reaper.seconds_between_batches = 0
+    with mock.patch.object(NullDataSource, "delete_data_older_than", side_effect=[10, 10, 3, 0]) as function:
+        reaper.reap()
+    assert function.call_count == 3
+    function.assert_called_with(reaper.retention_interval, 10)
+    assert reaper.state.get() == State.STEADY
+    assert reaper.progress["rows_deleted"] == 23
+    assert reaper.progress["batches"] == 3
+    assert reaper.progress["completed"] is not None
+
+
+@pytest.mark.timeout(20)
+def test_stop_between_batches(reaper):
+    reaper.batch_size = 10
+    reaper.seconds_between_batches = 60
+    with mock.patch.object(NullDataSource, "delete_data_older_than", return_value=10) as function:
+        reaper.start()
+        while not reaper.progress["batches"]:
+            time.sleep(0.1)
+        reaper.stop()
+    assert reaper.state.get() == State.SHUTDOWN
+    assert function.call_count == 1
+    assert reaper.progress["completed"] is None
+
+
 def test_start_delay(reaper):
     reaper.start(delay=90)
     assert reaper.state.get() == State.IDLE
@@ -136,6 +163,13 @@ def test_fail_small_run_interval(reaper):
         reaper.seconds_between_runs = 1
 
 
+def test_fail_bad_batch_size(reaper):
+    with pytest.raises(ValueError):
+        reaper.batch_size = 0
+    with pytest.raises(ValueError):
+        reaper.seconds_between_batches = -1
+
+
 def test_fail_start_two_reapers(reaper):
     reaper.start()
     assert reaper.state.get() in (State.IDLE, State.ACTIVE, State.STEADY)
@@ -0,0 +1,147 @@
+# SPDX-FileCopyrightText: 2017 Fermi Research Alliance, LLC
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import pickle
+
+import numpy
+import pandas as pd
+import pytest
+
+from decisionengine.framework.dataspace import codec, datablock
+
+SAMPLE_DICTIONARY = b"".join(f"glidein_{i}_CMS_T2_US_UCSD_ReqIdleGlideins".encode() for i in range(20))
+
+
+@pytest.mark.parametrize(
+    "name, codec_id",
+    [
+        ("none", codec.CODEC_NONE),
+        ("zlib", codec.CODEC_ZLIB),
+        ("lzma", codec.CODEC_LZMA),
+        ("bz2", codec.CODEC_BZ2),
+        ("zlib_dict", codec.CODEC_ZLIB_DICT),
+    ],
+)
+def test_encode_decode_roundtrip(name, codec_id):
+    compression = codec.Compression(name, min_size=0, dictionary=SAMPLE_DICTIONARY)
+    df = pd.DataFrame({"a": range(100), "b": ["x"] * 100})
+    blob = codec.encode(df, compression)
+    assert codec.is_envelope(blob)
+    assert blob[0] == codec.ENVELOPE_MAGIC
+    assert blob[1] == codec_id
+    assert codec.decode(blob).equals(df)
+
+    products = {"a": {"b": "c" * 100}}
+    assert codec.decode(codec.encode(products, compression)) == products
+
+
+def test_small_and_incompressible_payloads_are_stored_uncompressed():
+    blob = codec.encode("small", codec.Compression("zlib", min_size=1024))
+    assert blob[1] == codec.CODEC_NONE
+    assert codec.decode(blob) == "small"
+
+    noise = os.urandom(256 * 1024)
+    blob = codec.encode(noise, codec.Compression("zlib", min_size=0))
+    assert blob[1] == codec.CODEC_NONE
+    assert codec.decode(blob) == noise
+
+
+@pytest.mark.parametrize("name", ["none", "zlib", "lzma"])
+def test_out_of_band_buffers(name):
+    df = pd.DataFrame({"a": numpy.arange(100_000), "b": numpy.linspace(0, 1, 100_000), "c": ["x"] * 100_000})
+    blob = codec.encode(df, codec.Compression(name))
+    assert blob[2] & codec.FLAG_OUT_OF_BAND
+
+    decoded = codec.decode(blob)
+    assert decoded.equals(df)
+    # decoded products can be modified in place
+    decoded.loc[0, "a"] = 5
+    decoded["b"] += 1
+    assert decoded["a"].iloc[0] == 5
+    assert decoded["b"].iloc[-1] == 2.0
+
+    small = pd.DataFrame({"a": [1, 2, 3]})
+    assert not codec.encode(small, codec.Compression(name))[2] & codec.FLAG_OUT_OF_BAND
+
+
+def test_unknown_codec():
+    with pytest.raises(ValueError):
+        codec.Compression("snappy")
+
+    blob = bytearray(codec.encode("value"))
+    blob[1] = 255
+    with pytest.raises(codec.EnvelopeError):
+        codec.decode(bytes(blob))
+
+    blob = bytearray(codec.encode("value"))
+    blob[2] = 0x80
+    with pytest.raises(codec.EnvelopeError):
+        codec.decode(bytes(blob))
+
+
+def test_zlib_dict_requires_known_dictionary():
+    with pytest.raises(ValueError):
+        codec.Compression("zlib_dict")
+
+    compression = codec.Compression("zlib_dict", min_size=0, dictionary=SAMPLE_DICTIONARY)
+    blob = bytearray(codec.encode(SAMPLE_DICTIONARY, compression))
+    assert blob[1] == codec.CODEC_ZLIB_DICT
+    blob[3:7] = b"\0\0\0\0"
+    with pytest.raises(codec.EnvelopeError):
+        codec.decode(bytes(blob))
+
+
+def test_train_dictionary():
+    samples = [pickle.dumps({"ReqIdleGlideins": i, "EntryName": "CMS_T2_US_UCSD"}) for i in range(10)]
+    dictionary = codec.train_dictionary(samples, size=128)
+    assert 0 < len(dictionary) <= 128
+
+    plain = codec.Compression("zlib", min_size=0)
+    with_dict = codec.Compression("zlib_dict", min_size=0, dictionary=dictionary)
+    value = {"ReqIdleGlideins": 42, "EntryName": "CMS_T2_US_UCSD"}
+    assert len(codec.encode(value, with_dict)) < len(codec.encode(value, plain))
+    assert codec.decode(codec.encode(value, with_dict)) == value
+
+
+def test_compression_policy_from_config(tmp_path):
+    dictionary = tmp_path / "products.zdict"
+    dictionary.write_bytes(SAMPLE_DICTIONARY)
+    policy = codec.CompressionPolicy.from_config(
+        {
+            "codec": "zlib",
+            "level": 1,
+            "min_size": 10,
+            "products": {
+                "big_key": {"codec": "lzma"},
+                "small_key": {"codec": "zlib_dict", "dictionary": str(dictionary)},
+            },
+        }
+    )
+    assert policy.for_key("other_key").codec == "zlib"
+    assert policy.for_key("other_key").level == 1
+    assert policy.for_key("big_key").codec == "lzma"
+    assert policy.for_key("big_key").level is None
+    assert policy.for_key("big_key").min_size == 10
+    assert policy.for_key("small_key").dictionary == SAMPLE_DICTIONARY
+
+    assert codec.CompressionPolicy.from_config(None).for_key("any").codec == "zlib"
+
+    with pytest.raises(ValueError):
+        codec.CompressionPolicy.from_config({"codec": "zlib", "compresslevel": 1})
+
+
+def test_decode_legacy_rows():
+    df = pd.DataFrame({"a": [1, 2, 3]})
+    pickled = datablock.compress({"pickled": True, "value": pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL)})
+    assert not codec.is_envelope(pickled)
+    assert codec.decode(pickled).equals(df)
+
+    zpickled = datablock.compress({"pickled": True, "value": datablock.zdumps(df)})
+    assert codec.decode(zpickled).equals(df)
+
+    plain = datablock.compress({"pickled": False, "value": {"a": {"b": "c"}}})
+    assert codec.decode(plain) == {"a": {"b": "c"}}
+
+    uncompressed = str({"pickled": False, "value": [1, 2]}).encode("latin1")
+    assert codec.decode(uncompressed) == [1, 2]
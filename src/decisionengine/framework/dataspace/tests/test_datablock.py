@@ -2,6 +2,9 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import ast
+import threading
+
+from unittest import mock
 
 import pytest
 
@@ -9,10 +12,12 @@ from decisionengine.framework.dataspace import datablock
 from decisionengine.framework.dataspace.tests.fixtures import (  # noqa: F401
     DATABASES_TO_TEST,
     dataspace,
+    MEMORY_DATASOURCE,
     PG_DE_DB_WITHOUT_SCHEMA,
     PG_PROG,
     SQLALCHEMY_PG_WITH_SCHEMA,
     SQLALCHEMY_TEMPFILE_SQLITE,
+    SQLALCHEMY_TEMPFILE_SQLITE_WEEKLY,
 )
 
 
@@ -81,6 +86,77 @@ def test_DataBlock_key_management(dataspace):  # noqa: F811
     assert dblock["new_example_test_key"] == newDict
 
 
+def test_DataBlock_key_index(dataspace):  # noqa: F811
+    my_tm = dataspace.get_taskmanagers()[0]  # fetch one of our loaded examples
+    header = datablock.Header(my_tm["taskmanager_id"])
+    dblock = datablock.DataBlock(dataspace, my_tm["name"], my_tm["taskmanager_id"])
+
+    with (
+        mock.patch.object(dataspace, "get_datablock", wraps=dataspace.get_datablock) as fetch_all,
+        mock.patch.object(dataspace, "get_datablock_keys", wraps=dataspace.get_datablock_keys) as fetch_keys,
+    ):
+        dblock.put("example_test_key", "example_test_value", header)
+        dblock.put("new_example_test_key", "new_example_test_value", header)
+        dblock.put("example_test_key", "updated_test_value", header)
+        assert "example_test_key" in dblock
+        assert "no_such_key_exists" not in dblock
+        assert dblock.keys() == ("example_test_key", "new_example_test_key")
+
+        dblock_2 = dblock.duplicate()
+        assert dblock.keys() == dblock_2.keys()
+
+        assert fetch_all.call_count == 0
+        assert fetch_keys.call_count == 1
+
+    # changing the generation by hand reloads the index
+    dblock.generation_id += 1
+    assert dblock.keys() == ()
+
+
+def test_ReadWriteLock():
+    lock = datablock._ReadWriteLock()
+    readers_in = threading.Barrier(2, timeout=5)
+    written = threading.Event()
+
+    def reader():
+        with lock.read():
+            # both readers hold the lock at the same time
+            readers_in.wait()
+
+    def writer():
+        with lock.write():
+            written.set()
+
+    readers = [threading.Thread(target=reader) for _ in range(2)]
+    with lock.read():
+        for thread in readers:
+            thread.start()
+        for thread in readers:
+            thread.join()
+        writing = threading.Thread(target=writer)
+        writing.start()
+        # the writer waits for the readers to leave
+        assert not written.wait(0.1)
+    writing.join()
+    assert written.is_set()
+    assert not readers_in.broken
+
+
+def test_DataBlock_put_many(dataspace):  # noqa: F811
+    my_tm = dataspace.get_taskmanagers()[0]  # fetch one of our loaded examples
+    header = datablock.Header(my_tm["taskmanager_id"])
+    dblock = datablock.DataBlock(dataspace, my_tm["name"], my_tm["taskmanager_id"])
+    dblock.put("example_test_key", "example_test_value", header)
+
+    with mock.patch.object(dataspace.datasource, "put_many", wraps=dataspace.datasource.put_many) as put_many:
+        dblock.put_many({"example_test_key": "updated_test_value", "new_example_test_key": {"a": 1}}, header)
+        assert put_many.call_count == 1
+
+    assert dblock.keys() == ("example_test_key", "new_example_test_key")
+    assert dblock["example_test_key"] == "updated_test_value"
+    assert dblock["new_example_test_key"] == {"a": 1}
+
+
 def test_DataBlock_key_management_change_name(dataspace):  # noqa: F811
     my_tm = dataspace.get_taskmanagers()[0]  # fetch one of our loaded examples
     header = datablock.Header(my_tm["taskmanager_id"])
@@ -131,6 +207,45 @@ def test_DataBlock_get_metadata(dataspace):  # noqa: F811
     assert metadata == dblock.get_metadata("example_test_key")
 
 
+def test_DataBlock_get_with_envelope(dataspace):  # noqa: F811
+    my_tm = dataspace.get_taskmanagers()[0]  # fetch one of our loaded examples
+    header = datablock.Header(my_tm["taskmanager_id"])
+    metadata = datablock.Metadata(
+        my_tm["taskmanager_id"],
+        generation_id=dataspace.get_last_generation_id(my_tm["name"], my_tm["taskmanager_id"]),
+    )
+    dblock = datablock.DataBlock(dataspace, my_tm["name"], my_tm["taskmanager_id"])
+
+    dblock.put("example_test_key", "example_test_value", header, metadata)
+
+    with mock.patch.object(dataspace, "get_envelope", wraps=dataspace.get_envelope) as get_envelope:
+        value, envelope_header, envelope_metadata = dblock.get_with_envelope("example_test_key")
+    get_envelope.assert_called_once()
+
+    assert value == "example_test_value"
+    assert header == envelope_header
+    assert metadata == envelope_metadata
+
+    with pytest.raises(KeyError):
+        dblock.get_with_envelope("no_such_key_exists")
+
+
+def test_Header_is_compact_mapping():
+    header = datablock.Header("11111111-1111-1111-1111-111111111111", creator="module")
+
+    assert not hasattr(header, "__dict__")
+    assert header["creator"] == "module"
+    assert dict(header) == header.data
+    with pytest.raises(TypeError):
+        header.data["creator"] = "other_module"
+    header["creator"] = "other_module"
+    assert header.data["creator"] == "other_module"
+    with pytest.raises(KeyError):
+        header["no_such_field"] = 1
+    with pytest.raises(TypeError):
+        del header["creator"]
+
+
 def test_DataBlock_get_taskmanager(dataspace):  # noqa: F811
     my_tm = dataspace.get_taskmanagers()[0]  # fetch one of our loaded examples
     header = datablock.Header(my_tm["taskmanager_id"])
@@ -196,6 +311,34 @@ def test_DataBlock_get_dataproducts(dataspace):  # noqa: F811
     assert products[0]["value"] == "example_test_value"
 
 
+def test_DataBlock_iter_dataproducts(dataspace):  # noqa: F811
+    my_tm = dataspace.get_taskmanagers()[0]  # fetch one of our loaded examples
+    header = datablock.Header(my_tm["taskmanager_id"])
+    dblock = datablock.DataBlock(dataspace, my_tm["name"], my_tm["taskmanager_id"])
+
+    dblock.put("example_test_key", "example_test_value", header)
+    dblock.duplicate()
+    dblock.put("example_test_key", "changed_test_value", header)
+
+    products = dblock.iter_dataproducts("example_test_key")
+    assert next(products)["value"] == "example_test_value"
+    assert [product["value"] for product in products] == ["changed_test_value"]
+
+
+def test_DataBlock_commit(dataspace):  # noqa: F811
+    my_tm = dataspace.get_taskmanagers()[0]  # fetch one of our loaded examples
+    header = datablock.Header(my_tm["taskmanager_id"])
+    dblock = datablock.DataBlock(dataspace, my_tm["name"], my_tm["taskmanager_id"])
+
+    dblock.put("example_test_key", "example_test_value", header)
+    dblock_1 = dblock.duplicate()
+    dblock_1.commit()
+
+    committed = dataspace.get_committed_generation(my_tm["name"])
+    assert (committed["sequence_id"], committed["generation_id"]) == (dblock.sequence_id, dblock_1.generation_id)
+    assert committed["generation_id"] == dblock.generation_id - 1
+
+
 def test_DataBlock_duplicate(dataspace):  # noqa: F811
     my_tm = dataspace.get_taskmanagers()[0]  # fetch one of our loaded examples
     header = datablock.Header(my_tm["taskmanager_id"])
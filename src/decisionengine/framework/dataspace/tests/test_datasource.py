@@ -16,13 +16,20 @@ def test_has_methods_we_expect():
     assert True is callable(DataSource.create_tables)
     assert True is callable(DataSource.insert)
     assert True is callable(DataSource.update)
+    assert True is callable(DataSource.put_many)
     assert True is callable(DataSource.get_dataproduct)
     assert True is callable(DataSource.get_dataproducts)
+    assert True is callable(DataSource.iter_dataproducts)
+    assert True is callable(DataSource.iter_history)
+    assert True is callable(DataSource.get_envelope)
     assert True is callable(DataSource.get_header)
     assert True is callable(DataSource.get_metadata)
     assert True is callable(DataSource.get_datablock)
+    assert True is callable(DataSource.get_datablock_keys)
     assert True is callable(DataSource.duplicate_datablock)
     assert True is callable(DataSource.get_last_generation_id)
+    assert True is callable(DataSource.commit_generation)
+    assert True is callable(DataSource.get_committed_generation)
     assert True is callable(DataSource.close)
     assert True is callable(DataSource.store_taskmanager)
     assert True is callable(DataSource.get_taskmanagers)
@@ -12,10 +12,12 @@ from decisionengine.framework.dataspace.datablock import Header, Metadata
 from decisionengine.framework.dataspace.tests.fixtures import (  # noqa: F401
     DATABASES_TO_TEST,
     dataspace,
+    MEMORY_DATASOURCE,
     PG_DE_DB_WITHOUT_SCHEMA,
     PG_PROG,
     SQLALCHEMY_PG_WITH_SCHEMA,
     SQLALCHEMY_TEMPFILE_SQLITE,
+    SQLALCHEMY_TEMPFILE_SQLITE_WEEKLY,
 )
 
 
@@ -37,6 +39,11 @@ def test_dataspace_config_finds_bad():
         ds.DataSpace({"dataspace": {"asdf": "asdf"}})
     assert e.match("Invalid dataspace configuration")
 
+    datasource = {"module": "", "name": "", "config": {}}
+    with pytest.raises(ds.DataSpaceConfigurationError) as e:
+        ds.DataSpace({"dataspace": {"datasource": datasource, "compression": {"codec": "snappy"}}})
+    assert e.match("Invalid dataspace compression configuration")
+
 
 def test_get_taskmanager_exists(dataspace):  # noqa: F811
     """Can I get a taskmanager by name or name and uuid"""
@@ -0,0 +1,148 @@
+# SPDX-FileCopyrightText: 2017 Fermi Research Alliance, LLC
+# SPDX-License-Identifier: Apache-2.0
+
+from unittest import mock
+
+import numpy
+import pandas as pd
+import pytest
+
+from decisionengine.framework.dataspace import datablock
+from decisionengine.framework.dataspace.cache import ProductCache, read_only
+from decisionengine.framework.dataspace.tests.fixtures import (  # noqa: F401
+    DATABASES_TO_TEST,
+    dataspace,
+    MEMORY_DATASOURCE,
+    PG_DE_DB_WITHOUT_SCHEMA,
+    PG_PROG,
+    SQLALCHEMY_PG_WITH_SCHEMA,
+    SQLALCHEMY_TEMPFILE_SQLITE,
+    SQLALCHEMY_TEMPFILE_SQLITE_WEEKLY,
+)
+
+
+def test_cache_hit_and_miss():
+    cache = ProductCache(max_bytes=100)
+    assert cache.get((1, 1, "a")) is None
+
+    cache.put((1, 1, "a"), "value", 10)
+    assert (1, 1, "a") in cache
+    assert cache.get((1, 1, "a")) == "value"
+    assert cache.current_bytes == 10
+
+
+def test_cache_lru_eviction():
+    cache = ProductCache(max_bytes=30)
+    cache.put((1, 1, "a"), "a", 10)
+    cache.put((1, 1, "b"), "b", 10)
+    cache.put((1, 1, "c"), "c", 10)
+
+    # touch "a" so that "b" is the least recently used entry
+    cache.get((1, 1, "a"))
+    cache.put((1, 1, "d"), "d", 10)
+
+    assert (1, 1, "b") not in cache
+    assert (1, 1, "a") in cache
+    assert cache.current_bytes == 30
+
+
+def test_cache_skips_oversized_products():
+    cache = ProductCache(max_bytes=10)
+    assert cache.put((1, 1, "a"), "a", 11) == "a"
+    assert len(cache) == 0
+
+    # a product that is not cached is not shared, it is returned writable
+    df = pd.DataFrame({"a": [1, 2, 3]})
+    assert cache.put((1, 1, "df"), df, 11) is df
+    df.loc[0, "a"] = 5
+
+
+def test_cache_skips_products_invalidated_while_read():
+    cache = ProductCache(max_bytes=100)
+    # a reader misses and reads the product from the datasource
+    version = cache.version((1, 1, "a"))
+    assert cache.get((1, 1, "a")) is None
+    # meanwhile the product is written
+    cache.invalidate(1, 1, "a")
+    # the value read before the write is not cached
+    assert cache.put((1, 1, "a"), "stale", 1, version) == "stale"
+    assert (1, 1, "a") not in cache
+
+    version = cache.version((1, 1, "a"))
+    cache.put((1, 1, "a"), "fresh", 1, version)
+    assert cache.get((1, 1, "a")) == "fresh"
+
+
+def test_cache_disabled():
+    cache = ProductCache(max_bytes=0)
+    cache.put((1, 1, "a"), "a", 1)
+    assert cache.get((1, 1, "a"), "default") == "default"
+
+    with pytest.raises(ValueError):
+        ProductCache(max_bytes=-1)
+
+
+def test_cache_invalidates_later_generations():
+    cache = ProductCache(max_bytes=100)
+    cache.put((1, 1, "a"), "a1", 1)
+    cache.put((1, 2, "a"), "a2", 1)
+    cache.put((1, 2, "b"), "b2", 1)
+
+    cache.invalidate(1, 2, "a")
+    assert (1, 1, "a") in cache
+    assert (1, 2, "a") not in cache
+    assert (1, 2, "b") in cache
+
+    cache.invalidate(1, 1, "a")
+    assert (1, 1, "a") not in cache
+
+
+def test_read_only_handles():
+    df = pd.DataFrame({"a": [1, 2, 3], "b": [1.0, 2.0, 3.0]})
+    handle = read_only(df)
+    with pytest.raises(ValueError):
+        handle["a"].values[0] = 5
+    # new columns only land on the handle
+    handle["c"] = [4, 5, 6]
+    assert "c" not in df
+
+    handle = read_only(numpy.arange(3))
+    with pytest.raises(ValueError):
+        handle[0] = 5
+
+    products = {"a": [1, 2]}
+    handle = read_only(products)
+    handle["a"].append(3)
+    assert products == {"a": [1, 2]}
+
+
+def test_DataBlock_reads_through_cache(dataspace):  # noqa: F811
+    dataspace.product_cache = ProductCache(max_bytes=1024 * 1024)
+    my_tm = dataspace.get_taskmanagers()[0]  # fetch one of our loaded examples
+    header = datablock.Header(my_tm["taskmanager_id"])
+    dblock = datablock.DataBlock(dataspace, my_tm["name"], my_tm["taskmanager_id"])
+    dblock.put("example_test_key", pd.DataFrame({"a": [1, 2]}), header)
+
+    with mock.patch.object(dataspace, "get_dataproduct", wraps=dataspace.get_dataproduct) as fetch:
+        first = dblock["example_test_key"]
+        second = dblock["example_test_key"]
+        assert fetch.call_count == 1
+    assert first.equals(second)
+
+    # a new put invalidates the cached product
+    dblock.put("example_test_key", pd.DataFrame({"a": [3]}), header)
+    assert dblock["example_test_key"]["a"].tolist() == [3]
+
+
+def test_DataBlock_products_writable_by_default(dataspace):  # noqa: F811
+    assert not dataspace.product_cache.enabled
+    my_tm = dataspace.get_taskmanagers()[0]  # fetch one of our loaded examples
+    header = datablock.Header(my_tm["taskmanager_id"])
+    dblock = datablock.DataBlock(dataspace, my_tm["name"], my_tm["taskmanager_id"])
+    dblock.put("example_test_key", pd.DataFrame({"a": [1, 2]}), header)
+
+    df = dblock["example_test_key"]
+    df.loc[0, "a"] = 5
+    df["a"] += 1
+    assert df["a"].tolist() == [6, 3]
+    assert dblock["example_test_key"]["a"].tolist() == [1, 2]
@@ -0,0 +1,94 @@
+# SPDX-FileCopyrightText: 2017 Fermi Research Alliance, LLC
+# SPDX-License-Identifier: Apache-2.0
+
+import threading
+
+from unittest import mock
+
+import pytest
+
+from decisionengine.framework.dataspace import datablock
+from decisionengine.framework.dataspace.tests.fixtures import (  # noqa: F401
+    DATABASES_TO_TEST,
+    dataspace,
+    MEMORY_DATASOURCE,
+    PG_DE_DB_WITHOUT_SCHEMA,
+    PG_PROG,
+    SQLALCHEMY_PG_WITH_SCHEMA,
+    SQLALCHEMY_TEMPFILE_SQLITE,
+    SQLALCHEMY_TEMPFILE_SQLITE_WEEKLY,
+)
+from decisionengine.framework.dataspace.write_behind import WriteBehind, WriteBehindError
+
+
+def test_writes_run_in_order_and_overlay_is_served():
+    writer = WriteBehind(max_queue_size=4)
+    release = threading.Event()
+    written = []
+
+    def write(value):
+        release.wait(timeout=10)
+        written.append(value)
+
+    writer.submit(lambda: write(1), {(1, 1, "a"): b"1"})
+    writer.submit(lambda: write(2), {(1, 1, "a"): b"2", (1, 1, "b"): b"3"})
+    assert writer.get((1, 1, "a")) == b"2"
+    assert writer.get((1, 1, "b")) == b"3"
+    assert writer.get((1, 1, "c")) is None
+
+    release.set()
+    writer.flush()
+    assert written == [1, 2]
+    assert writer.get((1, 1, "a")) is None
+    writer.close()
+
+
+def test_failed_write_is_reported():
+    writer = WriteBehind(max_queue_size=1)
+
+    def fail():
+        raise RuntimeError("database is gone")
+
+    writer.submit(fail, {(1, 1, "a"): b"1"})
+    with pytest.raises(WriteBehindError):
+        writer.flush()
+    # the error is only reported once
+    writer.flush()
+    assert writer.get((1, 1, "a")) is None
+
+    with pytest.raises(ValueError):
+        WriteBehind(max_queue_size=0)
+
+
+def test_DataSpace_write_behind(dataspace):  # noqa: F811
+    dataspace.write_behind = WriteBehind(max_queue_size=4)
+    my_tm = dataspace.get_taskmanagers()[0]  # fetch one of our loaded examples
+    header = datablock.Header(my_tm["taskmanager_id"])
+    dblock = datablock.DataBlock(dataspace, my_tm["name"], my_tm["taskmanager_id"])
+    dblock.keys()
+
+    release = threading.Event()
+    put_many = dataspace.datasource.put_many
+
+    def slow_put_many(*args):
+        release.wait(timeout=10)
+        put_many(*args)
+
+    with mock.patch.object(dataspace.datasource, "put_many", side_effect=slow_put_many):
+        dblock.put_many({"example_test_key": "example_test_value"}, header)
+        dblock.commit()
+        # served from memory while the write is pending
+        assert dblock["example_test_key"] == "example_test_value"
+        assert "example_test_key" in dblock
+        # the generation is only committed after its products
+        with pytest.raises(Exception):
+            dataspace.get_committed_generation(my_tm["name"])
+        release.set()
+
+        dblock_2 = dblock.duplicate()
+
+    # duplicating waited for the write
+    assert dataspace.datasource.get_datablock_keys(dblock.sequence_id, dblock_2.generation_id) == ["example_test_key"]
+    assert dblock["example_test_key"] == "example_test_value"
+    assert dataspace.get_committed_generation(my_tm["name"])["generation_id"] == dblock_2.generation_id
+    dataspace.close()
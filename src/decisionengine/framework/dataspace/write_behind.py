@@ -0,0 +1,176 @@
+# SPDX-FileCopyrightText: 2017 Fermi Research Alliance, LLC
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Write-behind persistence of data products.
+
+Writes are queued, in order, to a background thread that runs them against
+the datasource.  Until a write has been persisted, the stored values it
+carries are served from an in-memory overlay keyed by
+``(sequence_id, generation_id, key)``.  The queue is bounded: when it is
+full, submitting blocks until the writer catches up.
+
+A write that fails is reported by the next :meth:`WriteBehind.submit` or
+:meth:`WriteBehind.flush` call as a :class:`WriteBehindError`.
+"""
+
+import os
+import queue
+import threading
+import time
+
+import structlog
+
+from decisionengine.framework.modules.logging_configDict import DELOGGER_CHANNEL_NAME, LOGGERNAME
+from decisionengine.framework.util.metrics import Counter, Gauge, Histogram
+
+__all__ = [
+    "DEFAULT_QUEUE_SIZE",
+    "WriteBehind",
+    "WriteBehindError",
+]
+
+#: Default bound of the write-behind queue, 0 disables write-behind
+DEFAULT_QUEUE_SIZE = 0
+
+QUEUE_DEPTH = Gauge("de_dataspace_write_behind_queue_depth", "Number of data product writes waiting to be persisted")
+WRITE_LATENCY = Histogram(
+    "de_dataspace_write_behind_latency_seconds",
+    "Time between queueing a data product write and its persistence",
+)
+FLUSH_SECONDS = Histogram(
+    "de_dataspace_write_behind_flush_seconds",
+    "Time spent waiting for the write-behind queue to drain",
+)
+WRITE_FAILURES = Counter("de_dataspace_write_behind_failures", "Number of data product writes that failed to persist")
+
+logger = structlog.getLogger(LOGGERNAME)
+logger = logger.bind(module=__name__.split(".")[-1], channel=DELOGGER_CHANNEL_NAME)
+
+
+class WriteBehindError(Exception):
+    """
+    A queued write could not be persisted
+    """
+
+    pass
+
+
+class WriteBehind:
+    """
+    Background writer with a bounded queue and an overlay of pending values
+    """
+
+    def __init__(self, max_queue_size):
+        """
+        :type max_queue_size: :obj:`int`
+        :arg max_queue_size: writes that may be waiting before submit blocks
+        """
+        if max_queue_size <= 0:
+            raise ValueError(f"write-behind queue size must be positive, got {max_queue_size}")
+        self.max_queue_size = max_queue_size
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._sequence = 0
+        self._error = None
+        self._pid = None
+        self._queue = None
+        self._thread = None
+
+    def _start(self):
+        """
+        Start the writer thread, again in a child process as threads do not
+        survive a fork; the caller holds the lock
+        """
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        if self._pid != os.getpid():
+            # the values queued in the parent are persisted by the parent
+            self._pending.clear()
+        self._pid = os.getpid()
+        self._queue = queue.Queue(maxsize=self.max_queue_size)
+        self._thread = threading.Thread(target=self._run, name="DataSpaceWriteBehind", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        work = self._queue
+        while True:
+            item = work.get()
+            try:
+                if item is None:
+                    return
+                sequence, submitted, write, products = item
+                try:
+                    write()
+                except Exception as e:
+                    WRITE_FAILURES.inc()
+                    logger.exception("Error persisting queued data products")
+                    with self._lock:
+                        self._error = self._error or e
+                WRITE_LATENCY.observe(time.monotonic() - submitted)
+                with self._lock:
+                    for product_key in products:
+                        if self._pending.get(product_key, (None,))[0] == sequence:
+                            del self._pending[product_key]
+            finally:
+                work.task_done()
+                QUEUE_DEPTH.set(work.qsize())
+
+    def _raise_error(self):
+        with self._lock:
+            error, self._error = self._error, None
+        if error is not None:
+            raise WriteBehindError(f"A queued data product write failed: {error}") from error
+
+    def submit(self, write, products):
+        """
+        Queue a write, blocks while the queue is full
+
+        :type write: :obj:`callable`
+        :arg write: persists the products when called without arguments
+        :type products: :obj:`dict`
+        :arg products: stored values keyed by ``(sequence_id, generation_id, key)``
+        """
+        self._raise_error()
+        with self._lock:
+            self._start()
+            self._sequence += 1
+            sequence = self._sequence
+            for product_key, value in products.items():
+                self._pending[product_key] = (sequence, value)
+            work = self._queue
+        work.put((sequence, time.monotonic(), write, tuple(products)))
+        QUEUE_DEPTH.set(work.qsize())
+
+    def get(self, product_key, default=None):
+        """
+        Return the stored value of a write that is not persisted yet
+
+        :type product_key: :obj:`tuple`
+        :arg product_key: ``(sequence_id, generation_id, key)``
+        """
+        with self._lock:
+            return self._pending.get(product_key, (None, default))[1]
+
+    def flush(self):
+        """
+        Wait until every queued write is persisted
+        """
+        with self._lock:
+            work = self._queue if self._pid == os.getpid() else None
+        if work is not None:
+            with FLUSH_SECONDS.time():
+                work.join()
+        self._raise_error()
+
+    def close(self):
+        """
+        Persist the queued writes and stop the writer thread
+        """
+        with self._lock:
+            running = self._pid == os.getpid() and self._thread.is_alive()
+            work = self._queue
+        if running:
+            work.put(None)
+            self._thread.join()
+        self._raise_error()
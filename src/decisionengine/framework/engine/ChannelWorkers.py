@@ -5,6 +5,7 @@ import logging
 import multiprocessing
 import os
 import threading
+import types
 
 import structlog
 
@@ -107,13 +108,18 @@ class ChannelWorkers:
           # Access to ws now protected
           ws['new_channel'] = ChannelWorker(...)
 
-    In cases where the decision engine's block_while method must be
-    called (e.g. during tests), one should use unguarded access:
+    Structural changes (adding or removing channels) are serialized by
+    the context manager, which hands out a copy of the workers and
+    publishes it on exit.  The published workers are never modified in
+    place, so read-only users should take an immutable snapshot instead,
+    which does not wait for a structural change in progress:
 
-      ws = workers.get_unguarded()
-      # Access to ws is unprotected
+      ws = workers.snapshot()
+      # ws does not change, even if channels are added or removed
       ws['new_channel'].wait_while(...)
 
+    The get_unguarded method is kept as an alias of snapshot.
+
     Calling a blocking method while using the protected context
     manager (i.e. workers.access()) will likely result in a deadlock.
     """
@@ -123,22 +129,27 @@ class ChannelWorkers:
         self._lock = threading.Lock()
 
     class Access:
-        def __init__(self, workers, lock):
-            self._workers = workers
-            self._lock = lock
+        def __init__(self, channel_workers):
+            self._channel_workers = channel_workers
+            self._workers = None
 
         def __enter__(self):
-            self._lock.acquire()
+            self._channel_workers._lock.acquire()
+            self._workers = dict(self._channel_workers._workers)
             return self._workers
 
         def __exit__(self, error, type, bt):
-            self._lock.release()
+            self._channel_workers._workers = self._workers
+            self._channel_workers._lock.release()
 
     def accessed_by_another_thread(self):
         return self._lock.locked()
 
     def access(self):
-        return self.Access(self._workers, self._lock)
+        return self.Access(self)
+
+    def snapshot(self):
+        return types.MappingProxyType(self._workers)
 
     def get_unguarded(self):
-        return self._workers
+        return self.snapshot()
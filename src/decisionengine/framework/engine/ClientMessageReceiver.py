@@ -4,6 +4,7 @@
 import logging
 import socket
 import sys
+import threading
 
 from kombu import Connection, Exchange, Queue
 
@@ -19,12 +20,16 @@ class ClientMessageReceiver:
             auto_delete=True,
         )
         self._done = False
+        self._data = bytearray()
         self._logger = None
         self._text = None
         if logger_name is not None:
             self._logger = logging.getLogger(logger_name)
             self._logger.setLevel(logging.INFO)
-            self._logger.addHandler(logging.StreamHandler(sys.stdout))
+            handler = logging.StreamHandler(sys.stdout)
+            # replies come in pieces, only the end of a line is terminated
+            handler.terminator = ""
+            self._logger.addHandler(handler)
         else:
             self._text = ""
 
@@ -34,23 +39,54 @@ class ClientMessageReceiver:
             self._done = True
             message.ack()
             return
+        if isinstance(body, bytes) and message.content_type == "application/data":
+            # a binary reply, e.g. a pickled product, is not text
+            if self._text is not None:
+                self._data += body
+            else:
+                sys.stdout.buffer.write(body)
+                sys.stdout.buffer.flush()
+            message.ack()
+            return
         if isinstance(body, bytes):
             body = body.decode()
         if self._text is not None:
             self._text += body
         else:
             assert self._logger is not None
-            self._logger.info(body)
+            self._logger.info(body if body.endswith("\n") else f"{body}\n")
         message.ack()
 
     def execute(self, func, *args):
+        """
+        Call func(*args) and collect the reply of the DE server
+
+        The call runs in its own thread, so the pieces of a long reply
+        are printed as the server sends them.  An exception raised by
+        func is raised again here.  A binary reply is written to stdout
+        as it is, or returned as bytes when there is no logger.
+        """
+        error = []
+
+        def call():
+            try:
+                func(*args)
+            except BaseException as e:
+                error.append(e)
+
         with Connection(self._broker_url) as conn, conn.Consumer([self._queue], callbacks=[self._receive]):
-            func(*args)
-            while not self._done:
+            caller = threading.Thread(target=call, name="ClientMessageReceiver.execute", daemon=True)
+            caller.start()
+            while not self._done and not error:
                 try:
                     conn.drain_events(timeout=2)
                 except (TimeoutError, socket.timeout):  # pragma: no cover
                     # no events found in time
                     pass
+            caller.join()
             self._queue.bind(conn.channel()).purge()
+        if error:
+            raise error[0]
+        if self._data:
+            return bytes(self._data)
         return self._text
@@ -11,12 +11,15 @@ if this environment variable is not defined the ``DE-Config.py`` file from the `
 """
 
 import argparse
+import concurrent.futures
 import contextlib
 import copy
 import enum
+import functools
 import json
 import logging
 import os
+import pickle
 import re
 import socketserver
 import sys
@@ -35,6 +38,7 @@ import tabulate
 from kombu import Connection, Exchange, Queue
 from kombu.transport.redis import Channel
 
+import decisionengine.framework.dataspace.codec as codec
 import decisionengine.framework.dataspace.datablock as datablock
 import decisionengine.framework.dataspace.dataspace as dataspace
 import decisionengine.framework.modules.de_logger as de_logger
@@ -44,6 +48,7 @@ import decisionengine.framework.taskmanager.TaskManager as TaskManager
 from decisionengine.framework.config import ChannelConfigHandler, policies, ValidConfig
 from decisionengine.framework.dataspace.maintain import Reaper
 from decisionengine.framework.engine.ChannelWorkers import ChannelWorker, ChannelWorkers
+from decisionengine.framework.engine.ResultCache import DEFAULT_RESULT_CACHE_BYTES, ResultCache
 from decisionengine.framework.engine.SourceWorkers import SourceWorkers
 from decisionengine.framework.modules.logging_configDict import DELOGGER_CHANNEL_NAME, LOGGERNAME
 from decisionengine.framework.taskmanager.module_graph import source_products, validated_workflow
@@ -53,6 +58,15 @@ from decisionengine.framework.util.redis_stats import redis_stats
 
 DEFAULT_WEBSERVER_PORT = 8000
 
+#: Rows of a product formatted and sent to a client at a time
+RESULT_PAGE_ROWS = 1000
+
+#: Bytes of a binary reply sent to a client in one message
+BINARY_CHUNK_BYTES = 8 * 1024 * 1024
+
+#: Default number of channels whose products are read at the same time
+DEFAULT_PRODUCT_FETCH_THREADS = 8
+
 # DecisionEngine metrics
 STATUS_HISTOGRAM = Histogram(
     "de_client_status_duration_seconds",
@@ -585,6 +599,86 @@ def _channel_preamble(name):
     return "\n" + rule + "\n" + header + "\n" + rule + "\n\n"
 
 
+def _dataframe_pages(frames):
+    """
+    Regroup a stream of DataFrames in pages of at most RESULT_PAGE_ROWS
+    rows, indexed as if the frames had been concatenated
+
+    Only one page and the frame being split are in memory at a time.  No
+    frames at all still give one empty page.
+    """
+    pending = []
+    pending_rows = 0
+    offset = 0
+    for df in frames:
+        pending.append(df)
+        pending_rows += len(df)
+        if pending_rows < RESULT_PAGE_ROWS:
+            continue
+        rows = pd.concat(pending, ignore_index=True) if len(pending) > 1 else pending[0]
+        full = len(rows) - len(rows) % RESULT_PAGE_ROWS
+        for start in range(0, full, RESULT_PAGE_ROWS):
+            page = rows.iloc[start : start + RESULT_PAGE_ROWS]
+            yield page.set_axis(range(offset, offset + len(page)))
+            offset += len(page)
+        pending = [rows.iloc[full:]] if full < len(rows) else []
+        pending_rows = len(rows) - full
+    if pending_rows:
+        rows = pd.concat(pending, ignore_index=True) if len(pending) > 1 else pending[0]
+        yield rows.set_axis(range(offset, offset + len(rows)))
+    elif not offset:
+        yield pd.DataFrame()
+
+
+class _PagedReply:
+    """
+    Send a reply to a client in pieces, each one as soon as the next is
+    ready, so the last piece can still be trimmed when the reply ends
+    """
+
+    def __init__(self, client_queue, routing_key_suffix="de_client"):
+        self.client_queue = client_queue
+        self.routing_key_suffix = routing_key_suffix
+        self.pending = ""
+
+    def write(self, txt):
+        if not txt:
+            return
+        if self.pending:
+            self.client_queue.push(self.pending, self.routing_key_suffix)
+        self.pending = txt
+
+    def close(self, trim=0):
+        self.client_queue.send(self.pending[: len(self.pending) - trim], self.routing_key_suffix)
+
+
+class _BinaryReply:
+    """
+    Write-only file object sending its bytes to a client as raw messages
+    of BINARY_CHUNK_BYTES, so large buffers are not copied whole
+    """
+
+    def __init__(self, client_queue, routing_key_suffix="de_client"):
+        self.client_queue = client_queue
+        self.routing_key_suffix = routing_key_suffix
+        self.pending = bytearray()
+
+    def write(self, data):
+        data = memoryview(data).cast("B")
+        written = len(data)
+        while data:
+            size = BINARY_CHUNK_BYTES - len(self.pending)
+            self.pending += data[:size]
+            data = data[size:]
+            if len(self.pending) == BINARY_CHUNK_BYTES:
+                self.client_queue.push(bytes(self.pending), self.routing_key_suffix)
+                self.pending = bytearray()
+        return written
+
+    def close(self):
+        self.client_queue.send(bytes(self.pending), self.routing_key_suffix)
+
+
 def _verify_redis_url(broker_url):
     m = re.search(r"(?P<backend>\w+)://.*", broker_url)
     if m is None:
@@ -623,6 +717,8 @@ class DecisionEngine(socketserver.ThreadingMixIn, xmlrpc.server.SimpleXMLRPCServ
         self.global_config = global_config
         self.dataspace = dataspace.DataSpace(self.global_config)
         self.reaper = Reaper(self.global_config)
+        self.result_cache = ResultCache(self.global_config.get("result_cache_bytes", DEFAULT_RESULT_CACHE_BYTES))
+        self.product_fetch_threads = self.global_config.get("product_fetch_threads", DEFAULT_PRODUCT_FETCH_THREADS)
         self.startup_complete = Event()
         self.shutdown_complete = Event()
         self.logger = structlog.getLogger(LOGGERNAME)
@@ -672,6 +768,8 @@ class DecisionEngine(socketserver.ThreadingMixIn, xmlrpc.server.SimpleXMLRPCServ
             def push(self, arg, routing_key_suffix="de_client"):
                 self.producer.publish(
                     arg,
+                    # bytes are sent as they are, not as JSON
+                    serializer="raw" if isinstance(arg, bytes) else None,
                     routing_key=f"client.requests.{routing_key_suffix}",
                     exchange=self.queue.exchange,
                     declare=[self.queue.exchange, self.queue],
@@ -691,25 +789,24 @@ class DecisionEngine(socketserver.ThreadingMixIn, xmlrpc.server.SimpleXMLRPCServ
         # Overrides the base class service_actions, taking sources
         # offline whenever the client task managers have gone offline.
 
-        # We take sources offline only if the channel workers are not
-        # being accessed by another thread.  This is important
-        # whenever (e.g.) channels are being brought online and an
-        # operator wants to check the DE status via an XMLRPC request.
+        # We take sources offline only if the channels are not being
+        # added or removed by another thread (e.g. channels being
+        # brought online, whose task managers are not running yet).
+        # Read-only requests use snapshots and do not hold the lock.
         if self.channel_workers.accessed_by_another_thread():
             return
 
-        with self.channel_workers.access() as workers:
-            for channel_name, worker in workers.items():
-                tm = worker.task_manager
-                if tm.state.probably_running():
-                    continue
+        for channel_name, worker in self.channel_workers.snapshot().items():
+            tm = worker.task_manager
+            if tm.state.probably_running():
+                continue
 
-                self.source_workers.detach(tm.name, tm.routing_keys)
+            self.source_workers.detach(tm.name, tm.routing_keys)
 
     def block_while(self, state, timeout=None):
         with BLOCK_WHILE_HISTOGRAM.labels(state=state).time():
             self.logger.debug(f"Waiting for {state} or timeout={timeout} on channel_workers.")
-            workers = self.channel_workers.get_unguarded()
+            workers = self.channel_workers.snapshot()
             if not workers:
                 self.logger.info("No active channels to wait on.")
                 return "No active channels."
@@ -741,10 +838,10 @@ class DecisionEngine(socketserver.ThreadingMixIn, xmlrpc.server.SimpleXMLRPCServ
     def _dataframe_to_table(self, df):
         return f"{tabulate.tabulate(df, headers='keys', tablefmt='psql')}\n"
 
-    def _dataframe_to_vertical_tables(self, df):
+    def _dataframe_to_vertical_tables(self, df, first_row=0):
         txt = ""
         for i in range(len(df)):
-            txt += f"Row {i}\n"
+            txt += f"Row {first_row + i}\n"
             txt += f"{tabulate.tabulate(df.T.iloc[:, [i]], tablefmt='psql')}\n"
         return txt
 
@@ -755,8 +852,63 @@ class DecisionEngine(socketserver.ThreadingMixIn, xmlrpc.server.SimpleXMLRPCServ
     def _dataframe_to_json(self, df):
         return f"{json.dumps(json.loads(df.to_json()), indent=4)}\n"
 
-    def _dataframe_to_csv(self, df):
-        return f"{df.to_csv()}\n"
+    def _dataframe_to_jsonl(self, df):
+        return df.to_json(orient="records", lines=True).rstrip("\n") + "\n" if len(df) else ""
+
+    def _dataframe_to_csv(self, df, header=True):
+        return df.to_csv(header=header)
+
+    def _committed_data_block(self, channel):
+        """
+        DataBlock of the last complete generation of channel, located with
+        a single lookup of the pointer its TaskManager commits
+        """
+        committed = self.dataspace.get_committed_generation(channel)
+        return datablock.DataBlock(
+            self.dataspace,
+            channel,
+            taskmanager_id=committed["taskmanager_id"],
+            generation_id=committed["generation_id"],
+            sequence_id=committed["sequence_id"],
+        )
+
+    def _select_product(self, df, columns=None, query=None, types=False):
+        """
+        Rows and columns of the product df to show, formatted directly
+        from the decoded DataFrame
+
+        df may be shared with the product cache, it is not modified.
+        """
+        if types:
+            df = df.copy(deep=False)
+            for column in list(df.columns):
+                df.insert(
+                    df.columns.get_loc(column) + 1,
+                    f"{column}.type",
+                    df[column].transform(lambda x: type(x).__name__),
+                )
+        if columns:
+            df = df.loc[:, columns.split(",")]
+        if query:
+            df = df.query(query)
+        return df
+
+    def _table_pages(self, df, format=None):
+        """
+        Format df a page of RESULT_PAGE_ROWS rows at a time, an empty df
+        still gives one page with the headers
+        """
+        if format == "vertical":
+            for start in range(0, len(df), RESULT_PAGE_ROWS):
+                yield self._dataframe_to_vertical_tables(df.iloc[start : start + RESULT_PAGE_ROWS], start)
+        elif format == "column-names":
+            yield self._dataframe_to_column_names(df)
+        elif format == "json":
+            # a single document, it cannot be split
+            yield self._dataframe_to_json(df)
+        else:
+            for start in range(0, max(len(df), 1), RESULT_PAGE_ROWS):
+                yield self._dataframe_to_table(df.iloc[start : start + RESULT_PAGE_ROWS])
 
     @PING_HISTOGRAM.time()
     def rpc_ping(self, client_queue):
@@ -802,107 +954,127 @@ class DecisionEngine(socketserver.ThreadingMixIn, xmlrpc.server.SimpleXMLRPCServ
             raise ValueError(f"Requested product should be a string not {type(product)}")
 
         with PRINT_PRODUCT_HISTOGRAM.labels(product=product).time():
+            # the channels are listed from a snapshot of the channel workers
+            steps = []
+            workers = self.channel_workers.snapshot()
+            for ch, worker in workers.items():
+                if not worker.is_alive():
+                    steps.append((ch, f"Channel {ch} is in not active\n"))
+                    self.logger.debug(f"Channel:{ch} is in not active when running rpc_print_product")
+                    continue
+
+                produces = worker.get_produces()
+                r = [x for x in list(produces.items()) if product in x[1]]
+                if not r:
+                    continue
+                steps.append((ch, None))
+                self.logger.debug(f"Found channel:{ch} active when running rpc_print_product")
+
             found = False
+            products = {}
+            reply = _PagedReply(client_queue)
             txt = f"Product {product}: "
-            with self.channel_workers.access() as workers:
-                for ch, worker in workers.items():
-                    if not worker.is_alive():
-                        txt += f"Channel {ch} is in not active\n"
-                        self.logger.debug(f"Channel:{ch} is in not active when running rpc_print_product")
+            for ch, message in steps:
+                if message is not None:
+                    txt += message
+                    continue
+                found = True
+                txt += f" Found in channel {ch}\n"
+                try:
+                    data_block = self._committed_data_block(ch)
+                    self.logger.debug(f"rpc_print_product - channel:{ch} generation:{data_block.generation_id}")
+                    if format == "pickle":
+                        products[ch] = self._select_product(data_block[product], columns, query, types)
                         continue
+                    for page in self.result_cache.pages(
+                        ch,
+                        (data_block.sequence_id, data_block.generation_id),
+                        (product, columns, query, bool(types), format),
+                        functools.partial(self._render_product, data_block, product, columns, query, types, format),
+                    ):
+                        reply.write(txt + page)
+                        txt = ""
+                except Exception as e:  # pragma: no cover
+                    txt += f"\t\t{e}\n"
+            if products:
+                # only the products, the client writes them to a file
+                self.logger.debug(f"rpc_print_product - {product}: {txt}")
+                binary_reply = _BinaryReply(client_queue)
+                pickle.dump(products, binary_reply, protocol=5)
+                return binary_reply.close()
+            if not found:
+                txt += "Not produced by any module\n"
+            reply.write(txt)
+            return reply.close(trim=1)
 
-                    produces = worker.get_produces()
-                    r = [x for x in list(produces.items()) if product in x[1]]
-                    if not r:
-                        continue
-                    found = True
-                    txt += f" Found in channel {ch}\n"
-                    self.logger.debug(f"Found channel:{ch} active when running rpc_print_product")
-                    tm = self.dataspace.get_taskmanager(ch)
-                    self.logger.debug(f"rpc_print_product - channel:{ch} taskmanager:{tm}")
+    def _render_product(self, data_block, product, columns=None, query=None, types=False, format=None):
+        return self._table_pages(self._select_product(data_block[product], columns, query, types), format)
+
+    def _channel_products(self, channel, produces, channel_config):
+        """
+        Tables of the products of the sources and transforms of channel,
+        in its last complete generation
+        """
+        try:
+            data_block = self._committed_data_block(channel)
+        except Exception as e:  # pragma: no cover
+            return f"\t{e}\n"
+        generation = (data_block.sequence_id, data_block.generation_id)
+        txt = ""
+        # FIXME: See comment below re. printing product dependencies of the logic engine.
+        for i in ("sources", "transforms"):
+            txt += f"\t{i}:\n"
+            modules = channel_config.get(i, {})
+            for mod_name in modules.keys():
+                txt += f"\t\t{mod_name}\n"
+                for product in produces[mod_name]:
                     try:
-                        data_block = datablock.DataBlock(
-                            self.dataspace, ch, taskmanager_id=tm["taskmanager_id"], sequence_id=tm["sequence_id"]
+                        txt += "".join(
+                            self.result_cache.pages(
+                                channel,
+                                generation,
+                                (product, None, None, False, None),
+                                functools.partial(self._render_product, data_block, product),
+                            )
                         )
-                        data_block.generation_id -= 1
-                        df = data_block[product]
-                        dfj = df.to_json()
-                        self.logger.debug(f"rpc_print_product - channel:{ch} task manager:{tm} datablock:{dfj}")
-                        df = pd.read_json(dfj)
-                        dataframe_formatter = self._dataframe_to_table
-                        if format == "vertical":
-                            dataframe_formatter = self._dataframe_to_vertical_tables
-                        if format == "column-names":
-                            dataframe_formatter = self._dataframe_to_column_names
-                        if format == "json":
-                            dataframe_formatter = self._dataframe_to_json
-                        if types:
-                            for column in df.columns:
-                                df.insert(
-                                    df.columns.get_loc(column) + 1,
-                                    f"{column}.type",
-                                    df[column].transform(lambda x: type(x).__name__),
-                                )
-                        column_names = []
-                        if columns:
-                            column_names = columns.split(",")
-                        if query:
-                            if column_names:
-                                txt += dataframe_formatter(df.loc[:, column_names].query(query))
-                            else:
-                                txt += dataframe_formatter(df.query(query))
-
-                        else:
-                            if column_names:
-                                txt += dataframe_formatter(df.loc[:, column_names])
-                            else:
-                                txt += dataframe_formatter(df)
                     except Exception as e:  # pragma: no cover
-                        txt += f"\t\t{e}\n"
-            if not found:
-                txt += "Not produced by any module\n"
-            return client_queue.send(txt[:-1])
+                        txt += f"\t\t\t{e}\n"
+        return txt
 
     @PRINT_PRODUCTS_HISTOGRAM.time()
     def rpc_print_products(self, client_queue):
-        with self.channel_workers.access() as workers:
-            channel_keys = workers.keys()
-            if not channel_keys:
-                return client_queue.send("No channels are currently active.")
-
-            width = max(len(x) for x in channel_keys) + 1
-            txt = ""
-            for ch, worker in workers.items():
-                if not worker.is_alive():
-                    txt += f"Channel {ch} is in ERROR state\n"
-                    continue
+        workers = self.channel_workers.snapshot()
+        channel_keys = workers.keys()
+        if not channel_keys:
+            return client_queue.send("No channels are currently active.")
 
-                txt += f"channel: {ch:<{width}}, id = {worker.task_manager.id:<{width}}, state = {worker.get_state_name():<10} \n"
-                tm = self.dataspace.get_taskmanager(ch)
-                data_block = datablock.DataBlock(
-                    self.dataspace, ch, taskmanager_id=tm["taskmanager_id"], sequence_id=tm["sequence_id"]
-                )
-                data_block.generation_id -= 1
-                channel_config = self.channel_config_loader.get_channels()[ch]
-                produces = worker.get_produces()
-                # FIXME: See comment below re. printing product dependencies of the logic engine.
-                for i in ("sources", "transforms"):
-                    txt += f"\t{i}:\n"
-                    modules = channel_config.get(i, {})
-                    for mod_name in modules.keys():
-                        txt += f"\t\t{mod_name}\n"
-                        for product in produces[mod_name]:
-                            try:
-                                df = data_block[product]
-                                df = pd.read_json(df.to_json())
-                                txt += f"{tabulate.tabulate(df, headers='keys', tablefmt='psql')}\n"
-                            except Exception as e:  # pragma: no cover
-                                txt += f"\t\t\t{e}\n"
+        width = max(len(x) for x in channel_keys) + 1
+        lines = {}
+        produces = {}
+        for ch, worker in workers.items():
+            if not worker.is_alive():
+                lines[ch] = f"Channel {ch} is in ERROR state\n"
+                continue
+            lines[ch] = (
+                f"channel: {ch:<{width}}, id = {worker.task_manager.id:<{width}}, state = {worker.get_state_name():<10} \n"
+            )
+            produces[ch] = worker.get_produces()
+
+        # the channels are read in parallel
+        channel_configs = self.channel_config_loader.get_channels()
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, min(self.product_fetch_threads, len(produces)))
+        ) as executor:
+            tables = executor.map(
+                self._channel_products, produces, produces.values(), [channel_configs[ch] for ch in produces]
+            )
+            tables = dict(zip(produces, tables))
+        txt = "".join(line + tables.get(ch, "") for ch, line in lines.items())
         return client_queue.send(txt[:-1])
 
     @STATUS_HISTOGRAM.time()
     def rpc_status(self, client_queue):
-        workers = self.source_workers.get_unguarded()
+        workers = self.source_workers.snapshot()
         source_keys = workers.keys()
         if not source_keys:
             return client_queue.send("No sources or channels are currently active.\n" + self.reaper_status())
@@ -916,7 +1088,7 @@ class DecisionEngine(socketserver.ThreadingMixIn, xmlrpc.server.SimpleXMLRPCServ
 
         client_queue.push("\n\n")
 
-        workers = self.channel_workers.get_unguarded()
+        workers = self.channel_workers.snapshot()
         channel_keys = workers.keys()
         assert channel_keys  # Not currently possible to have no channels if there are sources
 
@@ -940,7 +1112,7 @@ class DecisionEngine(socketserver.ThreadingMixIn, xmlrpc.server.SimpleXMLRPCServ
 
     @PRODUCT_DEPENDENCIES_HISTOGRAM.time()
     def rpc_product_dependencies(self, client_queue):
-        workers = self.source_workers.get_unguarded()
+        workers = self.source_workers.snapshot()
         if not workers:
             return client_queue.send("No sources or channels are currently active.")
 
@@ -951,7 +1123,7 @@ class DecisionEngine(socketserver.ThreadingMixIn, xmlrpc.server.SimpleXMLRPCServ
             txt += f"\t\tproduces: {list(produces)}\n"
         txt += "\n"
 
-        workers = self.channel_workers.get_unguarded()
+        workers = self.channel_workers.snapshot()
         assert workers  # Not currently possible to have no channels if there are no sources
 
         for ch, worker in sorted(workers.items()):
@@ -1164,59 +1336,59 @@ class DecisionEngine(socketserver.ThreadingMixIn, xmlrpc.server.SimpleXMLRPCServ
 
     def rpc_get_channel_log_level(self, client_queue, channel):
         with GET_CHANNEL_LOG_LEVEL_HISTOGRAM.labels(channel_name=channel).time():
-            with self.channel_workers.access() as workers:
-                worker = workers.get(channel)
-                if worker is None:
-                    return client_queue.send(f"No channel found with the name {channel}.")
+            workers = self.channel_workers.snapshot()
+            worker = workers.get(channel)
+            if worker is None:
+                return client_queue.send(f"No channel found with the name {channel}.")
 
-                if not worker.is_alive():
-                    return client_queue.send(f"Channel {channel} is in ERROR state.")
-                return client_queue.send(logging.getLevelName(worker.task_manager.get_loglevel()))
+            if not worker.is_alive():
+                return client_queue.send(f"Channel {channel} is in ERROR state.")
+            return client_queue.send(logging.getLevelName(worker.task_manager.get_loglevel()))
 
     def rpc_set_channel_log_level(self, client_queue, channel, log_level):
         """Assumes log_level is a string corresponding to the supported logging-module levels."""
         with SET_CHANNEL_LOG_LEVEL_HISTOGRAM.labels(channel_name=channel).time():
-            with self.channel_workers.access() as workers:
-                worker = workers.get(channel)
-                if worker is None:
-                    return client_queue.send(f"No channel found with the name {channel}.")
-
-                if not worker.is_alive():
-                    return client_queue.send(f"Channel {channel} is in ERROR state.")
-
-                log_level_code = getattr(logging, log_level)
-                if worker.task_manager.get_loglevel() == log_level_code:
-                    return client_queue.send(f"Nothing to do. Current log level is : {log_level}")
-                worker.task_manager.set_loglevel_value(log_level)
+            workers = self.channel_workers.snapshot()
+            worker = workers.get(channel)
+            if worker is None:
+                return client_queue.send(f"No channel found with the name {channel}.")
+
+            if not worker.is_alive():
+                return client_queue.send(f"Channel {channel} is in ERROR state.")
+
+            log_level_code = getattr(logging, log_level)
+            if worker.task_manager.get_loglevel() == log_level_code:
+                return client_queue.send(f"Nothing to do. Current log level is : {log_level}")
+            worker.task_manager.set_loglevel_value(log_level)
             return client_queue.send(f"Log level changed to : {log_level}")
 
     def rpc_get_source_log_level(self, client_queue, source):
         with GET_SOURCE_LOG_LEVEL_HISTOGRAM.labels(source_name=source).time():
-            with self.source_workers.access() as workers:
-                worker = workers.get(source)
-                if worker is None:
-                    return client_queue.send(f"No source found with the name {source}.")
+            workers = self.source_workers.snapshot()
+            worker = workers.get(source)
+            if worker is None:
+                return client_queue.send(f"No source found with the name {source}.")
 
-                if not worker.is_alive():
-                    return client_queue.send(f"Source {source} is in ERROR state.")
+            if not worker.is_alive():
+                return client_queue.send(f"Source {source} is in ERROR state.")
 
-                return client_queue.send(logging.getLevelName(worker.get_loglevel()))
+            return client_queue.send(logging.getLevelName(worker.get_loglevel()))
 
     def rpc_set_source_log_level(self, client_queue, source, log_level):
         """Assumes log_level is a string corresponding to the supported logging-module levels."""
         with SET_SOURCE_LOG_LEVEL_HISTOGRAM.labels(source_name=source).time():
-            with self.source_workers.access() as workers:
-                worker = workers.get(source)
-                if worker is None:
-                    return client_queue.send(f"No source found with the name {source}.")
-
-                if not worker.is_alive():
-                    return client_queue.send(f"Source {source} is in ERROR state.")
-
-                log_level_code = getattr(logging, log_level)
-                if worker.get_loglevel() == log_level_code:
-                    return client_queue.send(f"Nothing to do. Current log level is : {log_level}")
-                worker.set_loglevel_value(log_level)
+            workers = self.source_workers.snapshot()
+            worker = workers.get(source)
+            if worker is None:
+                return client_queue.send(f"No source found with the name {source}.")
+
+            if not worker.is_alive():
+                return client_queue.send(f"Source {source} is in ERROR state.")
+
+            log_level_code = getattr(logging, log_level)
+            if worker.get_loglevel() == log_level_code:
+                return client_queue.send(f"Nothing to do. Current log level is : {log_level}")
+            worker.set_loglevel_value(log_level)
             return client_queue.send(f"Log level changed to : {log_level}")
 
     def rpc_reaper_start(self, client_queue, delay=0):
@@ -1243,63 +1415,82 @@ class DecisionEngine(socketserver.ThreadingMixIn, xmlrpc.server.SimpleXMLRPCServ
     def rpc_reaper_status(self, client_queue):
         interval = self.reaper.retention_interval
         state = self.reaper.state.get()
-        return client_queue.send(f"reaper:\n\tstate: {state}\n\tretention_interval: {interval}")
+        progress = self.reaper.progress
+        return client_queue.send(
+            f"reaper:\n\tstate: {state}\n\tretention_interval: {interval}\n\tbatch_size: {self.reaper.batch_size}"
+            f"\n\tlast_run_started: {progress['started']}\n\tlast_run_completed: {progress['completed']}"
+            f"\n\tlast_run_batches: {progress['batches']}\n\tlast_run_rows_deleted: {progress['rows_deleted']}"
+        )
 
     @REAPER_STATUS_HISTOGRAM.time()
     def reaper_status(self):
         state = self.reaper.state.get()
         return f"\nreaper: state = {state.name}\n"
 
-    def rpc_query_tool(self, client_queue, product, format=None, start_time=None):
+    def rpc_query_tool(
+        self, client_queue, product, format=None, start_time=None, end_time=None, every_nth=None, limit=None
+    ):
         with QUERY_TOOL_HISTOGRAM.labels(product).time():
-            found = False
-            result = pd.DataFrame()
+            channels = []
+            reply = _PagedReply(client_queue, routing_key_suffix="de_query_tool")
             txt = f"Product {product}: "
 
-            with self.channel_workers.access() as workers:
-                for ch, worker in workers.items():
-                    if not worker.is_alive():
-                        txt += f"Channel {ch} is in not active\n"
-                        continue
+            workers = self.channel_workers.snapshot()
+            for ch, worker in workers.items():
+                if not worker.is_alive():
+                    txt += f"Channel {ch} is in not active\n"
+                    continue
 
-                    produces = worker.get_produces()
-                    r = [x for x in list(produces.items()) if product in x[1]]
-                    if not r:
-                        continue
-                    found = True
-                    txt += f" Found in channel {ch}\n"
-
-                    if start_time:
-                        tms = self.dataspace.get_taskmanagers(ch, start_time=start_time)
-                    else:
-                        tms = [self.dataspace.get_taskmanager(ch)]
-                    for tm in tms:
-                        try:
-                            data_block = datablock.DataBlock(
-                                self.dataspace, ch, taskmanager_id=tm["taskmanager_id"], sequence_id=tm["sequence_id"]
-                            )
-                            products = data_block.get_dataproducts(product)
-                            for p in products:
-                                df = p["value"]
-                                if df.shape[0] > 0:
-                                    df["channel"] = [tm["name"]] * df.shape[0]
-                                    df["taskmanager_id"] = [p["taskmanager_id"]] * df.shape[0]
-                                    df["generation_id"] = [p["generation_id"]] * df.shape[0]
-                                    result = pd.concat([result, df])
-                        except Exception as e:  # pragma: no cover
-                            txt += f"\t\t{e}\n"
-
-            if found:
-                dataframe_formatter = self._dataframe_to_table
-                if format == "csv":
-                    dataframe_formatter = self._dataframe_to_csv
-                if format == "json":
-                    dataframe_formatter = self._dataframe_to_json
-                result = result.reset_index(drop=True)
-                txt += dataframe_formatter(result)
-            else:
+                produces = worker.get_produces()
+                r = [x for x in list(produces.items()) if product in x[1]]
+                if not r:
+                    continue
+                channels.append(ch)
+                txt += f" Found in channel {ch}\n"
+
+            if not channels:
                 txt += "Not produced by any module\n"
-            return client_queue.send(txt, routing_key_suffix="de_query_tool")
+                reply.write(txt)
+                return reply.close()
+
+            def frames():
+                # one query for all the channels, products are read and decoded one at a time
+                for p in self.dataspace.iter_history(
+                    product,
+                    channels,
+                    start_time=start_time,
+                    end_time=end_time,
+                    every_nth=every_nth or 1,
+                    limit=limit,
+                    latest=not (start_time or end_time),
+                ):
+                    df = codec.decode(p["value"])
+                    if df.shape[0] > 0:
+                        df["channel"] = [p["name"]] * df.shape[0]
+                        df["taskmanager_id"] = [p["taskmanager_id"]] * df.shape[0]
+                        df["generation_id"] = [p["generation_id"]] * df.shape[0]
+                        yield df
+
+            try:
+                if format == "json":
+                    # a single document, the whole result is needed to write it
+                    result = list(frames())
+                    result = pd.concat(result, ignore_index=True) if result else pd.DataFrame()
+                    reply.write(txt + self._dataframe_to_json(result))
+                    txt = ""
+                else:
+                    for number, page in enumerate(_dataframe_pages(frames())):
+                        if format == "csv":
+                            reply.write(txt + self._dataframe_to_csv(page, header=number == 0))
+                        elif format == "jsonl":
+                            reply.write(txt + self._dataframe_to_jsonl(page))
+                        else:
+                            reply.write(txt + self._dataframe_to_table(page))
+                        txt = ""
+            except Exception as e:  # pragma: no cover
+                txt += f"\t\t{e}\n"
+            reply.write(txt)
+            return reply.close()
 
     def start_webserver(self):
         """
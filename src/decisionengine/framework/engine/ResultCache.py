@@ -0,0 +1,120 @@
+# SPDX-FileCopyrightText: 2017 Fermi Research Alliance, LLC
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Cache of the products rendered for de-client.
+
+Rendered results are keyed by channel, the committed generation of the
+channel (as ``(sequence_id, generation_id)``) and the product with the
+options it was rendered with.  When a channel commits a new generation,
+its results of the older ones are dropped on the next lookup.
+"""
+
+import sys
+import threading
+
+from collections import OrderedDict
+
+from decisionengine.framework.util.metrics import Counter, Gauge
+
+__all__ = [
+    "DEFAULT_RESULT_CACHE_BYTES",
+    "ResultCache",
+]
+
+#: Default byte budget of the rendered results
+DEFAULT_RESULT_CACHE_BYTES = 64 * 1024 * 1024
+
+RESULT_CACHE_HITS = Counter("de_client_result_cache_hits", "Number of de-client products served already rendered")
+RESULT_CACHE_MISSES = Counter("de_client_result_cache_misses", "Number of de-client products rendered")
+RESULT_CACHE_BYTES = Gauge("de_client_result_cache_bytes", "Size of the rendered de-client products held in the cache")
+
+
+class ResultCache:
+    """
+    Byte-budgeted LRU cache of rendered products, by committed generation
+
+    A budget of ``0`` disables the cache.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_RESULT_CACHE_BYTES):
+        """
+        :type max_bytes: :obj:`int`
+        :arg max_bytes: maximum number of bytes held by the cache
+        """
+        if int(max_bytes) < 0:
+            raise ValueError(f"The result cache size must not be negative, got {max_bytes}")
+        self.max_bytes = int(max_bytes)
+        self.current_bytes = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        # channel -> committed (sequence_id, generation_id) of its entries
+        self._generations = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def pages(self, channel, generation, product, render):
+        """
+        Iterate over the pages of a rendered product, rendering them on a miss
+
+        Rendered pages are passed on as they come and kept, as long as
+        they fit in the budget, to be cached once the product is complete.
+
+        :type channel: :obj:`string`
+        :type generation: :obj:`tuple`
+        :arg generation: committed ``(sequence_id, generation_id)`` of the channel
+        :type product: :obj:`tuple`
+        :arg product: product name and the options it is rendered with
+        :type render: :obj:`callable`
+        :arg render: returns an iterable of the rendered pages, as :obj:`str`
+        :rtype: :obj:`iterator`
+        """
+        cache_key = (channel, generation, product)
+        with self._lock:
+            known = self._generations.get(channel)
+            if known is None or generation > known:
+                self._drop_channel(channel)
+                self._generations[channel] = generation
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                self._entries.move_to_end(cache_key)
+        if entry is not None:
+            RESULT_CACHE_HITS.inc()
+            return iter(entry[0])
+        RESULT_CACHE_MISSES.inc()
+        return self._render(cache_key, render)
+
+    def _render(self, cache_key, render):
+        kept = []
+        size = 0
+        for page in render():
+            yield page
+            if kept is not None:
+                kept.append(page)
+                # memory held by the page, counting the object overhead and wide characters
+                size += sys.getsizeof(page)
+                if size > self.max_bytes:
+                    kept = None
+        if not kept:
+            return
+        with self._lock:
+            if self._generations.get(cache_key[0]) != cache_key[1] or cache_key in self._entries:
+                # a newer generation was committed while rendering
+                return
+            self._entries[cache_key] = (kept, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+            RESULT_CACHE_BYTES.set(self.current_bytes)
+
+    def _drop_channel(self, channel):
+        # caller must hold self._lock
+        for cache_key in [cache_key for cache_key in self._entries if cache_key[0] == channel]:
+            self._discard(cache_key)
+        RESULT_CACHE_BYTES.set(self.current_bytes)
+
+    def _discard(self, cache_key):
+        # caller must hold self._lock
+        _, size = self._entries.pop(cache_key)
+        self.current_bytes -= size
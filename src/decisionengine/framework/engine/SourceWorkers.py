@@ -5,8 +5,8 @@ import contextlib
 import logging
 import multiprocessing
 import os
-import pickle
 import time
+import types
 import uuid
 
 import psutil
@@ -14,12 +14,14 @@ import structlog
 
 from kombu import Connection, Queue
 from kombu.pools import producers
+from kombu.serialization import dumps
 
 import decisionengine.framework.modules.de_logger as de_logger
 import decisionengine.framework.modules.logging_configDict as logconf
 
 from decisionengine.framework.modules import Module
 from decisionengine.framework.modules.Source import Source
+from decisionengine.framework.taskmanager.LatestMessages import MESSAGE_SERIALIZER
 from decisionengine.framework.taskmanager.module_graph import _create_module_instance
 from decisionengine.framework.taskmanager.ProcessingState import ProcessingState, State
 from decisionengine.framework.util.countdown import Countdown
@@ -182,15 +184,21 @@ class SourceWorker(multiprocessing.Process):
                     Module.verify_products(self.module_instance, data)
                     self.logger.info(f"Source {self.key} acquire returned")
                     SOURCE_ACQUIRE_GAUGE.labels(self.key).set_to_current_time()
+                    # Serialize once here, so that the size can be logged without pickling the data again
+                    content_type, content_encoding, body = dumps(
+                        dict(source_name=self.key, source_module=self.module, data=data),
+                        serializer=MESSAGE_SERIALIZER,
+                    )
                     self.logger.debug(
                         f"Publishing data to queue {self.queue.name} with routing key {self.key}"
-                        + f" ({len(pickle.dumps(data))} pickled bytes)"
+                        + f" ({len(body)} serialized bytes)"
                     )
                     producer.publish(
-                        dict(source_name=self.key, source_module=self.module, data=data),
+                        body,
                         routing_key=self.key,
                         exchange=self.exchange,
-                        serializer="pickle",
+                        content_type=content_type,
+                        content_encoding=content_encoding,
                         declare=[
                             self.exchange,
                             self.queue,
@@ -210,7 +218,7 @@ class SourceWorker(multiprocessing.Process):
                         dict(source_name=self.key, source_module=self.module, data=State.SHUTDOWN),
                         routing_key=self.key,
                         exchange=self.exchange,
-                        serializer="pickle",
+                        serializer=MESSAGE_SERIALIZER,
                         declare=[
                             self.exchange,
                             self.queue,
@@ -237,13 +245,17 @@ class SourceWorkers:
           # Access to ws now protected
           ws['new_source'] = SourceWorker(...)
 
-    In cases where the decision engine's block_while method must be
-    called (e.g. during tests), one should use unguarded access:
+    As for the channel workers, the published workers are replaced,
+    never modified in place, whenever sources are added or removed.
+    Read-only users should take an immutable snapshot, which does not
+    wait for a structural change in progress:
 
-      ws = workers.get_unguarded()
-      # Access to ws is unprotected
+      ws = workers.snapshot()
+      # ws does not change, even if sources are added or removed
       ws['new_source'].wait_while(...)
 
+    The get_unguarded method is kept as an alias of snapshot.
+
     Calling a blocking method while using the protected context
     manager (i.e. workers.access()) will likely result in a deadlock.
     """
@@ -257,28 +269,34 @@ class SourceWorkers:
         self._lock = multiprocessing.Lock()
 
     class Access:
-        def __init__(self, workers, lock):
-            self._workers = workers
-            self._lock = lock
+        def __init__(self, source_workers):
+            self._source_workers = source_workers
+            self._workers = None
 
         def __enter__(self):
-            self._lock.acquire()
+            self._source_workers._lock.acquire()
+            self._workers = dict(self._source_workers._workers)
             return self._workers
 
         def __exit__(self, error, type, bt):
-            self._lock.release()
+            self._source_workers._workers = self._workers
+            self._source_workers._lock.release()
 
     def access(self):
-        return self.Access(self._workers, self._lock)
+        return self.Access(self)
+
+    def snapshot(self):
+        return types.MappingProxyType(self._workers)
 
     def get_unguarded(self):
-        return self._workers
+        return self.snapshot()
 
     def update(self, channel_name, source_configs, logger_config):
         workers = {}
 
         # Reuse already existing sources
         with self._lock:
+            all_workers = dict(self._workers)
             existing_sources = set(self._workers.keys()).intersection(source_configs.keys())
             for src_name in existing_sources:
                 new_src_config = source_configs.pop(src_name)
@@ -299,9 +317,10 @@ class SourceWorkers:
             for key, config in source_configs.items():
                 self._logger.info(f"Creating source {key} for channel {channel_name}")
                 worker = SourceWorker(key, config, logger_config, channel_name, self._exchange, self._broker_url)
-                self._workers[key] = worker
+                all_workers[key] = worker
                 workers[key] = worker
                 self._use_count[key] = {channel_name}
+            self._workers = all_workers
 
         return workers
 
@@ -319,14 +338,16 @@ class SourceWorkers:
     def prune(self, channel_name, source_names):
         self.detach(channel_name, source_names)
         with self._lock:
+            all_workers = dict(self._workers)
             for source_name in source_names:
-                src_worker = self._workers[source_name]
+                src_worker = all_workers[source_name]
                 if src_worker.state.should_stop():
                     self._logger.debug(f"Removing source {source_name}")
                     src_worker.join()
-                    del self._workers[source_name]
+                    del all_workers[source_name]
                     del self._use_count[source_name]
                     self._logger.debug(f"Removed source {source_name}")
+            self._workers = all_workers
 
     def remove_all(self, timeout):
         with self._lock:
@@ -344,5 +365,5 @@ class SourceWorkers:
                         with contextlib.suppress(psutil.NoSuchProcess):
                             psutil.Process(worker.pid).kill()
 
-            self._workers.clear()
+            self._workers = {}
             self._use_count.clear()
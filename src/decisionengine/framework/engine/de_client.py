@@ -87,7 +87,11 @@ def create_parser():
     products.add_argument("--columns", help="comma separated list of columns")
     products.add_argument("--query", help='panda query, e.g. "FigureOfMerit != infs"')
     products.add_argument("--types", action="store_true", help="print columns types")
-    products.add_argument("--format", help="Possible formats are 'vertical', 'column-names', 'json'")
+    products.add_argument(
+        "--format",
+        help="Possible formats are 'vertical', 'column-names', 'json', 'pickle' "
+        "(binary, a dict of DataFrames by channel, to redirect to a file)",
+    )
 
     reaper = parser.add_argument_group("Database reaper options")
     reaper.add_argument("--reaper-start", action="store_true", help="start the database cleanup process")
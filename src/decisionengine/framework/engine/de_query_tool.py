@@ -14,7 +14,7 @@ from decisionengine.framework.engine.ClientMessageReceiver import ClientMessageR
 def create_parser():
     parser = argparse.ArgumentParser()
     optional = parser.add_argument_group("optional arguments")
-    optional.add_argument("--format", metavar="<format>", help="Possible formats are 'csv', 'json'.")
+    optional.add_argument("--format", metavar="<format>", help="Possible formats are 'csv', 'json', 'jsonl'.")
     optional.add_argument(
         "--since",
         metavar="<time>",
@@ -22,6 +22,18 @@ def create_parser():
         "If omitted, searches only the current task manager.\n"
         "(e.g. 2021-03-21 11:00:00)",
     )
+    optional.add_argument(
+        "--until",
+        metavar="<time>",
+        help="Maximum start time for task managers.\n(e.g. 2021-03-28 11:00:00)",
+    )
+    optional.add_argument(
+        "--every-nth",
+        metavar="<n>",
+        type=int,
+        help="Only return every n-th product of each task manager.",
+    )
+    optional.add_argument("--limit", metavar="<rows>", type=int, help="Return at most this many products.")
     optional.add_argument("--port", metavar="<port number>", default="8888", help="Default port is 8888")
     optional.add_argument("--host", metavar="<hostname>", default="localhost", help="Default hostname is 'localhost'")
     optional.add_argument(
@@ -45,7 +57,15 @@ def command_for_args(argsparsed, de_socket):
         str: Output of the command.
     """
 
-    return partial(de_socket.query_tool, argsparsed.product, argsparsed.format, argsparsed.since)
+    return partial(
+        de_socket.query_tool,
+        argsparsed.product,
+        argsparsed.format,
+        argsparsed.since,
+        argsparsed.until,
+        argsparsed.every_nth,
+        argsparsed.limit,
+    )
 
 
 def main(args_to_parse=None, logger_name="de_query_tool"):
@@ -8,14 +8,16 @@ import pytest
 import decisionengine.framework.config.policies as policies
 
 from decisionengine.framework.config.ValidConfig import ValidConfig
-from decisionengine.framework.engine.ChannelWorkers import ChannelWorker
+from decisionengine.framework.engine.ChannelWorkers import ChannelWorker, ChannelWorkers
 from decisionengine.framework.taskmanager.tests.fixtures import (  # noqa: F401
     DATABASES_TO_TEST,
     dataspace,
+    MEMORY_DATASOURCE,
     PG_DE_DB_WITHOUT_SCHEMA,
     PG_PROG,
     SQLALCHEMY_PG_WITH_SCHEMA,
     SQLALCHEMY_TEMPFILE_SQLITE,
+    SQLALCHEMY_TEMPFILE_SQLITE_WEEKLY,
 )
 
 _CWD = os.path.dirname(os.path.abspath(__file__))
@@ -58,3 +60,25 @@ def test_worker_logger_timed_rotation(global_config):
     worker.setup_logger()
 
     assert "TimedRotatingFileHandler" in str(worker.logger.handlers)
+
+
+def test_workers_snapshot(global_config):
+    workers = ChannelWorkers()
+    worker = ChannelWorker(_TASK_MANAGER, global_config["logger"])
+    before = workers.snapshot()
+
+    with workers.access() as ws:
+        ws[_TASK_MANAGER.name] = worker
+        # the change is published when the access ends
+        assert _TASK_MANAGER.name not in workers.snapshot()
+
+    assert len(before) == 0
+    snapshot = workers.snapshot()
+    assert snapshot[_TASK_MANAGER.name] is worker
+    with pytest.raises(TypeError):
+        snapshot["other_channel"] = worker
+
+    with workers.access() as ws:
+        del ws[_TASK_MANAGER.name]
+    assert snapshot[_TASK_MANAGER.name] is worker
+    assert len(workers.get_unguarded()) == 0
@@ -4,6 +4,8 @@
 import re
 import subprocess
 
+from unittest import mock
+
 import decisionengine.framework.engine.de_query_tool as de_query_tool
 
 
@@ -18,6 +20,14 @@ def test_query_tool_help():
     assert re.search("optional arguments", output) is not None
 
 
+def test_query_tool_history_arguments():
+    args = de_query_tool.create_parser().parse_args(
+        ["foo", "--until", "2021-03-28 11:00:00", "--every-nth", "2", "--limit", "10"]
+    )
+    command = de_query_tool.command_for_args(args, mock.Mock())
+    assert command.args == ("foo", None, None, "2021-03-28 11:00:00", 2, 10)
+
+
 def test_query_tool_with_no_server():
     assert (
         de_query_tool.main(["foo"])
@@ -0,0 +1,62 @@
+# SPDX-FileCopyrightText: 2017 Fermi Research Alliance, LLC
+# SPDX-License-Identifier: Apache-2.0
+
+import sys
+
+import pytest
+
+from decisionengine.framework.engine.ResultCache import ResultCache
+
+
+class Renderer:
+    def __init__(self, *pages):
+        self.pages = pages
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return iter(self.pages)
+
+
+def test_rendered_once_per_generation():
+    cache = ResultCache(max_bytes=1024)
+    render = Renderer("page 1\n", "page 2\n")
+
+    assert list(cache.pages("test_channel", (1, 2), ("foo", None), render)) == ["page 1\n", "page 2\n"]
+    assert list(cache.pages("test_channel", (1, 2), ("foo", None), render)) == ["page 1\n", "page 2\n"]
+    assert render.calls == 1
+    # other options are rendered on their own
+    list(cache.pages("test_channel", (1, 2), ("foo", "vertical"), render))
+    assert render.calls == 2 and len(cache) == 2
+
+    # a new committed generation drops the results of the channel
+    list(cache.pages("test_channel", (1, 3), ("foo", None), render))
+    assert render.calls == 3 and len(cache) == 1
+    # an older generation is rendered but not cached
+    list(cache.pages("test_channel", (1, 2), ("foo", None), render))
+    assert render.calls == 4 and len(cache) == 1
+
+
+def test_budget():
+    page = "0123456789"
+    cache = ResultCache(max_bytes=sys.getsizeof(page))
+    render = Renderer(page, page)
+    assert len(list(cache.pages("test_channel", (1, 1), ("foo",), render))) == 2
+    assert len(cache) == 0
+
+    list(cache.pages("test_channel", (1, 1), ("bar",), Renderer(page)))
+    list(cache.pages("test_channel", (1, 1), ("baz",), Renderer(page)))
+    assert len(cache) == 1 and cache.current_bytes == sys.getsizeof(page)
+
+    # the budget is in bytes, not characters
+    wide = "\u20ac" * 10
+    cache = ResultCache(max_bytes=sys.getsizeof(page) + 10)
+    list(cache.pages("test_channel", (1, 1), ("foo",), Renderer(wide)))
+    assert len(cache) == 0
+
+    cache = ResultCache(max_bytes=0)
+    list(cache.pages("test_channel", (1, 1), ("foo",), Renderer("page")))
+    assert len(cache) == 0
+
+    with pytest.raises(ValueError):
+        ResultCache(max_bytes=-1)
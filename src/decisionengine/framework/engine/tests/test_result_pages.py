@@ -0,0 +1,93 @@
+# SPDX-FileCopyrightText: 2017 Fermi Research Alliance, LLC
+# SPDX-License-Identifier: Apache-2.0
+
+import pickle
+
+import pandas as pd
+import pytest
+
+from kombu import Connection, Exchange
+
+import decisionengine.framework.engine.DecisionEngine as DecisionEngine
+
+from decisionengine.framework.engine.ClientMessageReceiver import ClientMessageReceiver
+
+
+class RecordingQueue:
+    def __init__(self):
+        self.messages = []
+
+    def send(self, arg, routing_key_suffix="de_client"):
+        self.push(arg, routing_key_suffix)
+        self.push(None, routing_key_suffix)
+
+    def push(self, arg, routing_key_suffix="de_client"):
+        self.messages.append(arg)
+
+
+def test_dataframe_pages(monkeypatch):
+    monkeypatch.setattr(DecisionEngine, "RESULT_PAGE_ROWS", 4)
+    frames = [pd.DataFrame({"a": range(n, n + 3)}) for n in range(0, 15, 3)]
+    pages = list(DecisionEngine._dataframe_pages(iter(frames)))
+    assert [len(page) for page in pages] == [4, 4, 4, 3]
+    assert pd.concat(pages).equals(pd.concat(frames, ignore_index=True))
+
+    assert [len(page) for page in DecisionEngine._dataframe_pages(iter([]))] == [0]
+
+
+def test_paged_reply():
+    queue = RecordingQueue()
+    reply = DecisionEngine._PagedReply(queue)
+    reply.write("Product foo:  Found in channel test\n")
+    reply.write("")
+    reply.write("+---+\n")
+    reply.close(trim=1)
+    assert queue.messages == ["Product foo:  Found in channel test\n", "+---+", None]
+
+
+def test_client_error_is_raised(monkeypatch):
+    def fail():
+        raise ConnectionRefusedError("no DE server")
+
+    receiver = ClientMessageReceiver("test_exchange", "topic", "memory://", "de_client", None)
+    with pytest.raises(ConnectionRefusedError):
+        receiver.execute(fail)
+
+
+def test_binary_reply(monkeypatch):
+    monkeypatch.setattr(DecisionEngine, "BINARY_CHUNK_BYTES", 1024)
+    products = {"test_channel": pd.DataFrame({"a": range(1000)})}
+    queue = RecordingQueue()
+    reply = DecisionEngine._BinaryReply(queue)
+    pickle.dump(products, reply, protocol=5)
+    reply.close()
+    assert queue.messages[-1] is None
+    assert all(len(message) == 1024 for message in queue.messages[:-2])
+    assert pickle.loads(b"".join(queue.messages[:-1]))["test_channel"].equals(products["test_channel"])
+
+
+def test_client_receives_binary():
+    exchange = Exchange("test_binary_exchange", "topic")
+    receiver = ClientMessageReceiver(exchange.name, exchange.type, "memory://", "de_client", None)
+
+    def reply():
+        with Connection("memory://") as conn:
+            producer = conn.Producer()
+            for body, serializer in ((b"\x80\x05", "raw"), (b"\x00\xff", "raw"), (None, None)):
+                producer.publish(
+                    body,
+                    serializer=serializer,
+                    exchange=exchange,
+                    routing_key="client.requests.de_client",
+                    declare=[exchange],
+                )
+
+    assert receiver.execute(reply) == b"\x80\x05\x00\xff"
+
+
+def test_select_product_keeps_product():
+    df = pd.DataFrame({"key1": ["value1", "value2", "value3"], "key2": [0.1, 2, "Test"]})
+    de = DecisionEngine.DecisionEngine.__new__(DecisionEngine.DecisionEngine)
+    selected = de._select_product(df, columns="key2,key2.type", query="key2 == 2", types=True)
+    assert selected.to_dict("list") == {"key2": [2], "key2.type": ["int"]}
+    assert list(df.columns) == ["key1", "key2"]
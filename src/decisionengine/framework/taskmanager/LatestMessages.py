@@ -24,6 +24,10 @@ The LatestMessages class is intended to be used as a context manager (e.g.):
 
 Upon exiting the the context, a LatestMessage object will no longer
 listen for any messages.
+
+Messages are accepted either pickled (``serializer="pickle"``) or framed by
+the dataspace codec (``serializer=MESSAGE_SERIALIZER``), which pickles large
+contiguous buffers, e.g. DataFrame columns, out-of-band.
 """
 
 import copy
@@ -32,6 +36,20 @@ import threading
 
 from kombu import Connection
 from kombu.pools import connections
+from kombu.serialization import register
+
+from decisionengine.framework.dataspace import codec
+
+#: kombu serializer name of the dataspace codec
+MESSAGE_SERIALIZER = "de-pickle5"
+
+register(
+    MESSAGE_SERIALIZER,
+    lambda body: codec.encode(body, codec.NO_COMPRESSION),
+    codec.decode,
+    content_type="application/x-decisionengine-pickle5",
+    content_encoding="binary",
+)
 
 
 class LatestMessages:
@@ -72,7 +90,7 @@ class LatestMessages:
         _cl = Connection(self.broker_url)
         with (
             connections[_cl].acquire(block=True) as conn,
-            conn.Consumer(self.queues, accept=["pickle"], callbacks=[receive]),
+            conn.Consumer(self.queues, accept=["pickle", MESSAGE_SERIALIZER], callbacks=[receive]),
         ):
             self._listening.set()
             while not self._stop.is_set():
@@ -4,6 +4,7 @@
 """
 Task manager
 """
+import concurrent.futures
 import logging
 import multiprocessing
 import time
@@ -113,6 +114,13 @@ class TaskManager:
         # The DE owns the sources
         self.source_workers = workers["sources"]
         self.transform_workers = workers["transforms"]
+        # without dependency levels, the transforms run one after another
+        self.transform_levels = workers.get("transform_levels") or [
+            {key: worker} for key, worker in self.transform_workers.items()
+        ]
+        self.transform_threads = workers.get("transform_threads", 1)
+        # seconds taken by the last run of each transform, the longest ones are started first
+        self.transform_runtimes = {}
         self.logic_engine = workers["logic_engine"]
         self.publisher_workers = workers["publishers"]
         self.publisher_status_board = PublisherStatusBoard(self.publisher_workers.keys())
@@ -232,6 +240,11 @@ class TaskManager:
         self.logger.debug("Shutting down. Will call shutdown on all publishers")
         for worker in self.publisher_workers.values():
             worker.module_instance.shutdown()
+        self.logger.debug("Shutting down. Will wait for the queued data products to be stored")
+        try:
+            self.data_block_t0.dataspace.flush()
+        except Exception:  # pragma: no cover
+            self.logger.exception("Could not store the queued data products")
         self.state.set(State.OFFLINE)
         self.logger.info(f"Channel {self.name} is offline.")
         CHANNEL_STATE_GAUGE.labels(self.name).set(self.get_state_value())
@@ -274,8 +287,7 @@ class TaskManager:
             metadata = datablock.Metadata(
                 data_block.taskmanager_id, state="END_CYCLE", generation_id=data_block.generation_id
             )
-            for key, product in data.items():
-                data_block.put(key, product, header, metadata=metadata)
+            data_block.put_many(data, header, metadata=metadata)
 
     def decision_cycle(self):
         """
@@ -285,8 +297,9 @@ class TaskManager:
         data_block_t1 = self.data_block_t0.duplicate()
         self.logger.debug(f"Duplicated block {self.data_block_t0}")
 
+        complete = False
         try:
-            self.run_transforms(data_block_t1)
+            complete = self.run_transforms(data_block_t1)
         except Exception:  # pragma: no cover
             self.logger.exception("Error in decision cycle(transforms) ")
             # We do not call 'take_offline' here because it has
@@ -299,6 +312,17 @@ class TaskManager:
         except Exception:  # pragma: no cover
             self.logger.exception("Error in decision cycle(logic engine) ")
             self.take_offline()
+            complete = False
+
+        # the publishers do not write to the generation, it is complete
+        # unless a transform or the logic engine failed
+        if complete:
+            try:
+                data_block_t1.commit()
+            except Exception:  # pragma: no cover
+                self.logger.exception("Error in decision cycle(commit) ")
+        else:
+            self.logger.info(f"generation {data_block_t1.generation_id} is incomplete and not committed")
 
         if actions is None:
             return
@@ -311,24 +335,45 @@ class TaskManager:
 
     def run_transforms(self, data_block=None):
         """
-        Run transforms.
-        So far in main process.
+        Run transforms, one dependency level after another.
+
+        The transforms of a level run at the same time in a pool of
+        transform_threads threads, those that took the longest in their
+        last run are started first.
 
         :type data_block: :obj:`~datablock.DataBlock`
         :arg data_block: data block
-
+        :rtype: :obj:`bool`
+        :returns: whether all the transforms succeeded
         """
         self.logger.info("run_transforms")
         self.logger.debug(f"run_transforms: data block {data_block}")
         if not data_block:
-            return
-
-        for key, worker in self.transform_workers.items():
-            self.logger.info(f"starting transform {key}")
-            self.run_transform(worker, data_block)
+            return False
+
+        threads = min(self.transform_threads, max((len(level) for level in self.transform_levels), default=1))
+        if threads <= 1:
+            succeeded = True
+            for key, worker in self.transform_workers.items():
+                self.logger.info(f"starting transform {key}")
+                succeeded &= self.run_transform(worker, data_block, key)
+            self.logger.info("all transforms finished")
+            return succeeded
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=threads, thread_name_prefix=f"{self.name}-transform"
+        ) as executor:
+            succeeded = True
+            for level in self.transform_levels:
+                keys = sorted(level, key=lambda key: self.transform_runtimes.get(key, 0.0), reverse=True)
+                self.logger.info(f"starting transforms {keys}")
+                # run_transform handles the errors of the transforms
+                for result in executor.map(lambda key: self.run_transform(level[key], data_block, key), keys):
+                    succeeded &= result
         self.logger.info("all transforms finished")
+        return succeeded
 
-    def run_transform(self, worker, data_block):
+    def run_transform(self, worker, data_block, key=None):
         """
         Run a transform
 
@@ -336,6 +381,10 @@ class TaskManager:
         :arg worker: Transform worker
         :type data_block: :obj:`~datablock.DataBlock`
         :arg data_block: data block
+        :type key: :obj:`str`
+        :arg key: configuration key of the transform, to record its runtime
+        :rtype: :obj:`bool`
+        :returns: whether the transform succeeded
         """
         consume_keys = list(worker.module_instance._consumes.keys())
 
@@ -345,15 +394,20 @@ class TaskManager:
         self.logger.info("Run transform %s", worker.name)
         try:
             with TRANSFORM_RUN_HISTOGRAM.labels(self.name, worker.name).time():
+                start = time.monotonic()
                 data = worker.module_instance.transform(data_block)
                 self.logger.debug(f"transform returned {data}")
                 header = datablock.Header(data_block.taskmanager_id, create_time=time.time(), creator=worker.name)
                 self.data_block_put(data, header, data_block)
                 self.logger.info("transform put data")
+                if key is not None:
+                    self.transform_runtimes[key] = time.monotonic() - start
                 TRANSFORM_RUN_GAUGE.labels(self.name, worker.name).set_to_current_time()
+            return True
         except Exception:  # pragma: no cover
             self.logger.exception(f"exception from transform {worker.name} ")
             self.take_offline()
+            return False
 
     def run_logic_engine(self, data_block):
         """
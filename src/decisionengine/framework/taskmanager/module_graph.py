@@ -2,7 +2,8 @@
 # SPDX-License-Identifier: Apache-2.0
 
 """
-Ensure no circularities in produces and consumes.
+Ensure no circularities in produces and consumes, and group the
+transforms by dependency level.
 """
 
 import importlib
@@ -20,6 +21,7 @@ from decisionengine.framework.taskmanager.PublisherStatus import PublisherStatus
 from decisionengine.framework.util.subclasses import all_subclasses
 
 _DEFAULT_SCHEDULE = 300  # 5 minutes
+_DEFAULT_TRANSFORM_THREADS = 1  # opt-in: more threads run the transforms of a dependency level at the same time
 
 _DELOGGER = structlog.getLogger(LOGGERNAME)
 _DELOGGER = _DELOGGER.bind(module=__name__.split(".")[-1], channel=DELOGGER_CHANNEL_NAME)
@@ -62,9 +64,15 @@ def source_products(source_workers):
     return expected_source_products
 
 
-def ensure_no_circularities(sources, transforms, publishers):
+def transform_levels(sources, transforms, publishers):
     """
-    Ensures no circularities among data products.
+    Group the transforms by dependency level, ensuring no circularities
+    among data products.
+
+    The transforms of a level only consume products of the sources and of
+    the transforms of the previous levels, so that they can run concurrently.
+
+    :rtype: :obj:`list` of :obj:`OrderedDict`
     """
     produced, missing_produces = _produced_products(sources, transforms)
     consumed, missing_consumes = _consumed_products(transforms, publishers)
@@ -94,16 +102,31 @@ def ensure_no_circularities(sources, transforms, publishers):
         graph[consumer] = set(map(lambda p: produced.get(p), products))
 
     # Do the check
-    sorted_module_names = None
+    levels = None
     try:
-        sorted_module_names = toposort.toposort_flatten(graph)  # Flatten will trigger any circularity errors
+        levels = list(toposort.toposort(graph))  # Exhausting the levels will trigger any circularity errors
     except Exception as e:
         raise RuntimeError(f"A produces/consumes circularity exists in the configuration:\n{e}")
 
     # Keep only transforms
-    for name in set(sorted_module_names).difference(transforms.keys()):
-        sorted_module_names.remove(name)
-    return OrderedDict([(name, transforms.get(name)) for name in sorted_module_names])
+    result = []
+    for level in levels:
+        names = sorted(level.intersection(transforms.keys()))
+        if names:
+            result.append(OrderedDict([(name, transforms.get(name)) for name in names]))
+    return result
+
+
+def ensure_no_circularities(sources, transforms, publishers):
+    """
+    Ensures no circularities among data products.
+
+    Returns the transforms in the order they can be run one after another.
+    """
+    sorted_transforms = OrderedDict()
+    for level in transform_levels(sources, transforms, publishers):
+        sorted_transforms.update(level)
+    return sorted_transforms
 
 
 def _find_only_one_subclass(module, base_class):
@@ -197,10 +220,15 @@ def channel_workers(channel_name, channel_config, logger):
 
 def validated_workflow(channel_name, sources, channel_config, logger=structlog.getLogger()):
     transforms, logic_engine, publishers = channel_workers(channel_name, channel_config, logger)
-    transforms = ensure_no_circularities(sources, transforms, publishers)
+    levels = transform_levels(sources, transforms, publishers)
+    transforms = OrderedDict()
+    for level in levels:
+        transforms.update(level)
     return {
         "sources": sources,
         "transforms": transforms,
+        "transform_levels": levels,
+        "transform_threads": channel_config.get("transform_threads", _DEFAULT_TRANSFORM_THREADS),
         "logic_engine": logic_engine,
         "publishers": publishers,
     }
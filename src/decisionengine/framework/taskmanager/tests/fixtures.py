@@ -5,18 +5,22 @@ from decisionengine.framework.dataspace.datasources.tests.fixtures import mock_d
 from decisionengine.framework.dataspace.tests.fixtures import (
     DATABASES_TO_TEST,
     dataspace,
+    MEMORY_DATASOURCE,
     PG_DE_DB_WITHOUT_SCHEMA,
     PG_PROG,
     SQLALCHEMY_PG_WITH_SCHEMA,
     SQLALCHEMY_TEMPFILE_SQLITE,
+    SQLALCHEMY_TEMPFILE_SQLITE_WEEKLY,
 )
 
 __all__ = [
     "PG_DE_DB_WITHOUT_SCHEMA",
     "PG_PROG",
     "DATABASES_TO_TEST",
+    "MEMORY_DATASOURCE",
     "SQLALCHEMY_PG_WITH_SCHEMA",
     "SQLALCHEMY_TEMPFILE_SQLITE",
+    "SQLALCHEMY_TEMPFILE_SQLITE_WEEKLY",
     "dataspace",
     "mock_data_block",
 ]
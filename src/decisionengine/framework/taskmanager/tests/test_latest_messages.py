@@ -6,12 +6,15 @@ import time
 
 from concurrent.futures import ThreadPoolExecutor, wait
 
+import numpy
+import pandas as pd
 import redis
 
 from kombu import Connection, Exchange, Queue
 from kombu.pools import producers
+from kombu.serialization import dumps, loads, prepare_accept_content
 
-from decisionengine.framework.taskmanager.LatestMessages import LatestMessages
+from decisionengine.framework.taskmanager.LatestMessages import LatestMessages, MESSAGE_SERIALIZER
 
 _BROKER_URL = "redis://localhost:6379/15"  # Use 15 to avoid collisions with other tests
 _EXCHANGE = Exchange("test_topic_exchange", "topic")
@@ -60,3 +63,12 @@ def test_latest_messages():
         wait(senders)
         assert msgs.result() == ref
     redis.Redis.from_url(_BROKER_URL).flushdb()
+
+
+def test_message_serializer_roundtrip():
+    data = {"source_name": "source1", "data": {"product": pd.DataFrame({"a": numpy.arange(100_000)})}}
+    content_type, content_encoding, body = dumps(data, serializer=MESSAGE_SERIALIZER)
+    received = loads(body, content_type, content_encoding, accept=prepare_accept_content([MESSAGE_SERIALIZER]))
+    assert received["source_name"] == "source1"
+    assert received["data"]["product"].equals(data["data"]["product"])
+    received["data"]["product"].loc[0, "a"] = 5
@@ -3,7 +3,9 @@
 
 from unittest.mock import patch
 
-from decisionengine.framework.taskmanager.module_graph import ensure_no_circularities
+import pytest
+
+from decisionengine.framework.taskmanager.module_graph import ensure_no_circularities, transform_levels
 
 
 def produces_from_dict(*configs):
@@ -37,3 +39,42 @@ def test_ensure_no_circularities_correct_order():
 
     sorted_transforms = ensure_no_circularities(sources, transforms, publishers)
     assert list(sorted_transforms.keys()) == ["b_do_first", "a_do_second"]
+
+
+@patch.multiple(
+    "decisionengine.framework.taskmanager.module_graph",
+    _produced_products=produces_from_dict,
+    _consumed_products=consumes_from_dict,
+)
+def test_transform_levels():
+    sources = {"source": {"produces": ["a", "b"]}}
+    transforms = {
+        "c_independent": {"consumes": ["b"], "produces": ["e"]},
+        "b_do_first": {"consumes": ["a"], "produces": ["c"]},
+        "a_do_second": {"consumes": ["b", "c"], "produces": ["d"]},
+    }
+    publishers = {"pub": {"consumes": ["d", "e"]}}
+
+    levels = transform_levels(sources, transforms, publishers)
+    assert [list(level.keys()) for level in levels] == [["b_do_first", "c_independent"], ["a_do_second"]]
+    assert levels[0]["b_do_first"] is transforms["b_do_first"]
+
+    sorted_transforms = ensure_no_circularities(sources, transforms, publishers)
+    assert list(sorted_transforms.keys()) == ["b_do_first", "c_independent", "a_do_second"]
+
+
+@patch.multiple(
+    "decisionengine.framework.taskmanager.module_graph",
+    _produced_products=produces_from_dict,
+    _consumed_products=consumes_from_dict,
+)
+def test_transform_levels_circularity():
+    sources = {"source": {"produces": ["a"]}}
+    transforms = {
+        "first": {"consumes": ["a", "c"], "produces": ["b"]},
+        "second": {"consumes": ["b"], "produces": ["c"]},
+    }
+    publishers = {"pub": {"consumes": ["c"]}}
+
+    with pytest.raises(RuntimeError, match="circularity"):
+        transform_levels(sources, transforms, publishers)
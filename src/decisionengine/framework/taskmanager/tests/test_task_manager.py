@@ -4,6 +4,7 @@
 import os
 import random
 import string
+import threading
 
 import kombu
 import pytest
@@ -21,10 +22,12 @@ from decisionengine.framework.taskmanager.TaskManager import State, TaskManager
 from decisionengine.framework.taskmanager.tests.fixtures import (  # noqa: F401
     DATABASES_TO_TEST,
     dataspace,
+    MEMORY_DATASOURCE,
     PG_DE_DB_WITHOUT_SCHEMA,
     PG_PROG,
     SQLALCHEMY_PG_WITH_SCHEMA,
     SQLALCHEMY_TEMPFILE_SQLITE,
+    SQLALCHEMY_TEMPFILE_SQLITE_WEEKLY,
 )
 
 _CWD = os.path.dirname(os.path.abspath(__file__))
@@ -181,3 +184,69 @@ def test_run_source_only_once(global_config):
 def test_multiple_logic_engines_not_supported(global_config):
     with pytest.raises(RuntimeError, match="Cannot support more than one logic engine per channel."):
         task_manager_for(global_config, "multiple_logic_engines")
+
+
+class BarrierTransform:
+    """Transform worker whose runs wait for each other"""
+
+    def __init__(self, name, barrier, consumes, produces):
+        self.name = name
+        self.module_instance = self
+        self._consumes = dict.fromkeys(consumes)
+        self._barrier = barrier
+        self._produces = produces
+
+    def transform(self, data_block):
+        for key in self._consumes:
+            assert key in data_block
+        if self._barrier is not None:
+            self._barrier.wait()
+        return {self._produces: self.name}
+
+
+def test_transforms_run_by_level(dataspace):  # noqa: F811
+    barrier = threading.Barrier(2, timeout=5)
+    first = BarrierTransform("first", barrier, ["a"], "b")
+    second = BarrierTransform("second", barrier, ["a"], "c")
+    third = BarrierTransform("third", None, ["b", "c"], "d")
+    workers = {
+        "sources": {},
+        "transforms": {"first": first, "second": second, "third": third},
+        "transform_levels": [{"first": first, "second": second}, {"third": third}],
+        "transform_threads": 2,
+        "logic_engine": None,
+        "publishers": {},
+    }
+    task_manager = TaskManager("test_levels", workers, dataspace, set(), _EXCHANGE, _BROKER_URL, [])
+    data_block = task_manager.data_block_t0
+    data_block.put("a", "source", datablock.Header(data_block.taskmanager_id))
+
+    # the transforms of the first level only finish if they run at the same time
+    task_manager.run_transforms(data_block)
+    assert not barrier.broken
+    assert data_block["d"] == "third"
+    assert task_manager.state.has_value(State.BOOT)
+    assert set(task_manager.transform_runtimes) == {"first", "second", "third"}
+
+
+class FailingTransform(BarrierTransform):
+    def transform(self, data_block):
+        raise RuntimeError("transform failed")
+
+
+def test_incomplete_generation_not_committed(dataspace):  # noqa: F811
+    transform = BarrierTransform("transform", None, ["a"], "b")
+    workers = {"sources": {}, "transforms": {"transform": transform}, "logic_engine": None, "publishers": {}}
+    task_manager = TaskManager("test_commit", workers, dataspace, set(), _EXCHANGE, _BROKER_URL, [])
+    data_block = task_manager.data_block_t0
+    data_block.put("a", "source", datablock.Header(data_block.taskmanager_id))
+
+    task_manager.decision_cycle()
+    committed = dataspace.get_committed_generation("test_commit")["generation_id"]
+    assert committed == task_manager.data_block_t0.generation_id - 1
+
+    task_manager.transform_workers["transform"] = FailingTransform("transform", None, ["a"], "b")
+    task_manager.transform_levels = [task_manager.transform_workers]
+    task_manager.decision_cycle()
+    assert task_manager.state.should_stop()
+    assert dataspace.get_committed_generation("test_commit")["generation_id"] == committed